@@ -1,6 +1,9 @@
 # ----------------------------------------
 # imported libraries
 # ----------------------------------------
+import time
+# startup timings are measured from here, so they include loading pygame itself
+BOOT_START = time.perf_counter()
 import pygame
 import sys 
 import math 
@@ -9,6 +12,27 @@ import json
 import shutil
 import datetime
 import random
+import threading
+import argparse
+import multiprocessing
+import itertools
+import bisect
+import weakref
+import socket
+import struct
+import queue
+import subprocess
+import zlib
+import tempfile
+import gc
+import tracemalloc
+import base64
+import re
+import http.client
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from array import array
+from collections import deque
 
 # ----------------------------------------
 # backup procedures
@@ -17,6 +41,10 @@ import random
 SOURCE_FOLDER = os.path.dirname(os.path.abspath(__file__))
 # put backups one level up from the game folder
 BACKUP_FOLDER = os.path.join(os.path.dirname(SOURCE_FOLDER), "Mars_Lander_Backups")
+# files and folders the game writes into its own folder; they can be rebuilt, and copying replays,
+# recordings and caches on every launch would make each backup bigger than the last
+BACKUP_SKIPPED = ("level_cache", "replays", "telemetry", "recordings", "memory_reports", "score_server",
+                  "score_queue.json*", "startup_times.log", "__pycache__")
 
 def create_backup():
     # skip the backup if the source folder somehow doesn't exist
@@ -28,14 +56,13 @@ def create_backup():
     backup_path = os.path.join(BACKUP_FOLDER, f"Assessment_3_Backup_{timestamp}")
     try:
         os.makedirs(backup_path, exist_ok=True)
-        shutil.copytree(SOURCE_FOLDER, backup_path, dirs_exist_ok=True)
+        shutil.copytree(SOURCE_FOLDER, backup_path, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns(*BACKUP_SKIPPED))
         print(f"Backup completed successfully! Files saved in: {backup_path}")
     except OSError as err:
         # filesystem errors shouldn't crash the game, just warn and move on
         print(f"Backup skipped due to filesystem error: {err}")
 
-create_backup()
-
 # ----------------------------------------
 # game states
 # ----------------------------------------
@@ -58,21 +85,30 @@ ZOOM_NEAR_DISTANCE = 180   # camera zooms in when lander is this close to the pa
 ZOOM_FAR_DISTANCE = 420    # camera zooms back out beyond this distance
 MIN_ZOOM = 1.0
 MAX_ZOOM = 1.8
+MIN_RENDER_SCALE = 0.25    # lowest internal resolution allowed for the world layer
 
 # screen shake constants
 SHAKE_DURATION = 12      # frames of shake after crash
 SHAKE_MAGNITUDE = 4      # max pixel offset
 
-# wind constants — only applied in levels 4 and 5
-WIND_LEVELS = {"LEVEL_4", "LEVEL_5"}
+# wind strengths of levels 4 and 5 (their files hold the same values); generated levels ramp between them
 WIND_FORCE_LEVEL_4 = 0.018   # moderate wind
 WIND_FORCE_LEVEL_5 = 0.032   # stronger, more variable wind
 
+# the wind's strength also varies over the level: it dies away close to the terrain, and seeded
+# patches of stronger and weaker wind drift downwind across the map on gusty levels
+WIND_CELL          = 50       # wind field grid spacing in pixels
+WIND_SHEAR_HEIGHT  = 150      # height above the ground over which the wind builds up
+WIND_GROUND_FACTOR = 0.35     # fraction of the wind left right at the surface
+WIND_VARIATION     = 0.35     # patches are up to this much weaker than the level's wind, never stronger
+WIND_NOISE_CELLS   = (6, 4)   # size of the patch pattern: cells across and down the level
+WIND_GUST_DRIFT    = 0.6      # pixels per frame the patches move downwind on gusty levels
+
 # ----------------------------------------
 # persistent save helpers
 # ----------------------------------------
 # save file sits next to this script so it's easy to find
-SAVE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mars_lander_save.json")
+SAVE_FILE = os.path.join(SOURCE_FOLDER, "mars_lander_save.json")
 
 def load_save():
     # try to read the save file; return safe defaults if anything goes wrong
@@ -98,6 +134,29 @@ def write_save(completed_levels_set, best_scores_dict):
     except OSError as err:
         print(f"Save failed: {err}")
 
+# display settings live in their own file so a machine can be set up without touching the save
+SETTINGS_FILE = os.path.join(SOURCE_FOLDER, "mars_lander_settings.json")
+DEFAULT_SETTINGS = {
+    "render_scale": 1.0,  # draw the world at this fraction of the window size (e.g. 0.5 on slow machines)
+    "telemetry": True,    # record every attempt's last minute of flight data into the telemetry folder
+    "broadcast": "",      # "host:port" to stream this game to a spectator viewer (see --viewer)
+    "auto_quality": True, # turn effects down automatically when the game can't keep up
+    "audio_buffer": 256,  # mixer buffer in samples: smaller means less delay between a key and its sound
+    "deterministic": False, # fly with the fixed-point physics so every run can be verified by re-simulation
+    "score_server": ""      # leaderboard URL to submit landings to, e.g. "http://scores.local:47480/scores"
+}
+
+def load_settings():
+    # missing or broken settings files just fall back to the defaults
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(SETTINGS_FILE, "r") as f:
+            settings.update(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError) as err:
+        if not isinstance(err, FileNotFoundError):
+            print(f"Settings file ignored: {err}")
+    return settings
+
 # load save data at startup
 _save = load_save()
 completed_levels = set(_save["completed_levels"])
@@ -106,72 +165,113 @@ best_scores = _save["best_scores"]   # dict: level_name -> int score
 # ----------------------------------------
 # level settings
 # ----------------------------------------
-LEVELS = {
-    "TUTORIAL": {
-        "background": "Tutorial_Background.png",
-        # completely flat ground for the tutorial
-        "terrain_points": [
-            (0, 700), (1200, 700)
-        ],
-        "landing_pad_x": WIDTH//2 - 60,
-        "landing_pad": {"x": WIDTH//2 - 60, "y": HEIGHT - 55, "width": 120, "height": 8}
-    },
-    "LEVEL_1": {
-        "background": "Level_1_Background.png",
-        # gentle bumps to introduce terrain without being too punishing
-        "terrain_points": [
-            (0, 700), (300, 700), (400, 670), (500, 700),
-            (540, 700), (660, 700),
-            (700, 700), (1200, 700)
-        ],
-        "landing_pad_x": 540,
-        "landing_pad": {"x": 540, "y": HEIGHT - 55, "width": 120, "height": 8}
-    },
-    "LEVEL_2": {
-        "background": "Level_1_Background.png",
-        # slightly more varied terrain
-        "terrain_points": [
-            (0, 700), (150, 660), (300, 700), (420, 640),
-            (500, 700), (560, 700),
-            (620, 700), (800, 650), (1000, 690), (1200, 700)
-        ],
-        "landing_pad_x": 500,
-        "landing_pad": {"x": 500, "y": HEIGHT - 55, "width": 120, "height": 8}
-    },
-    "LEVEL_3": {
-        "background": "Level_1_Background.png",
-        # peaks are taller here, need to watch descent angle more carefully
-        "terrain_points": [
-            (0, 700), (100, 620), (250, 680), (350, 600),
-            (460, 700), (540, 700),
-            (600, 700), (750, 610), (900, 670), (1100, 630), (1200, 700)
-        ],
-        "landing_pad_x": 460,
-        "landing_pad": {"x": 460, "y": HEIGHT - 55, "width": 120, "height": 8}
-    },
-    "LEVEL_4": {
-        "background": "Level_1_Background.png",
-        # narrower pad and wind force kicks in on this level
-        "terrain_points": [
-            (0, 700), (80, 580), (200, 660), (320, 570),
-            (420, 700), (500, 700),
-            (560, 700), (680, 580), (800, 650), (950, 560), (1200, 700)
-        ],
-        "landing_pad_x": 420,
-        "landing_pad": {"x": 420, "y": HEIGHT - 55, "width": 80, "height": 8}
-    },
-    "LEVEL_5": {
-        "background": "Level_1_Background.png",
-        # very narrow pad, jagged terrain, and gusty unpredictable wind
-        "terrain_points": [
-            (0, 700), (60, 550), (150, 630), (250, 530),
-            (370, 700), (430, 700),
-            (490, 700), (600, 540), (720, 620), (850, 510), (1000, 640), (1200, 700)
-        ],
-        "landing_pad_x": 370,
-        "landing_pad": {"x": 370, "y": HEIGHT - 55, "width": 60, "height": 8}
-    }
-}
+# each level is a JSON file in the levels folder: background image, terrain_points from x=0 to
+# x=WIDTH, the landing_pad rectangle, and optionally wind {"force", "gusty"} and a description.
+# Files are only read when a level is first asked for, and in dev mode (--dev) the level being
+# played is reloaded whenever its file is saved
+LEVEL_FOLDER     = os.path.join(SOURCE_FOLDER, "levels")
+LEVEL_FILE_KEYS  = {"description", "background", "terrain_points", "landing_pad", "wind"}
+LEVEL_POLL_TICKS = 30   # dev mode checks the level files twice a second
+
+def validate_level(level_data):
+    # raises ValueError naming the first problem; returns the level with its points as tuples
+    if not isinstance(level_data, dict):
+        raise ValueError("expected a JSON object")
+    unknown = set(level_data) - LEVEL_FILE_KEYS
+    if unknown:
+        raise ValueError(f"unknown key(s) {', '.join(sorted(unknown))}")
+    missing = {"background", "terrain_points", "landing_pad"} - set(level_data)
+    if missing:
+        raise ValueError(f"missing {', '.join(sorted(missing))}")
+    if not isinstance(level_data["background"], str):
+        raise ValueError("background must be an image file name")
+
+    try:
+        terrain_points = [(int(x), int(y)) for x, y in level_data["terrain_points"]]
+    except (TypeError, ValueError):
+        raise ValueError("terrain_points must be a list of [x, y] pairs") from None
+    if len(terrain_points) < 2 or terrain_points[0][0] != 0 or terrain_points[-1][0] != WIDTH:
+        raise ValueError(f"terrain_points must run from x=0 to x={WIDTH}")
+    if any(x2 <= x1 for (x1, _), (x2, _) in zip(terrain_points, terrain_points[1:])):
+        raise ValueError("terrain_points must go strictly left to right")
+
+    pad = level_data["landing_pad"]
+    if not isinstance(pad, dict) or set(pad) != {"x", "y", "width", "height"} or \
+            not all(isinstance(value, int) for value in pad.values()):
+        raise ValueError("landing_pad must have whole-number x, y, width and height")
+    if pad["width"] <= 0 or pad["x"] < 0 or pad["x"] + pad["width"] > WIDTH:
+        raise ValueError("landing_pad must fit across the screen")
+
+    wind = level_data.get("wind")
+    if wind is not None:
+        if not isinstance(wind, dict) or set(wind) != {"force", "gusty"} or \
+                not isinstance(wind["force"], (int, float)) or wind["force"] < 0 or not isinstance(wind["gusty"], bool):
+            raise ValueError("wind must have a force of 0 or more and gusty true or false")
+
+    level_data = dict(level_data)
+    level_data["terrain_points"] = terrain_points
+    return level_data
+
+
+class LevelFiles(dict):
+    # LEVELS: the files are found at startup but each one is only read and validated when the level is
+    # first looked up. Generated levels are put straight into it like any other dict
+    def __init__(self, folder):
+        super().__init__()
+        self.paths  = {}   # level name -> file
+        self.mtimes = {}   # level name -> modification time of the file it was loaded from
+        if os.path.isdir(folder):
+            for file_name in sorted(os.listdir(folder)):
+                if file_name.endswith(".json"):
+                    self.paths[file_name[:-len(".json")]] = os.path.join(folder, file_name)
+
+    def _load(self, level_name):
+        path = self.paths[level_name]
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path) as f:
+                level_data = validate_level(json.load(f))
+        except ValueError as err:
+            raise ValueError(f"{path}: {err}") from None
+        self.mtimes[level_name] = mtime
+        return level_data
+
+    def __missing__(self, level_name):
+        if level_name not in self.paths:
+            raise KeyError(level_name)
+        level_data = self._load(level_name)
+        self[level_name] = level_data
+        return level_data
+
+    def __contains__(self, level_name):
+        return super().__contains__(level_name) or level_name in self.paths
+
+    def get(self, level_name, default=None):
+        try:
+            return self[level_name]
+        except KeyError:
+            return default
+
+    def reload_changed(self):
+        # re-reads every loaded level whose file has been saved since; returns the names reloaded.
+        # A file that doesn't load leaves the old version in place until it's saved again
+        reloaded = []
+        for level_name, mtime in list(self.mtimes.items()):
+            try:
+                saved = os.path.getmtime(self.paths[level_name])
+            except OSError:
+                continue   # being replaced by the editor; look again next time
+            if saved == mtime:
+                continue
+            try:
+                self[level_name] = self._load(level_name)
+                reloaded.append(level_name)
+            except (OSError, ValueError) as err:
+                self.mtimes[level_name] = saved
+                print(f"Level reload failed: {err}")
+        return reloaded
+
+LEVELS = LevelFiles(LEVEL_FOLDER)
 
 # ----------------------------------------
 # level progression system
@@ -189,6 +289,68 @@ def get_terrain_y(terrain_points, x):
             return y1 + t * (y2 - y1)
     return HEIGHT - 50
 
+# ----------------------------------------
+# procedural level generator
+# ----------------------------------------
+# generated levels are registered in LEVELS under this prefix plus their seed
+ENDLESS_PREFIX = "ENDLESS_"
+# compiled level data is cached next to the script, keyed by seed and difficulty
+LEVEL_CACHE_FOLDER = os.path.join(SOURCE_FOLDER, "level_cache")
+LEVEL_CACHE_VERSION = 1   # bump this whenever the generator or compile output changes
+# endless runs start from a random seed, so most entries are never read again: only the most
+# recently used levels are kept
+LEVEL_CACHE_MAX_LEVELS = 32
+
+def generate_level(seed, difficulty):
+    # build a level in the same shape as the LEVELS entries; the same seed and difficulty always give the same level
+    rng = random.Random(f"{seed}:{difficulty}")
+    difficulty = max(1, int(difficulty))
+    # 0.0 on the first stage, 1.0 from stage 10 onwards
+    ramp = min(1.0, (difficulty - 1) / 9)
+
+    ground_y   = HEIGHT - 50
+    pad_width  = int(120 - 60 * ramp)
+    peak_rise  = 40 + 150 * ramp       # how far peaks can rise above the base ground
+    flat_margin = int(40 - 30 * ramp)  # flat ground either side of the pad
+
+    pad_x = rng.randint(150, WIDTH - 150 - pad_width)
+    flat_left  = pad_x - flat_margin
+    flat_right = pad_x + pad_width + flat_margin
+
+    def rough_section(x_start, x_end):
+        # random bumps between two x positions, always finishing back at ground level
+        points = []
+        x = x_start
+        while True:
+            x += rng.randint(70, 150)
+            if x >= x_end - 40:
+                break
+            points.append((x, int(ground_y - rng.uniform(0.2, 1.0) * peak_rise)))
+        return points
+
+    terrain_points = [(0, ground_y)]
+    terrain_points += rough_section(0, flat_left)
+    terrain_points += [(flat_left, ground_y), (pad_x, ground_y),
+                       (pad_x + pad_width, ground_y), (flat_right, ground_y)]
+    terrain_points += rough_section(flat_right, WIDTH)
+    terrain_points.append((WIDTH, ground_y))
+
+    # wind starts on stage 3 and becomes gusty from stage 5, matching the hand-made levels
+    if difficulty >= 3:
+        wind_force = WIND_FORCE_LEVEL_4 + (WIND_FORCE_LEVEL_5 - WIND_FORCE_LEVEL_4) * ramp
+    else:
+        wind_force = 0.0
+
+    return {
+        "background": "Level_1_Background.png",
+        "terrain_points": terrain_points,
+        "landing_pad_x": pad_x,
+        "landing_pad": {"x": pad_x, "y": HEIGHT - 55, "width": pad_width, "height": 8},
+        "wind": {"force": wind_force, "gusty": difficulty >= 5},
+        "seed": seed,
+        "difficulty": difficulty
+    }
+
 # ----------------------------------------
 # colours
 # ----------------------------------------
@@ -206,38 +368,333 @@ CYAN = (0, 220, 255)
 # ----------------------------------------
 # pygame setup
 # ----------------------------------------
-pygame.init()
-pygame.mixer.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Mars Lander")
-clock = pygame.time.Clock()
-font = pygame.font.Font(None, 50)
-small_font = pygame.font.Font(None, 34)
+# nothing below opens a window on import, so process-pool workers and tools can load this script safely;
+# the game itself calls these from the main block at the bottom
+def init_pygame(headless=False, audio_buffer=None):
+    global screen, clock, font, small_font, audio
+    if headless:
+        # render into memory only - used by the command-line tools
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    # the mixer's buffer size can only be set before it starts
+    pygame.mixer.pre_init(AUDIO_FREQUENCY, -16, 2, audio_buffer or AUDIO_BUFFER)
+    pygame.init()
+    pygame.mixer.init()
+    audio = AudioEngine()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Mars Lander")
+    clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 50)
+    small_font = pygame.font.Font(None, 34)
 
 # ----------------------------------------
 # background image loading
 # ----------------------------------------
-menu_background = pygame.image.load("Menu_Background.png").convert()
-menu_background = pygame.transform.scale(menu_background, (WIDTH, HEIGHT))
+def load_backgrounds():
+    # just the menu's; each level loads its own background when it starts
+    global menu_background
+    menu_background = surface_pool.convert(pygame.image.load("Menu_Background.png"))
+    menu_background = pygame.transform.scale(menu_background, (WIDTH, HEIGHT))
 
 def load_level_background(level_name):
     # look up which image file this level uses, fall back to level 1 if not found
     level_data = LEVELS.get(level_name, LEVELS["LEVEL_1"])
     background_file = level_data["background"]
-    image = pygame.image.load(background_file).convert()
+    image = surface_pool.convert(pygame.image.load(background_file))
     return pygame.transform.scale(image, (WIDTH, HEIGHT))
 
-background_image = load_level_background("LEVEL_1")
+# ----------------------------------------
+# level compilation
+# ----------------------------------------
+class CompiledLevel:
+    # derived runtime data for one level, built once and cached on disk
+    def __init__(self, level_name, height_lut, terrain_surface, background, landing_pad_rect):
+        self.level_name       = level_name
+        self.height_lut       = height_lut        # terrain y for every whole x from 0 to WIDTH
+        self.terrain_surface  = terrain_surface   # terrain polygon, edge and pad baked into one layer
+        self.background       = background
+        self.landing_pad_rect = landing_pad_rect
+        self.finalised        = False
+
+    def finalise(self):
+        # display-format conversion has to happen on the main thread, so it's done here rather than in compile_level
+        if not self.finalised:
+            self.terrain_surface = surface_pool.convert(self.terrain_surface, alpha=True)
+            self.background      = surface_pool.convert(self.background)
+            self.finalised = True
+        return self
+
+def get_level_cache_key(level_name, level_data):
+    # generated levels are keyed by seed so the same seed reuses the same files
+    if "seed" in level_data:
+        return f"v{LEVEL_CACHE_VERSION}_seed{level_data['seed']}_d{level_data['difficulty']}"
+    # level files can be edited, so their cache entries are keyed by content too
+    checksum = zlib.crc32(json.dumps(level_data, sort_keys=True).encode())
+    return f"v{LEVEL_CACHE_VERSION}_{level_name}_{checksum:08x}"
+
+def touch_level_cache(*paths):
+    # mark a cache hit as recently used, so pruning keeps it
+    try:
+        for path in paths:
+            os.utime(path)
+    except OSError:
+        pass
+
+def prune_level_cache():
+    # delete the least recently used levels (both files) beyond LEVEL_CACHE_MAX_LEVELS
+    entries = [os.path.join(LEVEL_CACHE_FOLDER, name) for name in os.listdir(LEVEL_CACHE_FOLDER)
+               if name.endswith(".json")]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for data_path in entries[LEVEL_CACHE_MAX_LEVELS:]:
+        for path in (data_path, data_path[:-len(".json")] + "_terrain.png"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def compile_level(level_name, level_data=None):
+    # safe to call from a background thread: nothing here touches the display
+    if level_data is None:
+        level_data = LEVELS.get(level_name, LEVELS["LEVEL_1"])
+    pad_data = level_data["landing_pad"]
+    landing_pad_rect = pygame.Rect(pad_data["x"], pad_data["y"], pad_data["width"], pad_data["height"])
+
+    background = pygame.transform.scale(pygame.image.load(level_data["background"]), (WIDTH, HEIGHT))
+
+    cache_key    = get_level_cache_key(level_name, level_data)
+    data_path    = os.path.join(LEVEL_CACHE_FOLDER, cache_key + ".json")
+    terrain_path = os.path.join(LEVEL_CACHE_FOLDER, cache_key + "_terrain.png")
+
+    # reuse the cached files when both halves are present and readable
+    try:
+        with open(data_path, "r") as f:
+            cached = json.load(f)
+        terrain_surface = pygame.image.load(terrain_path)
+        touch_level_cache(data_path, terrain_path)
+        return CompiledLevel(level_name, cached["height_lut"], terrain_surface, background, landing_pad_rect)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, pygame.error):
+        pass
+
+    terrain_points = level_data["terrain_points"]
+    height_lut = [round(get_terrain_y(terrain_points, x), 2) for x in range(WIDTH + 1)]
+
+    terrain_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    draw_terrain(terrain_surface, terrain_points, landing_pad_rect, level_name)
+
+    try:
+        os.makedirs(LEVEL_CACHE_FOLDER, exist_ok=True)
+        with open(data_path, "w") as f:
+            json.dump({"level": level_data, "height_lut": height_lut}, f)
+        pygame.image.save(terrain_surface, terrain_path)
+        prune_level_cache()
+    except (OSError, pygame.error) as err:
+        # a missing cache only costs a recompile next time, so just warn
+        print(f"Level cache write failed: {err}")
+
+    return CompiledLevel(level_name, height_lut, terrain_surface, background, landing_pad_rect)
+
+class LevelPrefetcher:
+    # generates and compiles the next endless level on a background thread while the end screen is showing
+    def __init__(self):
+        self.thread = None
+        self.result = None
+        self.key    = None   # (seed, difficulty) of the level being built
+
+    def start(self, seed, difficulty):
+        # ignore repeat requests for a level that's already being built
+        if self.key == (seed, difficulty):
+            return
+        self.key    = (seed, difficulty)
+        self.result = None
+        self.thread = threading.Thread(target=self._work, args=self.key, daemon=True)
+        self.thread.start()
+
+    def _work(self, seed, difficulty):
+        level_name = f"{ENDLESS_PREFIX}{seed}"
+        level_data = generate_level(seed, difficulty)
+        result = (level_name, level_data, compile_level(level_name, level_data))
+        # a newer request may have replaced this one while it was building
+        if self.key == (seed, difficulty):
+            self.result = result
+
+    def get(self):
+        # blocks only if the player skipped the end screen before the build finished
+        if self.thread is not None:
+            self.thread.join()
+        result = self.result
+        self.thread = None
+        self.result = None
+        self.key    = None
+        return result
 
 # ----------------------------------------
 # sound loading
 # ----------------------------------------
-thrust_sound = pygame.mixer.Sound("lander_thrust.mp3")
-thrust_sound.set_volume(0.5)
-explosion_sound = pygame.mixer.Sound("lander_explode.wav")
-menu_button_hover = pygame.mixer.Sound("menu_button_hover.wav")
-menu_button_accept = pygame.mixer.Sound("menu_button_accept.wav")
-menu_button_accept.set_volume(0.06)
+def load_menu_sounds():
+    # the menu buttons play these as soon as the mouse is over them, so they load before the first frame
+    global menu_button_hover, menu_button_accept
+    menu_button_hover = pygame.mixer.Sound("menu_button_hover.wav")
+    menu_button_accept = pygame.mixer.Sound("menu_button_accept.wav")
+    menu_button_accept.set_volume(0.06)
+
+def load_sounds():
+    global thrust_sound, explosion_sound
+    if "menu_button_hover" not in globals():
+        load_menu_sounds()
+    thrust_sound = pygame.mixer.Sound("lander_thrust.mp3")
+    thrust_sound.set_volume(0.5)
+    explosion_sound = pygame.mixer.Sound("lander_explode.wav")
+
+# ----------------------------------------
+# audio engine
+# ----------------------------------------
+# the engine, explosions and menu sounds each get a reserved mixer channel, so a burst of sounds can
+# never take the engine's. The engine loop isn't stopped and restarted every time SPACE is tapped
+# (cutting a waveform mid-cycle clicks): it keeps looping and its volume ramps up and down over a few
+# milliseconds, and is only stopped once it has been silent for a while. Menu sounds are rate limited.
+# Nothing here touches the mixer on a frame where nothing changed
+AUDIO_FREQUENCY    = 44100
+AUDIO_BUFFER       = 256    # samples, about 6ms at 44.1kHz; overridden by the "audio_buffer" setting
+ENGINE_CHANNEL     = 0
+EXPLOSION_CHANNEL  = 1
+UI_CHANNEL         = 2
+ENGINE_FADE_IN_MS  = 30
+ENGINE_FADE_OUT_MS = 80
+ENGINE_IDLE_MS     = 2000   # stop the silent engine loop after this long without thrust
+UI_SOUND_GAP_MS    = 80     # the same menu sound won't play again any sooner than this
+
+class AudioEngine:
+    def __init__(self):
+        # channels below the reserved count are never picked by Sound.play()
+        pygame.mixer.set_reserved(3)
+        self.engine_channel    = pygame.mixer.Channel(ENGINE_CHANNEL)
+        self.explosion_channel = pygame.mixer.Channel(EXPLOSION_CHANNEL)
+        self.ui_channel        = pygame.mixer.Channel(UI_CHANNEL)
+
+        self.engine_on         = False
+        self.engine_playing    = False
+        self.engine_volume     = 0.0
+        self.engine_idle_since = 0
+        self.last_ticks        = pygame.time.get_ticks()
+        self.ui_last_played    = {}   # sound -> ticks it last played
+
+    def set_engine(self, on):
+        # called every frame with whether anything is thrusting; update() does the fading
+        self.engine_on = on
+        if on and not self.engine_playing:
+            self.engine_channel.set_volume(0.0)
+            self.engine_channel.play(thrust_sound, loops=-1)
+            self.engine_playing = True
+            self.engine_volume  = 0.0
+
+    def update(self):
+        # once a frame: move the engine's volume towards full or silent
+        now = pygame.time.get_ticks()
+        elapsed = now - self.last_ticks
+        self.last_ticks = now
+        if not self.engine_playing:
+            return
+
+        if self.engine_on:
+            volume = min(1.0, self.engine_volume + elapsed / ENGINE_FADE_IN_MS)
+            self.engine_idle_since = now
+        else:
+            volume = max(0.0, self.engine_volume - elapsed / ENGINE_FADE_OUT_MS)
+            if volume == 0.0 and now - self.engine_idle_since > ENGINE_IDLE_MS:
+                self.engine_channel.stop()
+                self.engine_playing = False
+                return
+        if volume != self.engine_volume:
+            self.engine_volume = volume
+            self.engine_channel.set_volume(volume)
+
+    def play_explosion(self):
+        self.explosion_channel.play(explosion_sound)
+
+    def play_ui(self, sound):
+        now = pygame.time.get_ticks()
+        if now - self.ui_last_played.get(sound, -UI_SOUND_GAP_MS) < UI_SOUND_GAP_MS:
+            return
+        self.ui_last_played[sound] = now
+        self.ui_channel.play(sound)
+
+# ----------------------------------------
+# staged startup
+# ----------------------------------------
+# the menu is shown as soon as the display, fonts, menu background and menu sounds are ready.
+# Game sounds and collision shapes load on a thread behind it, and the backup copies on another.
+# Every stage's time is appended to the startup log so time to first frame can be checked
+STARTUP_LOG_FILE       = os.path.join(SOURCE_FOLDER, "startup_times.log")
+FIRST_FRAME_BUDGET_MS  = 500
+
+class StartupLog:
+    def __init__(self):
+        # (stage, thread, started at ms, took ms), appended from either thread; created first thing
+        # in the entry point, so everything up to now was loading the modules
+        self.stages = [("imports", "main", 0.0, round((time.perf_counter() - BOOT_START) * 1000, 1))]
+        self.first_frame_ms = None
+
+    def run(self, name, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        thread = "main" if threading.current_thread() is threading.main_thread() else "background"
+        self.stages.append((name, thread, round((start - BOOT_START) * 1000, 1),
+                            round((time.perf_counter() - start) * 1000, 1)))
+        return result
+
+    def mark_first_frame(self):
+        self.first_frame_ms = round((time.perf_counter() - BOOT_START) * 1000, 1)
+
+    def over_budget(self):
+        return self.first_frame_ms is not None and self.first_frame_ms > FIRST_FRAME_BUDGET_MS
+
+    def write(self):
+        entry = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "first_frame_ms": self.first_frame_ms,
+            "budget_ms": FIRST_FRAME_BUDGET_MS,
+            "loaded_ms": round(max(start + took for _, _, start, took in self.stages), 1) if self.stages else None,
+            "stages": [{"stage": name, "thread": thread, "start_ms": start, "ms": took}
+                       for name, thread, start, took in self.stages]
+        }
+        try:
+            with open(STARTUP_LOG_FILE, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as err:
+            print(f"Startup log save failed: {err}")
+        if self.over_budget():
+            print(f"Startup over budget: first frame after {self.first_frame_ms}ms (budget {FIRST_FRAME_BUDGET_MS}ms)")
+
+
+class BackgroundLoader:
+    # runs (name, function, *args) stages in order on one thread; nothing here may touch the display
+    def __init__(self, startup_log, stages):
+        self.stages    = stages
+        self.completed = 0
+        self.current   = stages[0][0] if stages else None
+        self.thread = threading.Thread(target=self._work, args=(startup_log,), daemon=True)
+        self.thread.start()
+
+    def _work(self, startup_log):
+        for name, function, *args in self.stages:
+            self.current = name
+            startup_log.run(name, function, *args)
+            self.completed += 1
+
+    @property
+    def done(self):
+        return self.completed == len(self.stages)
+
+    def wait(self):
+        # the game needs everything loaded before it can react to any input
+        self.thread.join()
+
+    def draw(self, surface):
+        # a thin progress bar along the bottom of the menu
+        bar = pygame.Rect(0, HEIGHT - 6, WIDTH * self.completed // max(1, len(self.stages)), 6)
+        pygame.draw.rect(surface, ORANGE, bar)
+        text = small_font.render(f"Loading {self.current}...", True, GREY)
+        surface.blit(text, text.get_rect(bottomright=(WIDTH - 20, HEIGHT - 14)))
 
 # ----------------------------------------
 # score system
@@ -252,6 +709,16 @@ def calculate_score(fuel_remaining, elapsed_time_seconds, landed):
     landing_bonus = 200
     return fuel_score + time_score + landing_bonus
 
+def calculate_score_fixed(fuel_remaining, ticks, landed):
+    # the same score for deterministic runs, in whole numbers only and timed in frames rather than by the
+    # clock, so re-simulating a run's inputs anywhere gives exactly the score it was awarded
+    if not landed:
+        return 0
+    fuel_score = fuel_remaining * 500 // START_FUEL
+    time_score = max(0, 300 - (ticks * 2 + 59) // 60)
+    landing_bonus = 200
+    return fuel_score + time_score + landing_bonus
+
 # ----------------------------------------
 # button class
 # ----------------------------------------
@@ -270,7 +737,7 @@ class Button:
 
         # play the hover sound once when the mouse first moves over the button
         if hovered and not self.hovered_last_frame:
-            menu_button_hover.play()
+            audio.play_ui(menu_button_hover)
         self.hovered_last_frame = hovered
 
         fill_colour   = ORANGE if hovered else BLACK
@@ -302,13 +769,15 @@ class Menu:
         self.margin_y = 50
 
         # anchor the stack of buttons to the bottom-left corner
-        start_y = HEIGHT - self.margin_y - (self.button_height * 4 + self.spacing * 3)
+        start_y = HEIGHT - self.margin_y - (self.button_height * 6 + self.spacing * 5)
 
         self.buttons = [
             Button(self.margin_x, start_y, self.button_width, self.button_height, "Tutorial", "TUTORIAL"),
             Button(self.margin_x, start_y + self.button_height + self.spacing, self.button_width, self.button_height, "Levels", "LEVELS"),
             Button(self.margin_x, start_y + (self.button_height + self.spacing) * 2, self.button_width, self.button_height, "Begin", "BEGIN"),
-            Button(self.margin_x, start_y + (self.button_height + self.spacing) * 3, self.button_width, self.button_height, "Exit", "EXIT")
+            Button(self.margin_x, start_y + (self.button_height + self.spacing) * 3, self.button_width, self.button_height, "Endless", "ENDLESS"),
+            Button(self.margin_x, start_y + (self.button_height + self.spacing) * 4, self.button_width, self.button_height, "Versus", "VERSUS"),
+            Button(self.margin_x, start_y + (self.button_height + self.spacing) * 5, self.button_width, self.button_height, "Exit", "EXIT")
         ]
 
     def draw(self):
@@ -323,7 +792,7 @@ class Menu:
         for button in self.buttons:
             action = button.handle_event(event)
             if action:
-                menu_button_accept.play()
+                audio.play_ui(menu_button_accept)
                 return action
 
 # ----------------------------------------
@@ -494,12 +963,12 @@ class LevelScroller:
 
             action = self.return_button.handle_event(event)
             if action:
-                menu_button_accept.play()
+                audio.play_ui(menu_button_accept)
                 return action
 
             # clicking a hovered unlocked card starts that level
             if event.button == 1 and self.hovered_card:
-                menu_button_accept.play()
+                audio.play_ui(menu_button_accept)
                 return self.hovered_card
 
         return None
@@ -530,19 +999,121 @@ class Particle:
         # particle dies once it hits its age limit
         return self.age < self.lifetime
 
-    def draw(self, surface):
+    def draw(self, surface, scale=1.0):
         # fade out and shrink the particle as it gets older
         alpha_ratio = 1.0 - (self.age / self.lifetime)
-        radius = max(1, int(self.size * alpha_ratio))
+        radius = max(1, int(self.size * alpha_ratio * scale))
         r = int(self.colour[0] * alpha_ratio)
         g = int(self.colour[1] * alpha_ratio)
         b = int(self.colour[2] * alpha_ratio)
-        pygame.draw.circle(surface, (r, g, b), (int(self.x), int(self.y)), radius)
+        pygame.draw.circle(surface, (r, g, b), (int(self.x * scale), int(self.y * scale)), radius)
+
+
+# explosion debris lands on the terrain instead of falling through it
+DEBRIS_COUNT        = 150    # pieces per explosion at full quality
+DEBRIS_GRAVITY      = 0.06   # same pull as the other particles
+DEBRIS_BOUNCE       = 0.35   # fraction of the speed into the ground that comes back out on a bounce
+DEBRIS_FRICTION     = 0.7    # fraction of the speed along the ground kept each time a piece touches it
+DEBRIS_SETTLE_SPEED = 0.4    # pieces hitting the ground slower than this stop bouncing
+DEBRIS_REST_SPEED   = 0.1    # and once they're sliding slower than this they come to rest
+
+class DebrisField:
+    # explosion debris kept as one list per property rather than one object per piece, so a tick is a
+    # few passes over the lists plus one batched ground lookup for every piece at once. Only the
+    # pieces that end up below the ground need any more work than that, and pieces that have come
+    # to rest sit exactly on the surface so they never count as below it again
+    def __init__(self, ground_heights=None):
+        self.heights = ground_heights   # surface y for every whole x, or None to ignore the ground
+        self.xs, self.ys, self.vxs, self.vys = [], [], [], []
+        self.ages, self.lifetimes, self.sizes, self.colours = [], [], [], []
+        self.resting = []
+
+    def __len__(self):
+        return len(self.xs)
+
+    def clear(self):
+        for name in ("xs", "ys", "vxs", "vys", "ages", "lifetimes", "sizes", "colours", "resting"):
+            getattr(self, name).clear()
+
+    def add(self, x, y, vx, vy, lifetime, colour, size):
+        self.xs.append(x)
+        self.ys.append(y)
+        self.vxs.append(vx)
+        self.vys.append(vy)
+        self.ages.append(0)
+        self.lifetimes.append(lifetime)
+        self.sizes.append(size)
+        self.colours.append(colour)
+        self.resting.append(False)
+
+    def update(self):
+        if not self.xs:
+            return
+        # same integration as Particle.update, for every piece at once
+        self.xs   = [x + vx for x, vx in zip(self.xs, self.vxs)]
+        self.ys   = [y + vy for y, vy in zip(self.ys, self.vys)]
+        self.vys  = [0.0 if resting else vy + DEBRIS_GRAVITY for vy, resting in zip(self.vys, self.resting)]
+        self.ages = [age + 1 for age in self.ages]
+
+        if self.heights is not None:
+            columns = [0 if x < 0 else (WIDTH if x > WIDTH else int(x)) for x in self.xs]
+            grounds = list(map(self.heights.__getitem__, columns))
+            for i in [i for i, (y, ground_y) in enumerate(zip(self.ys, grounds)) if y > ground_y]:
+                self._hit_ground(i, columns[i], grounds[i])
+
+        if any(age >= lifetime for age, lifetime in zip(self.ages, self.lifetimes)):
+            keep = [i for i, (age, lifetime) in enumerate(zip(self.ages, self.lifetimes)) if age < lifetime]
+            for name in ("xs", "ys", "vxs", "vys", "ages", "lifetimes", "sizes", "colours", "resting"):
+                column = getattr(self, name)
+                setattr(self, name, [column[i] for i in keep])
+
+    def _hit_ground(self, i, column, ground_y):
+        heights = self.heights
+        # the ground's upward normal from the slope either side of the piece (y points down the screen)
+        slope = (heights[min(WIDTH, column + 1)] - heights[max(0, column - 1)]) / 2
+        length = math.sqrt(1 + slope * slope)
+        nx, ny = slope / length, -1 / length
+
+        self.ys[i] = ground_y
+        vx, vy = self.vxs[i], self.vys[i]
+        into = vx * nx + vy * ny   # negative while moving into the ground
+        if into >= 0:
+            return
+        # split the velocity into along-the-ground and into-the-ground parts: drag the first, bounce the second
+        along_x, along_y = vx - into * nx, vy - into * ny
+        if -into > DEBRIS_SETTLE_SPEED:
+            rebound = -into * DEBRIS_BOUNCE
+        elif along_x * along_x + along_y * along_y < DEBRIS_REST_SPEED * DEBRIS_REST_SPEED:
+            self.vxs[i] = self.vys[i] = 0.0
+            self.resting[i] = True
+            return
+        else:
+            rebound = 0.0
+        self.vxs[i] = along_x * DEBRIS_FRICTION + rebound * nx
+        self.vys[i] = along_y * DEBRIS_FRICTION + rebound * ny
+
+    def draw(self, surface, scale=1.0):
+        # the same fade and shrink as Particle.draw
+        for x, y, age, lifetime, size, colour in zip(self.xs, self.ys, self.ages, self.lifetimes,
+                                                     self.sizes, self.colours):
+            fade = 1.0 - age / lifetime
+            radius = max(1, int(size * fade * scale))
+            pygame.draw.circle(surface, (int(colour[0] * fade), int(colour[1] * fade), int(colour[2] * fade)),
+                               (int(x * scale), int(y * scale)), radius)
 
 
 class ParticleSystem:
-    def __init__(self):
+    def __init__(self, density=1.0, ground=None):
         self.particles = []
+        # fraction of the usual particles to emit; the quality governor lowers it on slow machines
+        self.density = density
+        # explosion pieces bounce off the level's surface when the system is given its ground
+        self.debris = DebrisField(ground.surface_heights() if ground is not None else None)
+
+    def clear(self):
+        # drop everything in flight, for restarting a level
+        self.particles.clear()
+        self.debris.clear()
 
     def emit_thrust(self, lander_x, lander_y, angle):
         rad = math.radians(angle)
@@ -550,7 +1121,7 @@ class ParticleSystem:
         nozzle_x = lander_x + math.sin(rad) * 22
         nozzle_y = lander_y + math.cos(rad) * 20
 
-        for _ in range(3):
+        for _ in range(max(1, round(3 * self.density))):
             spread = random.uniform(-0.5, 0.5)
             speed  = random.uniform(1.5, 3.5)
             vx = math.sin(rad) * speed + spread
@@ -567,12 +1138,13 @@ class ParticleSystem:
 
     def emit_explosion(self, x, y):
         # burst of debris in all directions when the lander crashes
-        for _ in range(60):
+        for _ in range(max(1, round(DEBRIS_COUNT * self.density))):
             angle = random.uniform(0, 2 * math.pi)
             speed = random.uniform(1.0, 6.0)
             vx = math.cos(angle) * speed
             vy = math.sin(angle) * speed - random.uniform(0, 3)  # bias upward so it looks like an explosion
-            lifetime = random.randint(20, 45)
+            # long enough to see the pieces land and settle
+            lifetime = random.randint(60, 120)
             colour = random.choice([
                 (255, 80,   0),
                 (255, 200, 50),
@@ -580,17 +1152,19 @@ class ParticleSystem:
                 (255, 255,  0),
                 (150, 150, 150)
             ])
-            self.particles.append(Particle(x, y, vx, vy, lifetime, colour, size=random.randint(2, 6)))
+            self.debris.add(x, y, vx, vy, lifetime, colour, size=random.randint(2, 6))
 
     def update(self):
         # remove dead particles and update the rest
         self.particles = [p for p in self.particles if p.alive]
         for p in self.particles:
             p.update()
+        self.debris.update()
 
-    def draw(self, surface):
+    def draw(self, surface, scale=1.0):
         for p in self.particles:
-            p.draw(surface)
+            p.draw(surface, scale)
+        self.debris.draw(surface, scale)
 
 # ----------------------------------------
 # screen shake
@@ -623,52 +1197,151 @@ class ScreenShake:
 # wind system
 # ----------------------------------------
 class Wind:
-    # applies a horizontal force to the lander on levels 4 and 5
-    def __init__(self, level_name):
-        self.active = level_name in WIND_LEVELS
+    # applies a horizontal force to the lander on levels with wind settings (levels 4 and 5, and generated ones)
+    def __init__(self, level_name, rng=None):
         self.level_name = level_name
+        # direction and gusts come from this random source, so seeded simulations can repeat exactly
+        self.rng = rng or random
+        wind_data = LEVELS.get(level_name, {}).get("wind")
 
-        if level_name == "LEVEL_4":
-            self.base_force = WIND_FORCE_LEVEL_4
-        elif level_name == "LEVEL_5":
-            self.base_force = WIND_FORCE_LEVEL_5
+        if wind_data is not None:
+            self.base_force = wind_data["force"]
+            self.gusty      = wind_data["gusty"]
         else:
             self.base_force = 0.0
+            self.gusty      = False
+
+        self.active = self.base_force > 0
 
         # pick a random starting wind direction; positive = right, negative = left
-        self.direction = random.choice([-1, 1])
+        self.direction = self.rng.choice([-1, 1])
         # gust timer is only used on level 5 to add unpredictable changes
         self.gust_timer = 0
         self.current_force = self.base_force * self.direction
+        # how far the patch pattern has drifted along the level
+        self.gust_offset = 0.0
+        if self.active:
+            self._build_field()
+
+    def _build_field(self):
+        # two grids sharing one layout (x across, altitude down, WIND_CELL apart), sampled bilinearly:
+        # shear follows the terrain and stays put, gusts repeat across the level so they can slide along it
+        terrain_points = LEVELS.get(self.level_name, {}).get("terrain_points", FLAT_GROUND)
+        cols = math.ceil(WIDTH  / WIND_CELL) + 1
+        rows = math.ceil(HEIGHT / WIND_CELL) + 1
+        noise_cols, noise_rows = WIND_NOISE_CELLS
+        noise = [[self.rng.uniform(-1, 1) for _ in range(noise_cols)] for _ in range(noise_rows + 1)]
+
+        self.field_cols = cols
+        self.field_rows = rows
+        self.shear = []
+        self.gusts = []
+        for row in range(rows):
+            y = row * WIND_CELL
+            v = row / (rows - 1) * noise_rows
+            iv = min(int(v), noise_rows - 1)
+            fv = v - iv
+            fv = fv * fv * (3 - 2 * fv)
+            for col in range(cols):
+                x = col * WIND_CELL
+                clearance = max(0.0, min(1.0, (get_terrain_y(terrain_points, x) - y) / WIND_SHEAR_HEIGHT))
+                clearance = clearance * clearance * (3 - 2 * clearance)
+                self.shear.append(WIND_GROUND_FACTOR + (1 - WIND_GROUND_FACTOR) * clearance)
+
+                # smoothed value noise; the last column wraps round to the first
+                u = (col % (cols - 1)) / (cols - 1) * noise_cols
+                iu = int(u)
+                fu = u - iu
+                fu = fu * fu * (3 - 2 * fu)
+                iu1 = (iu + 1) % noise_cols
+                top    = noise[iv][iu]     + (noise[iv][iu1]     - noise[iv][iu])     * fu
+                bottom = noise[iv + 1][iu] + (noise[iv + 1][iu1] - noise[iv + 1][iu]) * fu
+                # noise runs -1..1, so the level's force is the ceiling and calm patches sit below it
+                self.gusts.append(1 - WIND_VARIATION * (1 - (top + (bottom - top) * fv)) / 2)
+
+    def force_at(self, x, y):
+        # the sideways push at one point this frame
+        return self.forces_at((x,), (y,))[0]
+
+    def forces_at(self, xs, ys):
+        # one push per (x, y) pair; a plain loop over flat lists so batch simulations can sample
+        # thousands of points a frame
+        if not self.active:
+            return [0.0] * len(xs)
+        shear, gusts, cols = self.shear, self.gusts, self.field_cols
+        scale  = 1.0 / WIND_CELL
+        max_gx = cols - 1.000001
+        max_gy = self.field_rows - 1.000001
+        period = cols - 1
+        offset = self.gust_offset
+        force  = self.current_force
+        forces = []
+        for x, y in zip(xs, ys):
+            gx = x * scale
+            gy = y * scale
+            gx = 0.0 if gx < 0 else (max_gx if gx > max_gx else gx)
+            gy = 0.0 if gy < 0 else (max_gy if gy > max_gy else gy)
+            ix = int(gx)
+            iy = int(gy)
+            fx = gx - ix
+            fy = gy - iy
+
+            i = iy * cols + ix
+            top    = shear[i]        + (shear[i + 1]        - shear[i])        * fx
+            bottom = shear[i + cols] + (shear[i + cols + 1] - shear[i + cols]) * fx
+            sheared = top + (bottom - top) * fy
+
+            # the gust pattern is sampled where it has drifted to
+            hx = ((x - offset) * scale) % period
+            jx = int(hx)
+            hx -= jx
+            j = iy * cols + jx
+            top    = gusts[j]        + (gusts[j + 1]        - gusts[j])        * hx
+            bottom = gusts[j + cols] + (gusts[j + cols + 1] - gusts[j + cols]) * hx
+            forces.append(force * sheared * (top + (bottom - top) * fy))
+        return forces
+
+    def snapshot(self):
+        # everything that changes as the wind blows, random source included; the grids never change once built
+        return (self.rng.getstate(), self.direction, self.gust_timer, self.current_force, self.gust_offset)
+
+    def restore(self, snapshot):
+        # blow exactly as it did from the moment the snapshot was taken
+        rng_state, self.direction, self.gust_timer, self.current_force, self.gust_offset = snapshot
+        self.rng.setstate(rng_state)
 
     def update(self):
         if not self.active:
             return
-        # on level 5 the wind randomly shifts direction every ~3 seconds
-        if self.level_name == "LEVEL_5":
+        # on gusty levels (level 5) the wind randomly shifts direction every ~3 seconds
+        if self.gusty:
             self.gust_timer += 1
             if self.gust_timer >= 180:   # roughly every 3 seconds at 60fps
                 self.gust_timer = 0
-                gust_delta = random.uniform(-0.01, 0.01)
+                gust_delta = self.rng.uniform(-0.01, 0.01)
                 # clamp so the wind doesn't go completely wild
-                self.current_force = max(-WIND_FORCE_LEVEL_5 * 1.5,
-                                         min(WIND_FORCE_LEVEL_5 * 1.5,
+                self.current_force = max(-self.base_force * 1.5,
+                                         min(self.base_force * 1.5,
                                              self.current_force + gust_delta))
+            # the stronger and weaker patches blow along with the wind
+            self.gust_offset += WIND_GUST_DRIFT if self.current_force >= 0 else -WIND_GUST_DRIFT
 
     def apply(self, lander):
-        # push the lander sideways every frame while wind is active
+        # push the lander sideways every frame while wind is active, by the wind where it is
         if self.active:
-            lander.speed_x += self.current_force
+            lander.speed_x += self.force_at(lander.x, lander.y)
 
-    def draw_indicator(self, surface):
-        # draw a small wind arrow and label on the HUD so the player knows which way the wind blows
+    def draw_indicator(self, surface, lander=None):
+        # draw a small wind arrow and label on the HUD so the player knows which way the wind blows;
+        # with a lander it shows the wind where the lander is, plus how it changes down to the ground
         if not self.active:
             return
 
         arrow_x = WIDTH - 160
         arrow_y = 30
-        strength = abs(self.current_force)
-        direction = 1 if self.current_force >= 0 else -1
+        force = self.force_at(lander.x, lander.y) if lander is not None else self.current_force
+        strength = abs(force)
+        direction = 1 if force >= 0 else -1
 
         # make the arrow longer when the wind is stronger
         shaft_len = int(strength / WIND_FORCE_LEVEL_5 * 80) + 30
@@ -685,9 +1358,60 @@ class Wind:
         label = small_font.render("Wind", True, CYAN)
         surface.blit(label, (arrow_x - 50, arrow_y - 10))
 
+        if lander is not None:
+            # a column of short bars for the wind below the lander, top of the level to the bottom
+            profile_heights = [HEIGHT * (i + 0.5) / 8 for i in range(8)]
+            forces = self.forces_at([lander.x] * len(profile_heights), profile_heights)
+            for i, profile_force in enumerate(forces):
+                bar_y = arrow_y + 24 + i * 9
+                bar_len = int(profile_force / WIND_FORCE_LEVEL_5 * 40)
+                colour = WHITE if abs(profile_heights[i] - lander.y) < HEIGHT / 16 else CYAN
+                pygame.draw.line(surface, colour, (arrow_x, bar_y), (arrow_x + bar_len, bar_y), 3)
+
 # ----------------------------------------
 # lander class
 # ----------------------------------------
+# the angle only moves in half-degree steps, so each rotated sprite is made once and shared by the
+# lander and any ghosts instead of rotating an image every frame
+LANDER_IMAGE_FILES = {"lander": "Lander.png", "crash": "Lander_Explosion.png"}
+GHOST_ALPHA = 90
+
+_lander_images = {}
+_rotated_lander_images = {}
+
+def get_lander_image(kind):
+    # "lander", "crash" or "ghost" (a see-through copy of the lander), scaled to the in-game size
+    image = _lander_images.get(kind)
+    if image is None:
+        if kind == "ghost":
+            image = get_lander_image("lander").copy()
+            image.fill((255, 255, 255, GHOST_ALPHA), special_flags=pygame.BLEND_RGBA_MULT)
+        else:
+            raw = surface_pool.convert(pygame.image.load(LANDER_IMAGE_FILES[kind]), alpha=True)
+            width  = int(raw.get_width()  * LANDER_SCALE)
+            height = int(raw.get_height() * LANDER_SCALE)
+            image = pygame.transform.smoothscale(raw, (width, height))
+        _lander_images[kind] = image
+    return image
+
+def get_rotated_lander_image(angle, kind="lander", scale=1.0):
+    # scale below 1 gives the sprite for a world layer drawn at a lower render scale
+    key = (kind, angle, scale)
+    image = _rotated_lander_images.get(key)
+    if image is None:
+        image = get_lander_image(kind)
+        if scale != 1.0:
+            width  = max(1, int(image.get_width()  * scale))
+            height = max(1, int(image.get_height() * scale))
+            image = pygame.transform.smoothscale(image, (width, height))
+        image = pygame.transform.rotate(image, angle)
+        _rotated_lander_images[key] = image
+    return image
+
+def blit_centred(surface, image, x, y):
+    surface.blit(image, image.get_rect(center=(x, y)))
+
+
 class Lander:
     def __init__(self):
         # start near the top-centre of the screen
@@ -697,177 +1421,1638 @@ class Lander:
         self.speed_y = 0
         self.speed_x = 0
 
-        self.thrust_sound_playing = False
         self.alive = True
         self.landed = False
         self.fuel = START_FUEL
         self.thrusting = False
 
-        # load both images upfront so we can swap to the crash image instantly
-        self.base_image     = self.scale_lander_image(pygame.image.load("Lander.png").convert_alpha())
-        self.crash_image    = self.scale_lander_image(pygame.image.load("Lander_Explosion.png").convert_alpha())
+        # both images come from the shared sprite cache, so restarting a level loads nothing
+        self.base_image  = get_lander_image("lander")
+        self.crash_image = get_lander_image("crash")
 
         self.image = self.base_image
         self.rect = self.image.get_rect(center=(self.x, self.y))
-
-    def scale_lander_image(self, image):
-        # shrink the raw image to the in-game lander size
-        width  = int(image.get_width()  * LANDER_SCALE)
-        height = int(image.get_height() * LANDER_SCALE)
-        return pygame.transform.smoothscale(image, (width, height))
+        self.fixed = None   # fixed-point state, when flown with the deterministic physics
 
     def get_collision_rect(self):
-        # shrink the hit-box a bit so the lander doesn't clip invisible pixels around the sprite
-        collision_rect = self.rect.inflate(-self.rect.width * 0.45, -self.rect.height * 0.35)
-        # shift it down slightly so the feet match the bottom of the sprite
-        collision_rect.y += int(self.rect.height * 0.12)
-        return collision_rect
+        # bounding box of the tabled collision shape at the current angle
+        _, left, right, bottom = get_lander_shape(self.angle, not self.alive)
+        top = -get_rotated_lander_size(self.angle)[1] / 2
+        return pygame.Rect(int(self.x + left), int(self.y + top), int(right - left), int(bottom - top))
 
     def update(self, gravity_scale=1.0, freeze_descent=False, landing_pad_rect=None,
-               terrain_points=None, particle_system=None, screen_shake=None, wind=None):
+               terrain_points=None, particle_system=None, screen_shake=None, wind=None, controls=None,
+               engine_sound=True, deterministic=False):
+
+        # the autopilot passes its own (thrust, turn_left, turn_right) instead of the keyboard
+        if controls is None:
+            keys = pygame.key.get_pressed()
+            controls = (keys[pygame.K_SPACE], keys[pygame.K_LEFT], keys[pygame.K_RIGHT])
+        # remember where the nozzle was before this frame's movement for the flame particles
+        start_x, start_y, start_angle = self.x, self.y, self.angle
+
+        # all of the movement, landing and crash logic is shared with the headless tools
+        step = step_lander_fixed if deterministic else step_lander
+        result = step(self, *controls, gravity_scale, freeze_descent, landing_pad_rect, terrain_points, wind)
+
+        # the engine fades in while firing and out as soon as SPACE is released (or descent is frozen
+        # in the tutorial). Versus mode shares one engine sound between every lander (engine_sound=False)
+        if engine_sound:
+            audio.set_engine(self.thrusting and not freeze_descent)
+        if self.thrusting and particle_system:
+            particle_system.emit_thrust(start_x, start_y, start_angle)
+
+        # pick up the rotated sprite for the current angle
+        self.image = get_rotated_lander_image(self.angle)
+
+        if result == CRASHED:
+            # swap to the explosion sprite
+            self.image = get_rotated_lander_image(self.angle, "crash")
+            self.rect  = self.image.get_rect(center=(self.x, self.y))
+
+            audio.play_explosion()
+
+            # kick off particles and screen shake
+            if particle_system:
+                particle_system.emit_explosion(self.x, self.y)
+            if screen_shake:
+                screen_shake.trigger()
+
+    def draw(self, surface, scale=1.0):
+        if scale == 1.0:
+            surface.blit(self.image, self.rect)
+            return
+        image = get_rotated_lander_image(self.angle, "lander" if self.alive else "crash", scale)
+        blit_centred(surface, image, self.x * scale, self.y * scale)
+
+# ----------------------------------------
+# headless physics
+# ----------------------------------------
+# step_lander results
+LANDED  = 'LANDED'
+CRASHED = 'CRASHED'
+
+_lander_sprite_size = None
+_rotated_lander_sizes = {}
+
+def get_rotated_lander_size(angle):
+    # the angle only ever moves in half-degree steps, so the rotated sprite size is tabled
+    # per angle instead of rotating an image every frame just to measure it
+    global _lander_sprite_size
+    size = _rotated_lander_sizes.get(angle)
+    if size is None:
+        if _lander_sprite_size is None:
+            image = pygame.image.load("Lander.png")
+            _lander_sprite_size = (int(image.get_width() * LANDER_SCALE), int(image.get_height() * LANDER_SCALE))
+        blank = pygame.Surface(_lander_sprite_size, pygame.SRCALPHA)
+        size = pygame.transform.rotate(blank, angle).get_size()
+        _rotated_lander_sizes[angle] = size
+    return size
+
+# ----------------------------------------
+# exact trig tables
+# ----------------------------------------
+# sin and cos for every half-degree the lander can point (-90 to 90 degrees), worked out once from
+# their Taylor series in Python's whole-number arithmetic. libm's sin and cos may differ in the last
+# bit between platforms; these come out the same everywhere. The collision shapes and the
+# deterministic physics both use them
+TRIG_SHIFT = 62
+TRIG_PI    = 14488038916154245685   # pi * 2**62
+
+def _exact_sin_cos(half_degrees):
+    # (sin, cos) scaled by 2**TRIG_SHIFT
+    one = 1 << TRIG_SHIFT
+    x = half_degrees * TRIG_PI // 360
+    x_squared = x * x >> TRIG_SHIFT
+    sin_term, cos_term = x, one
+    sin_sum,  cos_sum  = x, one
+    for n in range(1, 16):
+        sin_term = (-sin_term * x_squared >> TRIG_SHIFT) // ((2 * n) * (2 * n + 1))
+        cos_term = (-cos_term * x_squared >> TRIG_SHIFT) // ((2 * n - 1) * (2 * n))
+        sin_sum += sin_term
+        cos_sum += cos_term
+    return sin_sum, cos_sum
+
+_exact_trig = [_exact_sin_cos(half_degrees) for half_degrees in range(-180, 181)]
+# as floats (whole-number division is rounded correctly, so these are exact to the last bit too)
+EXACT_SIN = [sin / (1 << TRIG_SHIFT) for sin, _ in _exact_trig]
+EXACT_COS = [cos / (1 << TRIG_SHIFT) for _, cos in _exact_trig]
 
-        # stop thrust sound immediately when descent is frozen (tutorial freeze moments)
-        if freeze_descent:
-            if self.thrust_sound_playing:
-                thrust_sound.stop()
-                self.thrust_sound_playing = False
+# ----------------------------------------
+# collision shapes
+# ----------------------------------------
+# the lander collides with its real outline: the convex hull of the sprite's solid pixels, rotated
+# to every half-degree the lander can reach and tabled at load time. Only the underside of the hull
+# is kept, since that's the only part that can touch the ground first
+LANDER_SHAPE_STEPS = 361   # -90 to 90 degrees in half-degree steps
+_lander_shapes = {}        # crashed? -> per-angle (underside, left, right, bottom)
+
+def _convex_hull(points):
+    # monotone chain; returns the hull anticlockwise (on screen) without repeated or collinear points
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for point in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+    for point in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+    return lower[:-1] + upper[:-1]
+
+def _hull_underside(hull):
+    # the part of the hull from its leftmost to its rightmost point that faces the ground
+    count = len(hull)
+    leftmost  = min(range(count), key=lambda i: (hull[i][0], -hull[i][1]))
+    rightmost = max(range(count), key=lambda i: (hull[i][0], hull[i][1]))
+    forwards  = [hull[(leftmost + i) % count] for i in range((rightmost - leftmost) % count + 1)]
+    backwards = [hull[(leftmost - i) % count] for i in range((leftmost - rightmost) % count + 1)]
+    # whichever way round passes lower down the screen is the underside
+    if sum(y for _, y in forwards) / len(forwards) >= sum(y for _, y in backwards) / len(backwards):
+        return forwards
+    return backwards
+
+def load_lander_shapes(crashed=False):
+    # builds the per-angle collision table for one of the two lander sprites
+    image = pygame.image.load("Lander_Explosion.png" if crashed else "Lander.png")
+    width  = int(image.get_width()  * LANDER_SCALE)
+    height = int(image.get_height() * LANDER_SCALE)
+    mask = pygame.mask.from_surface(pygame.transform.smoothscale(image, (width, height)))
+
+    # the outer corners of every row of solid pixels, measured from the sprite's centre
+    corners = []
+    for row in range(height):
+        solid = [column for column in range(width) if mask.get_at((column, row))]
+        if solid:
+            for corner_x in (solid[0], solid[-1] + 1):
+                corners.append((corner_x - width / 2, row - height / 2))
+                corners.append((corner_x - width / 2, row + 1 - height / 2))
+    hull = _convex_hull(corners)
+
+    # rotating the hull gives the hull of the rotated sprite, so only its corners need turning
+    table = []
+    for step in range(LANDER_SHAPE_STEPS):
+        cos_a, sin_a = EXACT_COS[step], EXACT_SIN[step]
+        # same direction as pygame.transform.rotate: positive angles turn anticlockwise on screen
+        rotated = [(hx * cos_a + hy * sin_a, hy * cos_a - hx * sin_a) for hx, hy in hull]
+        underside = _hull_underside(rotated)
+        table.append((
+            array("f", [value for point in underside for value in point]),
+            min(hx for hx, _ in rotated),
+            max(hx for hx, _ in rotated),
+            max(hy for _, hy in rotated)
+        ))
+    _lander_shapes[crashed] = table
+    return table
+
+def get_lander_shape(angle, crashed=False):
+    # (underside as flat x, y offsets, left, right, bottom) for the nearest tabled angle
+    table = _lander_shapes.get(crashed) or load_lander_shapes(crashed)
+    return table[int(round((max(-90, min(90, angle)) + 90) * 2))]
+
+def get_collision_box(angle):
+    # the shape's extents as (half width, bottom), for code that only needs a rough footprint
+    _, left, right, bottom = get_lander_shape(angle)
+    return max(-left, right), bottom
 
+# ----------------------------------------
+# swept collision
+# ----------------------------------------
+# the lander's shape is swept along the whole frame's movement and tested against every terrain
+# segment it passes over, so fast landers can't tunnel through a peak or clip a slope with a corner
+FLAT_GROUND = [(0, HEIGHT - 50), (WIDTH, HEIGHT - 50)]
+
+class TerrainIndex:
+    # the terrain polyline as segments sorted by x, so a sweep only tests the handful it spans
+    def __init__(self, terrain_points):
+        self.terrain_points = terrain_points
+        # carry the end heights on past the screen edges so a lander drifting off-screen still has ground
+        self.points = ([(-WIDTH, terrain_points[0][1])] + list(terrain_points)
+                       + [(2 * WIDTH, terrain_points[-1][1])])
+        self.xs = [x for x, _ in self.points]
+
+    def segments_between(self, left, right):
+        # indices i of the segments points[i] -> points[i + 1] that overlap left..right
+        first = max(0, bisect.bisect_right(self.xs, left) - 1)
+        last = min(len(self.points) - 1, bisect.bisect_left(self.xs, right))
+        return range(first, last)
+
+# lists can't be weakly referenced, so this maps id(terrain list) -> index, and an entry goes away
+# once nothing holds its index any more. Ground keeps its level's index alive, so a level that's
+# been swapped out (endless stages, --dev reloads) lets go of its index and its terrain together
+_terrain_indexes = weakref.WeakValueDictionary()
+
+def get_terrain_index(terrain_points):
+    # built once per terrain list and reused every frame
+    index = _terrain_indexes.get(id(terrain_points))
+    if index is None or index.terrain_points is not terrain_points:
+        index = TerrainIndex(terrain_points)
+        _terrain_indexes[id(terrain_points)] = index
+    return index
+
+FLAT_GROUND_INDEX = get_terrain_index(FLAT_GROUND)   # stands in when there is no terrain
+
+def _sweep_point(px, py, dx, dy, ax, ay, bx, by):
+    # fraction (0-1) of the move p -> p + d at which the point crosses segment a-b, or None if it doesn't
+    ex, ey = bx - ax, by - ay
+    denom = dx * ey - dy * ex
+    if denom == 0:
+        return None
+    qx, qy = ax - px, ay - py
+    t = (qx * ey - qy * ex) / denom
+    u = (qx * dy - qy * dx) / denom
+    if 0 <= t <= 1 and 0 <= u <= 1:
+        return t
+    return None
+
+def sweep_collision(x, y, dx, dy, angle, terrain_points, landing_pad_rect=None):
+    # first touch of the lander's shape moving from (x, y) by (dx, dy) against the terrain or pad top.
+    # returns (fraction of the move, touched_pad) or None if the move is clear
+    underside, left_offset, right_offset, bottom = get_lander_shape(angle)
+    left, right, bottom_y = x + left_offset, x + right_offset, y + bottom
+    index = get_terrain_index(terrain_points or FLAT_GROUND)
+    points = index.points
+
+    span = index.segments_between(min(left, left + dx), max(right, right + dx))
+    # nearly every frame is spent in the air: skip the sweep if the move stays above the highest ground it passes
+    highest = min(points[i][1] for i in range(span.start, span.stop + 1))
+    if landing_pad_rect is not None:
+        highest = min(highest, landing_pad_rect.top)
+    if max(bottom_y, bottom_y + dy) < highest:
+        return None
+
+    segments = [(points[i], points[i + 1], False) for i in span]
+    if landing_pad_rect is not None:
+        segments.append(((landing_pad_rect.left, landing_pad_rect.top),
+                         (landing_pad_rect.right, landing_pad_rect.top), True))
+
+    # the underside of the shape where the move starts
+    outline = [(x + underside[i], y + underside[i + 1]) for i in range(0, len(underside), 2)]
+    edges = list(zip(outline, outline[1:]))
+
+    first_t = None
+    touched_pad = False
+    for (ax, ay), (bx, by), is_pad in segments:
+        # the shape's corners running into the segment...
+        hits = [_sweep_point(px, py, dx, dy, ax, ay, bx, by) for px, py in outline]
+        # ...and the segment's end points (peaks, pad edges) running into the shape's edges, seen from the lander
+        for (px, py), (qx, qy) in edges:
+            hits.append(_sweep_point(ax, ay, -dx, -dy, px, py, qx, qy))
+            hits.append(_sweep_point(bx, by, -dx, -dy, px, py, qx, qy))
+        for t in hits:
+            # on a tie the pad wins, since it sits on top of the terrain
+            if t is not None and (first_t is None or t < first_t or (t == first_t and is_pad)):
+                first_t = t
+                touched_pad = is_pad
+
+    if first_t is None and bottom_y > get_terrain_y(terrain_points or FLAT_GROUND, x):
+        # already inside the ground (only possible if something placed it there)
+        return 0.0, False
+    if first_t is None:
+        return None
+    return first_t, touched_pad
+
+def step_lander(lander, thrust, turn_left, turn_right, gravity_scale=1.0, freeze_descent=False,
+                landing_pad_rect=None, terrain_points=None, wind=None):
+    # advance the lander by one frame; returns LANDED or CRASHED on touchdown, otherwise None.
+    # works on anything with the lander's attributes, so Lander and SimLander share it
+    lander.thrusting = False
+
+    # gravity pulls the lander down every frame unless frozen
+    if not freeze_descent:
+        lander.speed_y += GRAVITY * gravity_scale
+
+    # apply wind push if this level has wind
+    if wind and not freeze_descent:
+        wind.apply(lander)
+
+    # thrust fires the main engine upward relative to the lander's angle
+    if thrust and lander.fuel > 0 and not freeze_descent:
+        rad = math.radians(lander.angle)
+        lander.speed_x -= math.sin(rad) * THRUST
+        lander.speed_y -= math.cos(rad) * THRUST
+        lander.fuel -= 1
+        lander.thrusting = True
+
+    # rotate the lander with the arrow keys
+    if turn_left:
+        lander.angle += 1.5
+    if turn_right:
+        lander.angle -= 2.5
+
+    # prevent the lander from flipping completely upside down
+    lander.angle = max(-90, min(90, lander.angle))
+
+    # the sprite rect follows the current angle
+    lander.rect = pygame.Rect((0, 0), get_rotated_lander_size(lander.angle))
+    lander.rect.center = (lander.x, lander.y)
+
+    # skip vertical movement when frozen
+    if freeze_descent:
+        lander.speed_y = 0
+
+    # --- landing and crash detection, swept over the whole move ---
+    contact = sweep_collision(lander.x, lander.y, lander.speed_x, lander.speed_y, lander.angle,
+                              terrain_points, landing_pad_rect)
+    if contact is None:
+        lander.x += lander.speed_x
+        lander.y += lander.speed_y
+        return None
+
+    # stop the lander exactly where it first touched, so it sits flush on the surface
+    fraction, touched_pad = contact
+    lander.x += lander.speed_x * fraction
+    lander.y += lander.speed_y * fraction
+    lander.rect.center = (lander.x, lander.y)
+
+    # it has to come down on the pad itself, with its centre over it
+    on_landing_pad = (
+        touched_pad
+        and landing_pad_rect.left <= lander.x <= landing_pad_rect.right
+    )
+
+    # safe landing: on the pad, slow enough, and nearly upright
+    if on_landing_pad and abs(lander.speed_y) <= SAFE_SPEED and abs(lander.angle) <= 12:
+        lander.landed = True
+        return LANDED
+
+    # anything else is a crash, reported only the first time
+    if lander.alive:
+        lander.alive = False
+        return CRASHED
+    return None
+
+
+class SimLander:
+    # the lander's physical state without sprites or sound, for the headless tools
+    __slots__ = ("x", "y", "angle", "speed_x", "speed_y", "fuel", "alive", "landed", "thrusting", "rect", "fixed")
+
+    def __init__(self):
+        # same starting position as Lander
+        self.x = WIDTH // 2
+        self.y = 120
+        self.angle = 0
+        self.speed_y = 0
+        self.speed_x = 0
+        self.alive = True
+        self.landed = False
+        self.fuel = START_FUEL
         self.thrusting = False
-        keys = pygame.key.get_pressed()
+        self.rect = pygame.Rect((0, 0), get_rotated_lander_size(self.angle))
+        self.rect.center = (self.x, self.y)
+        self.fixed = None
+
+# ----------------------------------------
+# deterministic physics
+# ----------------------------------------
+# an optional second version of step_lander (--deterministic, or "deterministic" in the settings) that
+# keeps the lander's position and speed as fixed-point whole numbers (24 bits after the point) and its
+# angle as a count of half degrees, and points the engine with the exact trig tables instead of math.sin/cos.
+# A run flown this way comes out bit-identical on any machine, so a submitted replay can be checked
+# by flying it again (--verify-replays). The float x, y, speed and angle attributes are still kept
+# up to date for drawing, the HUD and the autopilot. Wind and the collision sweep are plain
+# floating-point sums, which IEEE 754 rounds the same everywhere
+FIXED_SHIFT   = 24
+FIXED_ONE     = 1 << FIXED_SHIFT
+FIXED_SIN     = [(sin + (1 << (TRIG_SHIFT - FIXED_SHIFT - 1))) >> (TRIG_SHIFT - FIXED_SHIFT) for sin, _ in _exact_trig]
+FIXED_COS     = [(cos + (1 << (TRIG_SHIFT - FIXED_SHIFT - 1))) >> (TRIG_SHIFT - FIXED_SHIFT) for _, cos in _exact_trig]
+PHYSICS_FIXED = "fixed"   # replay header value for runs flown with step_lander_fixed
+
+def set_fixed_physics_constants():
+    # GRAVITY and THRUST in fixed point; called again by the tuner after it changes them
+    global FIXED_GRAVITY, FIXED_THRUST
+    FIXED_GRAVITY = round(GRAVITY * FIXED_ONE)
+    FIXED_THRUST  = round(THRUST * FIXED_ONE)
+
+set_fixed_physics_constants()
+
+def step_lander_fixed(lander, thrust, turn_left, turn_right, gravity_scale=1.0, freeze_descent=False,
+                      landing_pad_rect=None, terrain_points=None, wind=None):
+    # step_lander in fixed point: same rules, same results. The fixed-point state lives in
+    # lander.fixed and is taken from the float attributes the first time the lander is stepped
+    if lander.fixed is None:
+        lander.fixed = (round(lander.x * FIXED_ONE), round(lander.y * FIXED_ONE),
+                        round(lander.speed_x * FIXED_ONE), round(lander.speed_y * FIXED_ONE),
+                        round(lander.angle * 2))
+    x, y, speed_x, speed_y, half_degrees = lander.fixed
+    lander.thrusting = False
+
+    if not freeze_descent:
+        speed_y += FIXED_GRAVITY if gravity_scale == 1.0 else round(GRAVITY * gravity_scale * FIXED_ONE)
+        if wind and wind.active:
+            speed_x += round(wind.force_at(x / FIXED_ONE, y / FIXED_ONE) * FIXED_ONE)
+
+    if thrust and lander.fuel > 0 and not freeze_descent:
+        speed_x -= FIXED_SIN[half_degrees + 180] * FIXED_THRUST >> FIXED_SHIFT
+        speed_y -= FIXED_COS[half_degrees + 180] * FIXED_THRUST >> FIXED_SHIFT
+        lander.fuel -= 1
+        lander.thrusting = True
+
+    # 1.5 and 2.5 degrees
+    if turn_left:
+        half_degrees += 3
+    if turn_right:
+        half_degrees -= 5
+    half_degrees = max(-180, min(180, half_degrees))
+    angle = half_degrees / 2
+
+    lander.rect = pygame.Rect((0, 0), get_rotated_lander_size(angle))
+    lander.rect.center = (x / FIXED_ONE, y / FIXED_ONE)
+
+    if freeze_descent:
+        speed_y = 0
+
+    result = None
+    contact = sweep_collision(x / FIXED_ONE, y / FIXED_ONE, speed_x / FIXED_ONE, speed_y / FIXED_ONE, angle,
+                              terrain_points, landing_pad_rect)
+    if contact is None:
+        x += speed_x
+        y += speed_y
+    else:
+        fraction, touched_pad = contact
+        x += round(speed_x * fraction)
+        y += round(speed_y * fraction)
+        lander.rect.center = (x / FIXED_ONE, y / FIXED_ONE)
+        on_landing_pad = (
+            touched_pad
+            and landing_pad_rect.left * FIXED_ONE <= x <= landing_pad_rect.right * FIXED_ONE
+        )
+        if on_landing_pad and abs(speed_y) <= SAFE_SPEED * FIXED_ONE and abs(half_degrees) <= 24:
+            lander.landed = True
+            result = LANDED
+        elif lander.alive:
+            lander.alive = False
+            result = CRASHED
+
+    lander.fixed = (x, y, speed_x, speed_y, half_degrees)
+    lander.x, lander.y = x / FIXED_ONE, y / FIXED_ONE
+    lander.speed_x, lander.speed_y = speed_x / FIXED_ONE, speed_y / FIXED_ONE
+    lander.angle = angle
+    return result
+
+def get_physics_step(physics):
+    # the step function a replay header's "physics" value was flown with (None for ordinary runs)
+    return step_lander_fixed if physics == PHYSICS_FIXED else step_lander
+
+def verify_replay(path):
+    # fly a replay's recorded keys again; returns (header, result, score, checksum) where the
+    # checksum covers the whole fixed-point trajectory, for comparing runs between machines
+    header = read_replay_header(path)
+    if header is None:
+        raise ValueError("not a replay, or from an unknown version")
+    return verify_replay_actions(header, read_replay_actions(path))
+
+def verify_replay_actions(header, actions):
+    # verify_replay for a replay that's already in memory
+    step = get_physics_step(header.get("physics"))
+    ground = Ground(header["level"])
+    wind   = Wind(header["level"], rng=random.Random(header["wind_seed"]))
+    lander = SimLander()
+    result = None
+    checksum = 0
+    ticks = 0
+    for action in actions:
+        wind.update()
+        result = step(lander, *action_to_controls(action), landing_pad_rect=ground.landing_pad_rect,
+                      terrain_points=ground.terrain_points, wind=wind)
+        ticks += 1
+        state = lander.fixed if lander.fixed is not None else (lander.x, lander.y, lander.speed_x, lander.speed_y)
+        checksum = zlib.crc32(repr(state).encode(), checksum)
+        if result is not None:
+            break
+    landed = result == LANDED
+    if header.get("physics") == PHYSICS_FIXED:
+        score = calculate_score_fixed(lander.fuel, ticks, landed)
+    else:
+        score = calculate_score(lander.fuel, ticks / 60, landed)
+    return header, result or "UNFINISHED", score, checksum
+
+def run_verify_replays_cli(options):
+    # deterministic replays must re-simulate to exactly their recorded result and score; older runs
+    # were timed by the clock, so only their result can be checked
+    init_pygame(headless=True)
+    load_lander_shapes()
+    load_lander_shapes(crashed=True)
+    failed = 0
+    for path in options.verify_replays:
+        try:
+            header, result, score, checksum = verify_replay(path)
+        except (OSError, ValueError, KeyError) as err:
+            print(f"{path}: unreadable ({err})")
+            failed += 1
+            continue
+        deterministic = header.get("physics") == PHYSICS_FIXED
+        ok = result == header["result"] and (score == header["score"] or not deterministic)
+        failed += not ok
+        detail = f"score {score}, recorded {header['score']}" if deterministic else "score not checkable (clock timed)"
+        print(f"{path}: {'OK' if ok else 'MISMATCH'} - {result}, {detail}, trajectory {checksum:08x}")
+    return 1 if failed else 0
+
+# ----------------------------------------
+# autopilot
+# ----------------------------------------
+AUTOPILOT_STEPS      = 3     # macro steps the autopilot looks ahead
+AUTOPILOT_STEP_TICKS = 16    # frames per macro step (3 x 16 = 0.8s of look-ahead)
+AUTOPILOT_BUDGET_MS  = 1.0   # decisions slower than this are counted as over budget
+AUTOPILOT_TOUCHDOWN_AIM   = 0.5   # fraction of SAFE_SPEED to aim for, leaving room for gusts
+AUTOPILOT_TOUCHDOWN_LIMIT = 0.6   # fraction of SAFE_SPEED a plan may touch down at and still count as safe
+ATTRACT_IDLE_SECONDS = 30   # menu idle time before the autopilot starts flying demo levels
+ATTRACT_END_SECONDS  = 3    # how long a finished demo flight stays on screen
+
+# each candidate plan is "turn towards this tilt and hold it, firing the engine this fraction of frames".
+# duties are multiples of the hover duty (GRAVITY / THRUST), so the plans still make sense if the physics is retuned
+AUTOPILOT_TILTS  = (-50, -30, -10, -5, 0, 5, 10, 30, 50)
+AUTOPILOT_DUTIES = (0.0, 1.05, 2.1, 3.0)
+AUTOPILOT_PLANS  = [(tilt_index, duty) for tilt_index in range(len(AUTOPILOT_TILTS)) for duty in AUTOPILOT_DUTIES]
+# the plan indices that share each tilt
+AUTOPILOT_GROUPS = [[i for i, (tilt_index, _) in enumerate(AUTOPILOT_PLANS) if tilt_index == k]
+                    for k in range(len(AUTOPILOT_TILTS))]
+
+class Autopilot:
+    # model-predictive control: roll every candidate plan forward with the game's own gravity,
+    # thrust and wind, score the outcomes, and fly the first frame of the best one. Replanned
+    # every frame, so it reacts to gusts straight away
+    def __init__(self):
+        self.terrain_key    = None
+        self.ground_tables  = None   # hit-box half width -> highest ground within that distance of each x
+        self.duty_carry  = 0.0   # spreads a fractional duty over frames: 0.35 fires about every third frame
+
+        # decision timing, in milliseconds
+        self.recent_ms   = deque(maxlen=600)   # the last ~10 seconds of frames
+        self.last_ms     = 0.0
+        self.max_ms      = 0.0
+        self.decisions   = 0
+        self.over_budget = 0
+
+    def prepare(self, ground):
+        # build the terrain tables up front (called from start_level) so the first decision isn't slow
+        self._ground_tables_for(ground)
+        self.duty_carry = 0.0
+
+    def _ground_tables_for(self, ground):
+        # for every whole x, the highest ground anywhere under a hit-box of each width centred there.
+        # built once per level, so a rollout checks the whole footprint with a single lookup
+        if self.terrain_key is ground.terrain_points:
+            return self.ground_tables
+        heights = ground.height_lut
+        if heights is None:
+            heights = [get_terrain_y(ground.terrain_points, x) for x in range(WIDTH + 1)]
+
+        half_widths = {math.ceil(get_collision_box(angle / 2)[0]) for angle in range(-180, 181)}
+        self.ground_tables = {}
+        for half_width in half_widths:
+            padded = [heights[0]] * half_width + list(heights) + [heights[-1]] * half_width
+            window = 2 * half_width + 1
+            self.ground_tables[half_width] = [min(padded[x:x + window]) for x in range(WIDTH + 1)]
+        self.terrain_key = ground.terrain_points
+        return self.ground_tables
+
+    def decide(self, lander, ground, wind=None):
+        # returns this frame's (thrust, turn_left, turn_right)
+        start = time.perf_counter()
+
+        ground_tables = self._ground_tables_for(ground)
+        pad = ground.landing_pad_rect
+        pad_half_width = pad.width / 2
+        wind_active = wind is not None and wind.active
+        n = AUTOPILOT_STEP_TICKS
+        drift = n * (n + 1) / 2   # how far a constant acceleration moves things over n frames
+        sin, cos, radians, sqrt = math.sin, math.cos, math.radians, math.sqrt
+        hover = GRAVITY / THRUST
+        # read from SAFE_SPEED each time so the tuner's sweeps move them too
+        touchdown_speed = SAFE_SPEED * AUTOPILOT_TOUCHDOWN_AIM
+        touchdown_limit = SAFE_SPEED * AUTOPILOT_TOUCHDOWN_LIMIT
+        plans = [(tilt_index, min(1.0, duty * hover)) for tilt_index, duty in AUTOPILOT_PLANS]
+        duties = [duty for _, duty in plans]
+        pad_top, pad_x = pad.top, pad.centerx
+
+        # every plan is rolled forward side by side, one macro step at a time, grouped by tilt so
+        # everything a tilt's plans share is worked out once per step
+        count  = len(plans)
+        xs     = [lander.x] * count
+        ys     = [lander.y] * count
+        vxs    = [lander.speed_x] * count
+        vys    = [lander.speed_y] * count
+        fuels  = [lander.fuel] * count
+        costs  = [0.0] * count
+        groups = [list(group) for group in AUTOPILOT_GROUPS]
+        tilt_angles = [lander.angle] * len(AUTOPILOT_TILTS)
+
+        for step in range(AUTOPILOT_STEPS):
+            # the wind is sampled once per tilt, where its first plan still flying has got to: plans
+            # sharing a tilt only differ in duty and stay within a wind cell or so of each other over
+            # the look-ahead (on the first step they're all still where the lander is)
+            if not wind_active:
+                tilt_winds = [0.0] * len(groups)
+            elif step == 0:
+                tilt_winds = [wind.force_at(lander.x, lander.y)] * len(groups)
+            else:
+                leaders = [group[0] for group in groups if group]
+                sampled = iter(wind.forces_at([xs[i] for i in leaders], [ys[i] for i in leaders]))
+                tilt_winds = [next(sampled) if group else 0.0 for group in groups]
+
+            for k, group in enumerate(groups):
+                if not group:
+                    continue
+                # turn at the game's turn rates, thrusting along the average angle
+                tilt  = AUTOPILOT_TILTS[k]
+                angle = tilt_angles[k]
+                if angle < tilt:
+                    new_angle = min(tilt, angle + 1.5 * n)
+                else:
+                    new_angle = max(tilt, angle - 2.5 * n)
+                rad = radians((angle + new_angle) / 2)
+                angle = tilt_angles[k] = new_angle
+                thrust_x = THRUST * sin(rad)
+                thrust_y = THRUST * cos(rad)
+                half_width, foot = get_collision_box(angle)
+                ground_table = ground_tables[math.ceil(half_width)]
+                upright = -11 <= angle <= 11
+                # come in upright
+                lean_cost = (abs(angle) - 10) ** 2 if abs(angle) > 10 else 0
+                wind_force = tilt_winds[k]
+
+                still_flying = []
+                for i in group:
+                    duty = duties[i] if fuels[i] > 0 else 0.0
+                    # the same integration step_lander does, for n frames at once
+                    ax = wind_force - duty * thrust_x
+                    ay = GRAVITY    - duty * thrust_y
+                    x  = xs[i] + vxs[i] * n + ax * drift
+                    y  = ys[i] + vys[i] * n + ay * drift
+                    vx = vxs[i] + ax * n
+                    vy = vys[i] + ay * n
+                    xs[i], ys[i], vxs[i], vys[i] = x, y, vx, vy
+                    fuels[i] -= duty * n
+                    cost = costs[i] + 0.003 * duty * n
+
+                    offset_x = pad_x - x
+                    over_pad = -pad_half_width < offset_x < pad_half_width
+                    bottom   = y + foot
+                    ground_y = ground_table[int(x) if 0 <= x <= WIDTH else (0 if x < 0 else WIDTH)]
+
+                    # touchdown ends the rollout: reward a safe one, heavily punish anything else
+                    if bottom >= (pad_top if over_pad else ground_y):
+                        if over_pad and vy <= touchdown_limit and upright:
+                            cost -= 50
+                        else:
+                            cost += 1000
+                        costs[i] = cost
+                        continue
+
+                    # speeds we'd like here: head for the pad, slow down on the way to whatever is below
+                    height = pad_top - bottom if over_pad else min(pad_top, ground_y - 25) - bottom
+                    target_vy = touchdown_speed
+                    if height > 0:
+                        target_vy += 0.12 * sqrt(height)
+                    elif not over_pad:
+                        # too close to terrain that isn't the pad: climb
+                        target_vy = -0.5
+                    # the lander can't hold still against the wind inside the 12 degree landing limit,
+                    # so aim upwind by however far the wind will carry it before touchdown
+                    frames_left = height / target_vy if height > 0 and target_vy > 0 else 1
+                    frames_left = 120 if frames_left > 120 else frames_left
+                    target_vx = 0.012 * offset_x - 0.5 * wind_force * frames_left
+                    target_vx = 2.5 if target_vx > 2.5 else (-2.5 if target_vx < -2.5 else target_vx)
+                    cost += 4 * (vx - target_vx) ** 2
+                    # falling too fast is far worse than falling too slowly, and climbing wastes fuel
+                    if vy > target_vy:
+                        cost += 8 * (vy - target_vy) ** 2
+                    else:
+                        cost += (target_vy - vy) ** 2
+                        if vy < 0 and height > 0:
+                            cost += 8 * vy * vy
+                    if over_pad and height < 80:
+                        cost += lean_cost
+                    costs[i] = cost
+                    still_flying.append(i)
+                groups[k] = still_flying
+
+        # plans still flying at the end of the look-ahead: prefer the ones that got closer to the pad
+        for group in groups:
+            for i in group:
+                costs[i] += 0.02 * abs(pad_x - xs[i]) + 0.01 * max(0, pad_top - ys[i])
+
+        best = min(range(count), key=costs.__getitem__)
+        tilt_index, duty = plans[best]
+        tilt = AUTOPILOT_TILTS[tilt_index]
+
+        # fly the first frame of the winning plan
+        turn_left  = lander.angle < tilt - 0.75
+        turn_right = lander.angle > tilt + 1.25
+        self.duty_carry += duty
+        thrust = self.duty_carry >= 1.0 and lander.fuel > 0
+        if thrust:
+            self.duty_carry -= 1.0
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.recent_ms.append(elapsed_ms)
+        self.decisions += 1
+        if elapsed_ms > AUTOPILOT_BUDGET_MS:
+            self.over_budget += 1
+
+        return thrust, turn_left, turn_right
+
+    def stats(self):
+        # timing summary for the HUD and the benchmark
+        recent = sorted(self.recent_ms)
+        return {
+            "last_ms": self.last_ms,
+            "mean_ms": sum(recent) / len(recent) if recent else 0.0,
+            "p99_ms": recent[int(len(recent) * 0.99)] if recent else 0.0,
+            "max_ms": self.max_ms,
+            "decisions": self.decisions,
+            "over_budget": self.over_budget
+        }
+
+
+def run_autopilot_bench_cli(options):
+    # flies every level (both wind directions on windy ones) and prints landings and decision times;
+    # fails if any flight's p99 decision time is over AUTOPILOT_BUDGET_MS
+    if options.seed is not None:
+        level_name = f"{ENDLESS_PREFIX}{options.seed}"
+        LEVELS[level_name] = generate_level(options.seed, options.difficulty)
+        level_names = [level_name]
+    else:
+        level_names = LEVEL_ORDER
+
+    landings = runs = 0
+    slowest_ms = 0.0
+    slow_flights = []
+    for level_name in level_names:
+        for direction in (-1, 1):
+            ground = Ground(level_name)
+            # seeded gusts so every bench run flies the same weather
+            wind = Wind(level_name, rng=random.Random(0))
+            if not wind.active and direction == 1:
+                continue
+            wind.current_force = wind.base_force * direction
+            autopilot = Autopilot()
+            autopilot.prepare(ground)
+            lander = SimLander()
+
+            result = None
+            for tick in range(1, CHECK_MAX_TICKS + 1):
+                wind.update()
+                result = step_lander(lander, *autopilot.decide(lander, ground, wind),
+                                     landing_pad_rect=ground.landing_pad_rect,
+                                     terrain_points=ground.terrain_points, wind=wind)
+                if result is not None:
+                    break
+
+            stats = autopilot.stats()
+            runs += 1
+            landings += result == LANDED
+            slowest_ms = max(slowest_ms, stats["max_ms"])
+            wind_label = f"wind {wind.current_force:+.3f}" if wind.active else "no wind"
+            print(f"{level_name} ({wind_label}): {result or 'TIMED OUT'} after {tick / 60:.1f}s, "
+                  f"fuel left {lander.fuel}")
+            print(f"  decisions {stats['decisions']}: {stats['mean_ms']:.3f}ms avg, {stats['p99_ms']:.3f}ms p99, "
+                  f"{stats['max_ms']:.3f}ms max, {stats['over_budget']} over {AUTOPILOT_BUDGET_MS}ms")
+            if stats["p99_ms"] > AUTOPILOT_BUDGET_MS:
+                slow_flights.append(f"{level_name} ({wind_label})")
+
+    print(f"Landed {landings} / {runs}, slowest decision {slowest_ms:.3f}ms")
+    if slow_flights:
+        print(f"p99 decision time over the {AUTOPILOT_BUDGET_MS}ms budget on: {', '.join(slow_flights)}")
+        return 1
+    return 0
 
-        # gravity pulls the lander down every frame unless frozen
-        if not freeze_descent:
-            self.speed_y += GRAVITY * gravity_scale
+# ----------------------------------------
+# replays
+# ----------------------------------------
+# a replay is one JSON header line followed by one byte per frame holding that frame's keys.
+# wind gusts come from a seeded random source, so replaying the keys reproduces the run exactly
+REPLAY_FOLDER  = os.path.join(SOURCE_FOLDER, "replays")
+REPLAY_VERSION = 2   # 2: the wind field draws from the seeded wind source
 
-        # apply wind push if this level has wind
-        if wind and not freeze_descent:
-            wind.apply(self)
+# keys are packed as a bit mask, so every combination is one number from 0 to 7
+ACTION_THRUST = 1
+ACTION_LEFT   = 2
+ACTION_RIGHT  = 4
 
-        # SPACE fires the main thruster upward relative to the lander's angle
-        if keys[pygame.K_SPACE] and self.fuel > 0 and not freeze_descent:
-            rad = math.radians(self.angle)
-            self.speed_x -= math.sin(rad) * THRUST
-            self.speed_y -= math.cos(rad) * THRUST
-            self.fuel -= 1
-            self.thrusting = True
+def controls_to_action(thrust, turn_left, turn_right):
+    return (ACTION_THRUST if thrust else 0) | (ACTION_LEFT if turn_left else 0) | (ACTION_RIGHT if turn_right else 0)
 
-            # loop the thrust sound while the engine is firing
-            if not self.thrust_sound_playing:
-                thrust_sound.play(-1)
-                self.thrust_sound_playing = True
+def action_to_controls(action):
+    return bool(action & ACTION_THRUST), bool(action & ACTION_LEFT), bool(action & ACTION_RIGHT)
 
-            if particle_system:
-                particle_system.emit_thrust(self.x, self.y, self.angle)
-        else:
-            # cut the engine sound as soon as the player releases SPACE
-            if self.thrust_sound_playing:
-                thrust_sound.stop()
-                self.thrust_sound_playing = False
-
-        # rotate the lander with the arrow keys
-        if keys[pygame.K_LEFT]:
-            self.angle += 1.5
-        if keys[pygame.K_RIGHT]:
-            self.angle -= 2.5
-
-        # prevent the lander from flipping completely upside down
-        self.angle = max(-90, min(90, self.angle))
-
-        # rebuild the rotated sprite each frame to match the current angle
-        self.image = pygame.transform.rotate(self.base_image, self.angle)
-        self.rect  = self.image.get_rect(center=(self.x, self.y))
-
-        # apply velocity; skip vertical movement when frozen
-        if freeze_descent:
-            self.speed_y = 0
+
+class ReplayRecorder:
+    # collects one level attempt's inputs in memory and writes them out when it ends
+    def __init__(self, level_name, wind_seed, deterministic=False):
+        self.level_name = level_name
+        self.wind_seed  = wind_seed
+        self.physics    = PHYSICS_FIXED if deterministic else None
+        self.actions    = bytearray()
+
+    def record(self, thrust, turn_left, turn_right):
+        self.actions.append(controls_to_action(thrust, turn_left, turn_right))
+
+    def save(self, result, score, autopilot_used=False):
+        # returns the path written, or None if the replay couldn't be saved
+        header = {
+            "version": REPLAY_VERSION,
+            "level": self.level_name,
+            "wind_seed": self.wind_seed,
+            "ticks": len(self.actions),
+            "result": result,
+            "score": score,
+            "autopilot": autopilot_used
+        }
+        # only deterministic runs say which physics they used, so older readers see nothing new
+        if self.physics is not None:
+            header["physics"] = self.physics
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        folder = os.path.join(REPLAY_FOLDER, self.level_name)
+        path = os.path.join(folder, f"{timestamp}.replay")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                f.write(self.actions)
+        except OSError as err:
+            print(f"Replay save failed: {err}")
+            return None
+        return path
+
+
+def read_replay_header(path):
+    # returns the header dict, or None if the file is missing or from an unknown version
+    try:
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    return header if header.get("version") == REPLAY_VERSION else None
+
+def read_replay_actions(path):
+    # the whole input stream at once, for the batch tools
+    with open(path, "rb") as f:
+        f.readline()
+        return f.read()
+
+def list_replays(level_name):
+    # every recorded replay for a level, oldest first
+    folder = os.path.join(REPLAY_FOLDER, level_name)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".replay"))
+
+def get_best_replay_path(level_name):
+    # the run behind best_scores[level_name]; a different extension keeps it out of list_replays
+    return os.path.join(REPLAY_FOLDER, level_name, "best.ghost")
+
+def save_best_replay(level_name, replay_path):
+    # called when a landing sets a new best score
+    try:
+        shutil.copyfile(replay_path, get_best_replay_path(level_name))
+    except OSError as err:
+        print(f"Best replay save failed: {err}")
+
+# ----------------------------------------
+# ghosts
+# ----------------------------------------
+# how many earlier runs to race against: the best run, then the highest scoring other landings
+GHOST_COUNT = 1
+
+class Ghost:
+    # an earlier run flown again next to the player's, one recorded byte per frame. The file is
+    # read as the ghost goes rather than loaded up front, and the run is re-simulated with its own
+    # seeded wind so only the inputs need to be stored. The file stays open until close() so a
+    # restarted level can rewind the ghost instead of loading it again
+    def __init__(self, path, ground):
+        self.file = open(path, "rb")
+        try:
+            header = json.loads(self.file.readline())
+            if header.get("version") != REPLAY_VERSION:
+                raise ValueError(f"unknown replay version {header.get('version')}")
+            self.score = header["score"]
+            self.wind  = Wind(header["level"], rng=random.Random(header["wind_seed"]))
+            self.step  = get_physics_step(header.get("physics"))
+        except (ValueError, KeyError):
+            self.file.close()
+            raise
+        self.data_start = self.file.tell()
+        self.wind_start = self.wind.snapshot()
+        self.ground   = ground
+        self.lander   = SimLander()
+        self.finished = False
+
+    def update(self):
+        # advance one frame in step with the live lander
+        if self.finished:
+            return
+        action = self.file.read(1)
+        if not action:
+            self.finished = True
+            return
+        self.wind.update()
+        self.step(self.lander, *action_to_controls(action[0]), landing_pad_rect=self.ground.landing_pad_rect,
+                  terrain_points=self.ground.terrain_points, wind=self.wind)
+        if self.lander.landed or not self.lander.alive:
+            self.finished = True
+
+    def rewind(self):
+        # back to the start of the run
+        self.file.seek(self.data_start)
+        self.wind.restore(self.wind_start)
+        self.lander   = SimLander()
+        self.finished = False
+
+    def close(self):
+        self.finished = True
+        self.file.close()
+
+    def draw(self, surface, scale=1.0):
+        # a crashed ghost just disappears; a landed one stays on the pad
+        if not self.lander.alive:
+            return
+        image = get_rotated_lander_image(self.lander.angle, "ghost", scale)
+        blit_centred(surface, image, self.lander.x * scale, self.lander.y * scale)
+
+
+def find_ghost_replays(level_name, count=GHOST_COUNT):
+    # the best run first, then the highest scoring other landings if more than one ghost is wanted
+    paths = []
+    best_path = get_best_replay_path(level_name)
+    if os.path.exists(best_path):
+        paths.append(best_path)
+    if count > len(paths):
+        landings = []
+        for path in list_replays(level_name):
+            header = read_replay_header(path)
+            if header is not None and header["result"] == LANDED:
+                landings.append((header["score"], path))
+        landings.sort(reverse=True)
+        # the best run also sits in the folder as an ordinary replay, so skip anything with its score
+        best_header = read_replay_header(best_path) if paths else None
+        for score, path in landings:
+            if best_header is not None and score == best_header["score"]:
+                continue
+            paths.append(path)
+    return paths[:count]
+
+def load_ghosts(level_name, ground, count=GHOST_COUNT):
+    ghosts = []
+    for path in find_ghost_replays(level_name, count):
+        try:
+            ghosts.append(Ghost(path, ground))
+        except (OSError, ValueError, KeyError) as err:
+            print(f"Ghost load failed for {path}: {err}")
+    return ghosts
+
+# ----------------------------------------
+# telemetry
+# ----------------------------------------
+# the last TELEMETRY_FRAMES frames of an attempt are kept in preallocated columns and written out when
+# it lands, crashes or the game quits. The file is a JSON header line followed by each column's
+# float32 values, oldest frame first, so writing it is a single copy on a background thread
+TELEMETRY_FOLDER  = os.path.join(SOURCE_FOLDER, "telemetry")
+TELEMETRY_FRAMES  = 60 * 60   # one minute at 60fps
+TELEMETRY_COLUMNS = ("x", "y", "speed_x", "speed_y", "angle", "fuel", "thrusting", "wind", "zoom", "frame_ms")
+
+class TelemetryRecorder:
+    def __init__(self, frames=TELEMETRY_FRAMES):
+        self.frames  = frames
+        # recording a frame only overwrites numbers in these, it never allocates
+        self.columns = tuple(array("f", bytes(4 * frames)) for _ in TELEMETRY_COLUMNS)
+        self.count   = 0      # frames recorded this attempt, including any that have been overwritten
+        self.level_name = None
+        self.writers = []
+
+    def reset(self, level_name):
+        self.count = 0
+        self.level_name = level_name
+
+    def record(self, lander, wind_force, zoom, frame_ms):
+        i = self.count % self.frames
+        values = (lander.x, lander.y, lander.speed_x, lander.speed_y, lander.angle, lander.fuel,
+                  lander.thrusting, wind_force, zoom, frame_ms)
+        for column, value in zip(self.columns, values):
+            column[i] = value
+        self.count += 1
+
+    def export(self, result):
+        # copies the ring into frame order here, then leaves the file writing to a thread
+        if self.count == 0 or self.level_name is None:
+            return
+        kept = min(self.count, self.frames)
+        start = self.count % self.frames if self.count > self.frames else 0
+        columns = [column[start:kept] + column[:start] for column in self.columns]
+        header = {
+            "level": self.level_name,
+            "result": result,
+            "columns": TELEMETRY_COLUMNS,
+            "frames": kept,
+            "first_frame": self.count - kept
+        }
+        self.count = 0
+
+        self.writers = [writer for writer in self.writers if writer.is_alive()]
+        writer = threading.Thread(target=write_telemetry, args=(header, columns), daemon=True)
+        writer.start()
+        self.writers.append(writer)
+
+    def wait(self):
+        # called on quit so the last attempt's file is finished before the process exits
+        for writer in self.writers:
+            writer.join()
+        self.writers = []
+
+
+def write_telemetry(header, columns):
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+    folder = os.path.join(TELEMETRY_FOLDER, header["level"])
+    path = os.path.join(folder, f"{timestamp}_{header['result']}.telemetry")
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for column in columns:
+                column.tofile(f)
+    except OSError as err:
+        print(f"Telemetry save failed: {err}")
+
+def read_telemetry(path):
+    # returns (header, {column name: array of floats})
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        columns = {}
+        for name in header["columns"]:
+            column = array("f")
+            column.fromfile(f, header["frames"])
+            columns[name] = column
+    return header, columns
+
+def run_telemetry_csv_cli(options):
+    # converts telemetry files to CSV (one row per frame) next to the originals
+    for path in options.telemetry_csv:
+        try:
+            header, columns = read_telemetry(path)
+        except (OSError, ValueError, EOFError) as err:
+            print(f"{path}: {err}")
+            return 1
+        csv_path = os.path.splitext(path)[0] + ".csv"
+        names = list(columns)
+        with open(csv_path, "w") as f:
+            f.write("frame," + ",".join(names) + "\n")
+            for i in range(header["frames"]):
+                f.write(f"{header['first_frame'] + i}," + ",".join(f"{columns[name][i]:g}" for name in names) + "\n")
+        print(f"{path} -> {csv_path} ({header['frames']} frames, {header['result']})")
+    return 0
+
+# ----------------------------------------
+# memory tracking
+# ----------------------------------------
+# F4 (or --trace-memory) traces Python allocations while the game runs, to catch memory that creeps up
+# on kiosks left running for days. The traced total is sampled at every level start and every game
+# state change; after a few warm-up levels (while caches fill) a snapshot is kept as the baseline,
+# and if the total has grown past the limit since then a report of what grew is written.
+# --soak starts, restarts and generates levels over and over and fails if the memory curve isn't flat
+MEMORY_REPORT_FOLDER   = os.path.join(SOURCE_FOLDER, "memory_reports")
+MEMORY_TRACE_DEPTH     = 1            # reports group by line, and deeper stacks make tracing much slower
+MEMORY_WARMUP_RESTARTS = 10           # level starts before the baseline is taken
+MEMORY_CHECK_RESTARTS  = 20           # compare against the baseline every this many level starts
+MEMORY_GROWTH_LIMIT    = 512 * 1024   # bytes the traced total may grow after warm-up
+MEMORY_REPORT_LINES    = 25
+SOAK_FRAMES_PER_LEVEL  = 5
+
+def get_resident_memory():
+    # the whole process's memory in bytes (surfaces and sounds live outside what tracemalloc sees),
+    # or None where /proc isn't available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class MemoryTracker:
+    def __init__(self):
+        self.enabled = False
+
+    def start(self):
+        tracemalloc.start(MEMORY_TRACE_DEPTH)
+        self.enabled       = True
+        self.restarts      = 0
+        self.history       = []   # traced bytes at each level start
+        self.state_sizes   = {}   # game state -> traced bytes when it was last entered
+        self.last_state    = None
+        self.baseline      = None
+        self.baseline_size = 0
+        self.flagged       = False
+
+    def stop(self):
+        # returns the path of the final report
+        path = self.write_report("stopped")
+        tracemalloc.stop()
+        self.enabled = False
+        return path
+
+    def _snapshot(self):
+        # collect first so garbage that just hasn't been freed yet doesn't look like a leak
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+
+    def on_state(self, state):
+        if self.enabled and state != self.last_state:
+            self.last_state = state
+            self.state_sizes[state] = tracemalloc.get_traced_memory()[0]
+
+    def on_level_start(self):
+        if not self.enabled:
+            return
+        gc.collect()
+        self.restarts += 1
+        size = tracemalloc.get_traced_memory()[0]
+        self.history.append(size)
+        if self.restarts == MEMORY_WARMUP_RESTARTS:
+            self.baseline = self._snapshot()
+            self.baseline_size = size
+        elif self.baseline is not None and self.restarts % MEMORY_CHECK_RESTARTS == 0:
+            growth = size - self.baseline_size
+            # only one report per run, or a real leak would write one every check
+            if growth > MEMORY_GROWTH_LIMIT and not self.flagged:
+                self.flagged = True
+                path = self.write_report(f"growth_{self.restarts}")
+                print(f"Memory grew {growth / 1024:.0f}KB over {self.restarts - MEMORY_WARMUP_RESTARTS} level starts, "
+                      f"see {path}")
+
+    def growth_per_restart(self):
+        # least-squares slope of the traced total after warm-up, in bytes per level start
+        samples = self.history[MEMORY_WARMUP_RESTARTS:]
+        if len(samples) < 2:
+            return 0.0
+        mean_x = (len(samples) - 1) / 2
+        mean_y = sum(samples) / len(samples)
+        numerator = sum((i - mean_x) * (size - mean_y) for i, size in enumerate(samples))
+        denominator = sum((i - mean_x) ** 2 for i in range(len(samples)))
+        return numerator / denominator
+
+    def write_report(self, label):
+        snapshot = self._snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        resident = get_resident_memory()
+        lines = [
+            f"Memory report ({label}) {datetime.datetime.now().isoformat(timespec='seconds')}",
+            f"level starts: {self.restarts}",
+            f"traced now: {current / 1024:.0f}KB, peak {peak / 1024:.0f}KB"
+            + (f", process resident: {resident / 1024 / 1024:.1f}MB" if resident else ""),
+            f"growth per level start after warm-up: {self.growth_per_restart():.0f} bytes",
+            "traced when each game state was last entered: "
+            + ", ".join(f"{state} {size / 1024:.0f}KB" for state, size in self.state_sizes.items()),
+            ""
+        ]
+        if self.baseline is not None:
+            lines.append(f"largest changes since the baseline (after level start {MEMORY_WARMUP_RESTARTS}):")
+            stats = snapshot.compare_to(self.baseline, "lineno")
         else:
-            self.y += self.speed_y
-
-        self.x += self.speed_x
-
-        # --- landing and crash detection ---
-        collision_rect = self.get_collision_rect()
-        ground_top = get_terrain_y(terrain_points, collision_rect.centerx) if terrain_points else HEIGHT - 50
-
-        over_landing_pad = False
-        landing_surface_top = ground_top
-        if landing_pad_rect is not None:
-            over_landing_pad = landing_pad_rect.left <= collision_rect.centerx <= landing_pad_rect.right
-            if over_landing_pad:
-                # use whichever surface is higher — pad top or raw terrain
-                landing_surface_top = min(ground_top, landing_pad_rect.top)
-
-        if collision_rect.bottom >= landing_surface_top:
-            # push the lander back up so it sits flush on the surface
-            penetration = collision_rect.bottom - landing_surface_top
-            self.y -= penetration
-            self.rect = self.image.get_rect(center=(self.x, self.y))
-            collision_rect = self.get_collision_rect()
-
-            on_landing_pad = (
-                landing_pad_rect is not None
-                and over_landing_pad
-                and abs(collision_rect.bottom - landing_pad_rect.top) <= 2
+            lines.append("largest allocations (no baseline yet):")
+            stats = snapshot.statistics("lineno")
+        lines += [str(stat) for stat in stats[:MEMORY_REPORT_LINES]]
+
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = os.path.join(MEMORY_REPORT_FOLDER, f"{timestamp}_{label}.txt")
+        try:
+            os.makedirs(MEMORY_REPORT_FOLDER, exist_ok=True)
+            with open(path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as err:
+            print(f"Memory report save failed: {err}")
+            return None
+        return path
+
+# ----------------------------------------
+# frame recording
+# ----------------------------------------
+# F9 (or --record) records what's on screen for cutting highlight clips. Each finished frame is
+# blitted into one of a few spare surfaces and a worker thread encodes it, piping raw frames to
+# ffmpeg when it's installed or saving a numbered PNG sequence when it isn't. If the encoder falls
+# behind and every spare surface is still waiting, that frame is dropped rather than waiting for it
+RECORDING_FOLDER = os.path.join(SOURCE_FOLDER, "recordings")
+RECORD_SLOTS     = 8     # frames that can be waiting for the encoder at once
+RECORD_FPS       = 60
+
+def write_png(path, pixels, size):
+    # pygame.image.save keeps hold of the interpreter while it compresses, which stalls the game
+    # loop, but zlib lets go of it, so the fallback PNGs are put together by hand
+    width, height = size
+    stride = width * 3
+    rows = b"".join(b"\0" + pixels[y * stride:(y + 1) * stride] for y in range(height))
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows, 1)))
+        f.write(chunk(b"IEND", b""))
+
+class FrameRecorder:
+    def __init__(self, slots=RECORD_SLOTS, drop_frames=True):
+        self.slots     = slots
+        # the offline renderer waits for a free slot instead, since it has no frame rate to keep up
+        self.drop_frames = drop_frames
+        self.recording = False
+        self.frames    = 0
+        self.dropped   = 0
+        self.path      = None
+        self.worker    = None
+
+    def start(self, surface, label="session", path=None):
+        # path is the output without an extension; by default it's a timestamped name in the recordings folder.
+        # returns False if the output folder can't be made
+        if self.recording:
+            return True
+        if path is None:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            path = os.path.join(RECORDING_FOLDER, f"{timestamp}_{label}")
+        ffmpeg = shutil.which("ffmpeg")
+        self.path = path + ".mp4" if ffmpeg else path
+        try:
+            os.makedirs(os.path.dirname(self.path) if ffmpeg else self.path, exist_ok=True)
+        except OSError as err:
+            # a read-only folder shouldn't crash the game, just warn and carry on without recording
+            print(f"Recording skipped due to filesystem error: {err}")
+            return False
+
+        size = surface.get_size()
+        self.free    = queue.Queue()
+        self.pending = queue.Queue()
+        for i in range(self.slots):
+            self.free.put(surface_pool.get(f"record_{i}", size))
+        self.frames  = 0
+        self.dropped = 0
+        self.recording = True
+        self.worker = threading.Thread(target=self._encode, args=(ffmpeg, size), daemon=True)
+        self.worker.start()
+        return True
+
+    def capture(self, surface):
+        # the only work done on the game loop is one blit into a free slot
+        if not self.recording:
+            return
+        try:
+            slot = self.free.get(block=not self.drop_frames)
+        except queue.Empty:
+            self.dropped += 1
+            return
+        slot.blit(surface, (0, 0))
+        self.pending.put(slot)
+        self.frames += 1
+
+    def stop(self):
+        # finishes encoding whatever is still queued before returning
+        if not self.recording:
+            return
+        self.recording = False
+        self.pending.put(None)
+        self.worker.join()
+        self.worker = None
+
+    def _encode(self, ffmpeg, size):
+        encoder = None
+        if ffmpeg:
+            encoder = subprocess.Popen(
+                [ffmpeg, "-y", "-loglevel", "error",
+                 "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size[0]}x{size[1]}", "-r", str(RECORD_FPS), "-i", "-",
+                 "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", self.path],
+                stdin=subprocess.PIPE
             )
+        number = 0
+        failed = False
+        while True:
+            slot = self.pending.get()
+            if slot is None:
+                break
+            # after a failure the slots still have to go back so the game loop keeps running
+            if not failed:
+                try:
+                    pixels = pygame.image.tobytes(slot, "RGB")
+                    if encoder is not None:
+                        encoder.stdin.write(pixels)
+                    else:
+                        write_png(os.path.join(self.path, f"frame_{number:06d}.png"), pixels, size)
+                except (OSError, pygame.error) as err:
+                    print(f"Recording failed: {err}")
+                    failed = True
+            number += 1
+            self.free.put(slot)
+        if encoder is not None:
+            try:
+                encoder.stdin.close()
+            except OSError:
+                pass
+            encoder.wait()
 
-            # safe landing: on the pad, slow enough, and nearly upright
-            if on_landing_pad and abs(self.speed_y) <= SAFE_SPEED and abs(self.angle) <= 12:
-                self.landed = True
-            else:
-                # anything else is a crash
-                if self.alive:
+    def draw_indicator(self, surface):
+        # drawn after the frame is captured so it never shows up in the recording
+        if self.recording and pygame.time.get_ticks() // 500 % 2 == 0:
+            pygame.draw.circle(surface, RED, (WIDTH - 30, 30), 10)
+        if self.recording and self.dropped:
+            text = small_font.render(f"{self.dropped} dropped", True, RED)
+            surface.blit(text, text.get_rect(topright=(WIDTH - 50, 20)))
 
-                    self.alive = False
+# ----------------------------------------
+# spectator broadcast
+# ----------------------------------------
+# a kiosk can send one small UDP packet per frame describing what's happening, and a viewer on
+# another machine draws the game from those packets (for mirroring kiosks onto a big screen).
+# The socket never blocks: a packet that can't be sent straight away is simply dropped
+BROADCAST_PORT    = 47474
+BROADCAST_MAGIC   = b"ML"
+BROADCAST_VERSION = 1
+# magic, version, sequence, game state, level name, generated level difficulty,
+# lander x, y, speed_x, speed_y, angle, fuel, flags, wind where the lander is,
+# particle count, centre x, centre y, spread, score, elapsed seconds
+BROADCAST_FORMAT  = struct.Struct("<2sBIB24sB5fHBfH3fHf")
+BROADCAST_STATES  = (MENU, PLAYING, ENDED, PAUSED)
+# flags
+BROADCAST_HAS_LANDER = 1
+BROADCAST_THRUSTING  = 2
+BROADCAST_ALIVE      = 4
+BROADCAST_LANDED     = 8
+
+def parse_address(text, default_host="127.0.0.1", default_port=BROADCAST_PORT):
+    # "host:port", "host" or ":port"
+    host, _, port = text.rpartition(":") if ":" in text else (text, "", "")
+    return host or default_host, int(port) if port else default_port
+
+def summarise_particles(particle_system):
+    # the viewer doesn't need every particle, just how many there are and roughly where
+    debris = particle_system.debris
+    xs = [p.x for p in particle_system.particles] + debris.xs
+    ys = [p.y for p in particle_system.particles] + debris.ys
+    count = len(xs)
+    if count == 0:
+        return 0, 0.0, 0.0, 0.0
+    centre_x = sum(xs) / count
+    centre_y = sum(ys) / count
+    spread = math.sqrt(sum((x - centre_x) ** 2 + (y - centre_y) ** 2 for x, y in zip(xs, ys)) / count)
+    return min(count, 0xFFFF), centre_x, centre_y, spread
+
+
+class BroadcastPublisher:
+    def __init__(self, address):
+        self.address  = address
+        self.sequence = 0
+        self.sent     = 0
+        self.dropped  = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)   # allow subnet broadcast addresses
+        self.sock.setblocking(False)
+
+    def publish(self, state, level_name, lander, wind, particle_system, score, elapsed_time):
+        flags = 0
+        x = y = speed_x = speed_y = angle = wind_force = 0.0
+        fuel = 0
+        if lander is not None:
+            flags = BROADCAST_HAS_LANDER
+            flags |= BROADCAST_THRUSTING if lander.thrusting else 0
+            flags |= BROADCAST_ALIVE if lander.alive else 0
+            flags |= BROADCAST_LANDED if lander.landed else 0
+            x, y, speed_x, speed_y, angle = lander.x, lander.y, lander.speed_x, lander.speed_y, lander.angle
+            fuel = max(0, int(lander.fuel))
+            wind_force = wind.force_at(x, y)
+
+        packet = BROADCAST_FORMAT.pack(
+            BROADCAST_MAGIC, BROADCAST_VERSION, self.sequence & 0xFFFFFFFF, BROADCAST_STATES.index(state),
+            level_name.encode()[:24], LEVELS.get(level_name, {}).get("difficulty", 0),
+            x, y, speed_x, speed_y, angle, fuel, flags, wind_force,
+            *summarise_particles(particle_system), max(0, min(0xFFFF, int(score))), elapsed_time
+        )
+        self.sequence += 1
+        try:
+            self.sock.sendto(packet, self.address)
+            self.sent += 1
+        except OSError:
+            # full send buffer (BlockingIOError) or no route to the viewer: skip this frame
+            self.dropped += 1
 
-                    # swap to the explosion sprite
-                    crash_rotated = pygame.transform.rotate(self.crash_image, self.angle)
-                    self.image = crash_rotated
-                    self.rect  = crash_rotated.get_rect(center=(self.x, self.y))
-                    
-                    explosion_sound.play()
+    def close(self):
+        self.sock.close()
 
-                    # kick off particles and screen shake
-                    if particle_system:
-                        particle_system.emit_explosion(self.x, self.y)
-                    if screen_shake:
-                        screen_shake.trigger()
 
-    def draw(self, surface):
-        surface.blit(self.image, self.rect)
+def unpack_broadcast(packet):
+    # returns a dict for a valid packet, or None for anything else arriving on the port
+    if len(packet) != BROADCAST_FORMAT.size:
+        return None
+    (magic, version, sequence, state, level_name, difficulty, x, y, speed_x, speed_y, angle, fuel, flags,
+     wind_force, particles, particle_x, particle_y, particle_spread, score, elapsed_time) = BROADCAST_FORMAT.unpack(packet)
+    if magic != BROADCAST_MAGIC or version != BROADCAST_VERSION or state >= len(BROADCAST_STATES):
+        return None
+    return {
+        "sequence": sequence, "state": BROADCAST_STATES[state],
+        "level": level_name.rstrip(b"\0").decode(errors="replace"), "difficulty": difficulty,
+        "x": x, "y": y, "speed_x": speed_x, "speed_y": speed_y, "angle": angle, "fuel": fuel, "flags": flags,
+        "wind": wind_force, "particles": particles, "particle_x": particle_x, "particle_y": particle_y,
+        "particle_spread": particle_spread, "score": score, "elapsed": elapsed_time
+    }
+
+
+class SpectatorView:
+    # draws one kiosk's game from its latest packet
+    def __init__(self):
+        self.level_name   = None
+        self.static_layer = None
+        self.lander       = SimLander()
+        self.hud          = HUD()
+
+    def _load_level(self, level_name, difficulty):
+        # generated levels are rebuilt from the seed in their name
+        compiled = None
+        if level_name.startswith(ENDLESS_PREFIX) and level_name not in LEVELS:
+            LEVELS[level_name] = generate_level(int(level_name[len(ENDLESS_PREFIX):]), max(1, difficulty))
+            compiled = compile_level(level_name, LEVELS[level_name]).finalise()
+        ground = Ground(level_name, compiled)
+        background = compiled.background if compiled else load_level_background(level_name)
+        self.static_layer = build_static_layer(background, ground).copy()
+        self.level_name = level_name
+
+    def draw(self, surface, packet, lost):
+        if packet["state"] == MENU or not packet["flags"] & BROADCAST_HAS_LANDER:
+            surface.blit(menu_background, (0, 0))
+            msg = font.render("Waiting for the next flight...", True, WHITE)
+            surface.blit(msg, msg.get_rect(center=(WIDTH // 2, HEIGHT // 2)))
+            return
+
+        if packet["level"] != self.level_name:
+            self._load_level(packet["level"], packet["difficulty"])
+        surface.blit(self.static_layer, (0, 0))
+
+        # the exhaust or explosion as one soft cloud
+        if packet["particles"]:
+            radius = int(min(120, 6 + packet["particle_spread"]))
+            cloud = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(cloud, (255, 150, 40, min(160, 40 + packet["particles"])), (radius, radius), radius)
+            surface.blit(cloud, (packet["particle_x"] - radius, packet["particle_y"] - radius))
+
+        lander = self.lander
+        lander.x, lander.y, lander.angle = packet["x"], packet["y"], packet["angle"]
+        lander.speed_x, lander.speed_y, lander.fuel = packet["speed_x"], packet["speed_y"], packet["fuel"]
+        alive = bool(packet["flags"] & BROADCAST_ALIVE)
+        blit_centred(surface, get_rotated_lander_image(lander.angle, "lander" if alive else "crash"), lander.x, lander.y)
+
+        self.hud.draw_level_name(packet["level"], surface)
+        self.hud.draw(lander, surface)
+        self.hud.draw_timer(packet["elapsed"], surface)
+        wind_text = small_font.render(f"Wind: {packet['wind']:+.3f}", True, CYAN)
+        surface.blit(wind_text, (20, 190))
+
+        if packet["state"] == PAUSED:
+            banner = font.render("PAUSED", True, WHITE)
+        elif packet["state"] == ENDED:
+            landed = packet["flags"] & BROADCAST_LANDED
+            banner = font.render(f"SAFE LANDING!  {packet['score']}" if landed else "CRASHED!", True,
+                                 GREEN if landed else RED)
+        else:
+            banner = None
+        if banner is not None:
+            surface.blit(banner, banner.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 130)))
+
+        lost_text = small_font.render(f"{lost} packets lost", True, GREY)
+        surface.blit(lost_text, lost_text.get_rect(bottomright=(WIDTH - 20, HEIGHT - 10)))
+
+
+def run_viewer_cli(options):
+    # a window that mirrors whichever kiosk is flying; listens on all interfaces by default
+    address = parse_address(options.viewer, default_host="0.0.0.0")
+    init_pygame()
+    load_backgrounds()
+    load_lander_shapes()
+    load_lander_shapes(crashed=True)
+    pygame.display.set_caption(f"Mars Lander - spectator ({address[0]}:{address[1]})")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(address)
+    sock.setblocking(False)
+
+    view    = SpectatorView()
+    latest  = {}   # sender -> (packet, local time it arrived)
+    lost    = {}   # sender -> packets missed, from gaps in the sequence numbers
+    shown   = None
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key in (pygame.K_q, pygame.K_ESCAPE)):
+                running = False
+
+        # take everything that arrived since the last frame and keep the newest per kiosk
+        while True:
+            try:
+                data, sender = sock.recvfrom(BROADCAST_FORMAT.size + 1)
+            except BlockingIOError:
+                break
+            packet = unpack_broadcast(data)
+            if packet is None:
+                continue
+            previous = latest.get(sender)
+            if previous is not None:
+                gap = packet["sequence"] - previous[0]["sequence"] - 1
+                if gap < 0:
+                    continue   # arrived out of order, already superseded
+                lost[sender] = lost.get(sender, 0) + gap
+            latest[sender] = (packet, time.monotonic())
+
+        # stay on the same kiosk while it's in a level, otherwise switch to the most recent one flying
+        now = time.monotonic()
+        for sender in [sender for sender, (_, arrived) in latest.items() if now - arrived > 5]:
+            del latest[sender]
+        if shown not in latest or latest[shown][0]["state"] == MENU:
+            flying = [sender for sender, (packet, _) in latest.items() if packet["state"] != MENU]
+            shown = max(flying or latest, key=lambda sender: latest[sender][1], default=None)
+
+        if shown is None:
+            screen.blit(menu_background, (0, 0))
+            msg = font.render(f"Listening for kiosks on port {address[1]}...", True, WHITE)
+            screen.blit(msg, msg.get_rect(center=(WIDTH // 2, HEIGHT // 2)))
+        else:
+            view.draw(screen, latest[shown][0], lost.get(shown, 0))
+
+        clock.tick(60)
+        pygame.display.flip()
+
+    sock.close()
+    pygame.quit()
+    return 0
 
 # ----------------------------------------
 # ground class
 # ----------------------------------------
 class Ground:
-    def __init__(self, level_name="LEVEL_1"):
+    def __init__(self, level_name="LEVEL_1", compiled=None):
         self.level_name = level_name
+        self.compiled   = compiled
+        self.height_lut = compiled.height_lut if compiled is not None else None
+        self._surface_heights = None
         level_data = LEVELS.get(level_name, LEVELS["LEVEL_1"])
         pad_data = level_data.get("landing_pad", LEVELS["LEVEL_1"]["landing_pad"])
         self.terrain_points = level_data.get("terrain_points", [(0, 700), (1200, 700)])
+        self.terrain_index  = get_terrain_index(self.terrain_points)   # keeps the collision index alive
 
         # build the landing pad rectangle from the level data
         self.landing_pad_rect = pygame.Rect(
             pad_data["x"], pad_data["y"], pad_data["width"], pad_data["height"]
         )
 
+    def terrain_height(self, x):
+        # table lookup for compiled levels, exact interpolation otherwise
+        if self.height_lut is not None:
+            return self.height_lut[int(max(0, min(WIDTH, x)))]
+        return get_terrain_y(self.terrain_points, x)
+
+    def surface_heights(self):
+        # the top of whatever is solid at every whole x, landing pad included; built on first use
+        if self._surface_heights is None:
+            if self.height_lut is not None:
+                heights = list(self.height_lut)
+            else:
+                heights = [get_terrain_y(self.terrain_points, x) for x in range(WIDTH + 1)]
+            pad = self.landing_pad_rect
+            for x in range(max(0, pad.left), min(WIDTH, pad.right) + 1):
+                heights[x] = min(heights[x], pad.top)
+            self._surface_heights = heights
+        return self._surface_heights
+
     def draw(self, surface):
-        # close the terrain polygon by adding two bottom-corner points
-        poly_points = list(self.terrain_points)
-        poly_points.append((self.terrain_points[-1][0], HEIGHT))
-        poly_points.append((self.terrain_points[0][0],  HEIGHT))
-
-        # use lighter colours for the tutorial so it looks distinct from the main levels
-        if self.level_name == "TUTORIAL":
-            ground_colour = (235, 235, 235)
-            edge_colour   = (200, 200, 200)
-        else:
-            ground_colour = GROUND
-            edge_colour   = (180, 60, 10)
+        # compiled levels already have the terrain baked into a single layer
+        if self.compiled is not None:
+            surface.blit(self.compiled.terrain_surface, (0, 0))
+            return
+        draw_terrain(surface, self.terrain_points, self.landing_pad_rect, self.level_name)
+
+
+def draw_terrain(surface, terrain_points, landing_pad_rect, level_name):
+    # close the terrain polygon by adding two bottom-corner points
+    poly_points = list(terrain_points)
+    poly_points.append((terrain_points[-1][0], HEIGHT))
+    poly_points.append((terrain_points[0][0],  HEIGHT))
+
+    # use lighter colours for the tutorial so it looks distinct from the main levels
+    if level_name == "TUTORIAL":
+        ground_colour = (235, 235, 235)
+        edge_colour   = (200, 200, 200)
+    else:
+        ground_colour = GROUND
+        edge_colour   = (180, 60, 10)
 
-        pygame.draw.polygon(surface, ground_colour, poly_points)
-        pygame.draw.lines(surface, edge_colour, False, self.terrain_points, 3)
-        # draw the landing pad on top of the terrain
-        pygame.draw.rect(surface, WHITE, self.landing_pad_rect)
+    pygame.draw.polygon(surface, ground_colour, poly_points)
+    pygame.draw.lines(surface, edge_colour, False, terrain_points, 3)
+    # draw the landing pad on top of the terrain
+    pygame.draw.rect(surface, WHITE, landing_pad_rect)
 
 # ----------------------------------------
 # HUD class
@@ -888,7 +3073,34 @@ class HUD:
         self._draw_fuel_bar(lander, surface)
 
         if wind:
-            wind.draw_indicator(surface)
+            wind.draw_indicator(surface, lander)
+
+    def draw_autopilot(self, autopilot, surface, demo=False):
+        # show that the autopilot is flying and how long its decisions take against the 16ms frame
+        stats = autopilot.stats()
+        label = "DEMO - press any key" if demo else "AUTOPILOT (A to take over)"
+        msg = small_font.render(label, True, CYAN)
+        surface.blit(msg, (20, HEIGHT - 70))
+        timing = small_font.render(
+            f"Plan: {stats['mean_ms']:.2f}ms avg  {stats['p99_ms']:.2f}ms p99  {stats['over_budget']} over budget",
+            True, WHITE
+        )
+        surface.blit(timing, (20, HEIGHT - 40))
+
+    def draw_render_stats(self, pool, clock, surface, quality=None):
+        # surfaces made or converted this frame should stay at 0 once a level is running
+        stats = pool.stats()
+        msg = small_font.render(
+            f"FPS: {clock.get_fps():.0f}  Surfaces: {stats['pooled']} pooled, {stats['allocations']} new, "
+            f"{stats['conversions']} converted this frame",
+            True, YELLOW
+        )
+        surface.blit(msg, msg.get_rect(bottomright=(WIDTH - 20, HEIGHT - 10)))
+        if quality is not None:
+            mode = "auto" if quality.enabled else "fixed"
+            msg = small_font.render(f"Quality: {len(QUALITY_LEVELS) - quality.level}/{len(QUALITY_LEVELS)} ({mode})",
+                                    True, YELLOW)
+            surface.blit(msg, msg.get_rect(bottomright=(WIDTH - 20, HEIGHT - 40)))
 
     def _draw_fuel_bar(self, lander, surface):
         bar_x      = 20
@@ -923,6 +3135,9 @@ class HUD:
         # convert "LEVEL_1" to "Level 1" for a friendlier display
         if level_name.startswith("LEVEL_"):
             display_name = level_name.replace("LEVEL_", "Level ")
+        elif level_name.startswith(ENDLESS_PREFIX):
+            # generated levels show their stage number instead of the seed
+            display_name = f"Endless {LEVELS[level_name]['difficulty']}"
         else:
             display_name = level_name.capitalize()
 
@@ -964,8 +3179,7 @@ class PauseMenu:
 
     def draw(self, surface):
         # semi-transparent black overlay to dim the game behind the pause panel
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 160))
+        overlay = surface_pool.get("pause_overlay", (WIDTH, HEIGHT), alpha=True, fill=(0, 0, 0, 160))
         surface.blit(overlay, (0, 0))
 
         pygame.draw.rect(surface, (20, 20, 20),  self.panel_rect, border_radius=14)
@@ -987,7 +3201,7 @@ class PauseMenu:
         for btn in self.buttons:
             action = btn.handle_event(event)
             if action:
-                menu_button_accept.play()
+                audio.play_ui(menu_button_accept)
                 return action
         return None
 
@@ -1102,6 +3316,70 @@ class TutorialGuide:
         surface.blit(title_text, (panel.x + 20, panel.y + 12))
         surface.blit(tip_text,   (panel.x + 20, panel.y + 52))
 
+# ----------------------------------------
+# surface pool
+# ----------------------------------------
+class SurfacePool:
+    # hands out surfaces already in the display's pixel format (so blits don't convert every
+    # frame) and keeps them by name, so the renderer reuses the same buffers frame after frame.
+    # It also counts how many surfaces had to be made or converted, per frame and overall
+    def __init__(self):
+        self.surfaces = {}   # (name, size, alpha) -> surface
+        self.frame_allocations  = 0
+        self.frame_conversions  = 0
+        self.last_allocations   = 0
+        self.last_conversions   = 0
+        self.total_allocations  = 0
+        self.total_conversions  = 0
+
+    def get(self, name, size, alpha=False, fill=None):
+        # the same name and size always gives back the same surface; fill only colours a new one
+        key = (name, tuple(size), alpha)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if alpha:
+                surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+            else:
+                surface = pygame.Surface(size).convert()
+            if fill is not None:
+                surface.fill(fill)
+            self.surfaces[key] = surface
+            self.frame_allocations += 1
+            self.total_allocations += 1
+        return surface
+
+    def convert(self, surface, alpha=False):
+        # one-off images (loaded files, scaled labels) are brought into the display format once
+        if self.is_display_format(surface, alpha):
+            return surface
+        self.frame_conversions += 1
+        self.total_conversions += 1
+        return surface.convert_alpha() if alpha else surface.convert()
+
+    def is_display_format(self, surface, alpha=False):
+        display = pygame.display.get_surface()
+        if display is None:
+            return True
+        if alpha:
+            return surface.get_flags() & pygame.SRCALPHA and surface.get_bitsize() == 32 \
+                and surface.get_masks()[:3] == display.get_masks()[:3]
+        return surface.get_bitsize() == display.get_bitsize() and surface.get_masks() == display.get_masks()
+
+    def end_frame(self):
+        self.last_allocations, self.frame_allocations = self.frame_allocations, 0
+        self.last_conversions, self.frame_conversions = self.frame_conversions, 0
+
+    def stats(self):
+        return {
+            "pooled": len(self.surfaces),
+            "allocations": self.last_allocations,
+            "conversions": self.last_conversions,
+            "total_allocations": self.total_allocations,
+            "total_conversions": self.total_conversions
+        }
+
+surface_pool = SurfacePool()
+
 # ----------------------------------------
 # camera zoom functions
 # ----------------------------------------
@@ -1111,27 +3389,95 @@ def get_zoom(lander, landing_pad_rect):
                           lander.y - landing_pad_rect.centery)
     return MAX_ZOOM if distance <= ZOOM_NEAR_DISTANCE else MIN_ZOOM
 
-def draw_zoomed_scene(scene_surface, zoom, focus_x, focus_y, shake_offset=(0, 0)):
-    # no scaling needed at 1x zoom; just blit with the shake offset applied
-    if zoom <= 1.0:
-        ox, oy = shake_offset
+def get_render_size(render_scale):
+    # size of the world layer for a given render scale
+    return max(1, int(WIDTH * render_scale)), max(1, int(HEIGHT * render_scale))
+
+def draw_zoomed_scene(scene_surface, zoom, focus_x, focus_y, shake_offset=(0, 0), smooth=True):
+    ox, oy = shake_offset
+
+    # no scaling needed at 1x zoom and full render scale; just blit with the shake offset applied
+    scale = scene_surface.get_width() / WIDTH
+    if zoom <= 1.0 and scale == 1.0:
         screen.blit(scene_surface, (ox, oy))
         return
 
-    # scale the whole scene up, then crop to the viewport centred on the focus point
-    scaled_width  = int(WIDTH  * zoom)
-    scaled_height = int(HEIGHT * zoom)
-    scaled_scene  = pygame.transform.smoothscale(scene_surface, (scaled_width, scaled_height))
-
-    scaled_focus_x = focus_x * zoom
-    scaled_focus_y = focus_y * zoom
+    # work out which part of the level is on screen, clamped so we never scroll outside it
+    crop_width  = WIDTH  / zoom
+    crop_height = HEIGHT / zoom
+    left = max(0, min(WIDTH  - crop_width,  focus_x - crop_width  / 2))
+    top  = max(0, min(HEIGHT - crop_height, focus_y - crop_height / 2))
+
+    # then scale only that part (at whatever resolution the scene was drawn) up to the window, once.
+    # A reduced render scale (or smooth=False) is there for speed, so it gets the plain scaler rather than smoothscale
+    area = pygame.Rect(int(left * scale), int(top * scale), int(crop_width * scale), int(crop_height * scale))
+    crop = scene_surface.subsurface(area.clip(scene_surface.get_rect()))
+    upscale = pygame.transform.smoothscale if scale == 1.0 and smooth else pygame.transform.scale
+    if shake_offset == (0, 0):
+        upscale(crop, (WIDTH, HEIGHT), screen)
+        return
+    display_buffer = surface_pool.get("zoom", (WIDTH, HEIGHT))
+    upscale(crop, (WIDTH, HEIGHT), display_buffer)
+    screen.blit(display_buffer, (ox, oy))
 
-    # clamp so we never scroll outside the scaled image
-    left = int(max(0, min(scaled_width  - WIDTH,  scaled_focus_x - WIDTH  / 2)))
-    top  = int(max(0, min(scaled_height - HEIGHT, scaled_focus_y - HEIGHT / 2)))
+# ----------------------------------------
+# quality governor
+# ----------------------------------------
+# the game steps its own effects down when frames take too long and back up when there's room,
+# one rung of this ladder at a time. From full quality the rungs give up smooth zoom scaling, then
+# half the particles, then render at 0.75 scale, then drop to a quarter of the particles at 0.5 scale
+# with no screen shake, and last of all the zoom itself
+QUALITY_LEVELS = (
+    {"smooth_zoom": True,  "particles": 1.0,  "render_scale": 1.0,  "shake": True,  "zoom": True},
+    {"smooth_zoom": False, "particles": 1.0,  "render_scale": 1.0,  "shake": True,  "zoom": True},
+    {"smooth_zoom": False, "particles": 0.5,  "render_scale": 1.0,  "shake": True,  "zoom": True},
+    {"smooth_zoom": False, "particles": 0.5,  "render_scale": 0.75, "shake": True,  "zoom": True},
+    {"smooth_zoom": False, "particles": 0.25, "render_scale": 0.5,  "shake": False, "zoom": True},
+    {"smooth_zoom": False, "particles": 0.25, "render_scale": 0.5,  "shake": False, "zoom": False},
+)
+QUALITY_WINDOW        = 60                  # frames per decision
+QUALITY_DROP_MS       = 1000 / 60 * 0.9     # slowest tenth of a window over this: step down
+QUALITY_RAISE_MS      = 1000 / 60 * 0.5     # slowest tenth under this...
+QUALITY_RAISE_WINDOWS = 5                   # ...for this many windows in a row: step back up
+
+class QualityGovernor:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.level   = 0
+        self.frame_ms = []
+        self.quiet_windows = 0   # windows in a row with enough headroom to step up
 
-    ox, oy = shake_offset
-    screen.blit(scaled_scene, (ox, oy), area=pygame.Rect(left, top, WIDTH, HEIGHT))
+    @property
+    def settings(self):
+        return QUALITY_LEVELS[self.level]
+
+    def record(self, frame_ms):
+        # returns True when the quality level changed this frame
+        if not self.enabled:
+            return False
+        self.frame_ms.append(frame_ms)
+        if len(self.frame_ms) < QUALITY_WINDOW:
+            return False
+        self.frame_ms.sort()
+        slow = self.frame_ms[int(QUALITY_WINDOW * 0.9)]
+        self.frame_ms.clear()
+
+        # dropping reacts to a single bad second, raising waits for several good ones in a row,
+        # and the gap between the two thresholds stops it bouncing between neighbouring levels
+        if slow > QUALITY_DROP_MS:
+            self.quiet_windows = 0
+            if self.level < len(QUALITY_LEVELS) - 1:
+                self.level += 1
+                return True
+        elif slow < QUALITY_RAISE_MS:
+            self.quiet_windows += 1
+            if self.quiet_windows >= QUALITY_RAISE_WINDOWS and self.level > 0:
+                self.quiet_windows = 0
+                self.level -= 1
+                return True
+        else:
+            self.quiet_windows = 0
+        return False
 
 # ----------------------------------------
 # end-screen score display
@@ -1194,15 +3540,208 @@ def draw_end_screen(surface, lander, level_name, score, elapsed_time):
     prompt_rect = prompt_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 150))
     surface.blit(prompt_surf, prompt_rect)
 
+# ----------------------------------------
+# versus mode
+# ----------------------------------------
+# 2-4 players fly the same level at once, each with their own keys and their own part of the screen
+VERSUS_MIN_PLAYERS = 2
+VERSUS_MAX_PLAYERS = 4
+VERSUS_KEYS = [
+    (pygame.K_SPACE, pygame.K_LEFT, pygame.K_RIGHT),   # P1: arrows + SPACE
+    (pygame.K_w,     pygame.K_a,    pygame.K_d),       # P2: WASD
+    (pygame.K_i,     pygame.K_j,    pygame.K_l),       # P3: I to thrust, J/L to turn
+    (pygame.K_KP8,   pygame.K_KP4,  pygame.K_KP6),     # P4: numpad 8 to thrust, 4/6 to turn
+]
+VERSUS_COLOURS = [CYAN, YELLOW, GREEN, (255, 120, 255)]
+
+class VersusPlayer:
+    def __init__(self, index, player_count):
+        self.name   = f"P{index + 1}"
+        self.keys   = VERSUS_KEYS[index]
+        self.colour = VERSUS_COLOURS[index]
+        self.label  = None   # name tag drawn above the lander, rendered on first draw
+        self.score  = 0
+
+        # spread the landers evenly across the top of the screen
+        self.lander = Lander()
+        self.lander.x = WIDTH * (index + 1) / (player_count + 1)
+        self.lander.rect.center = (self.lander.x, self.lander.y)
+
+    def is_finished(self):
+        return self.lander.landed or not self.lander.alive
+
+
+def update_versus(players, ground, wind, particle_system, screen_shake, elapsed_time):
+    # every lander is stepped in one pass: the keyboard is read once, the wind is shared and a single
+    # engine sound plays while anyone is thrusting. Returns True once everybody has landed or crashed
+    keys = pygame.key.get_pressed()
+    anyone_thrusting = False
+
+    for player in players:
+        if player.is_finished():
+            continue
+        thrust_key, left_key, right_key = player.keys
+        player.lander.update(
+            landing_pad_rect = ground.landing_pad_rect,
+            terrain_points   = ground.terrain_points,
+            particle_system  = particle_system,
+            screen_shake     = screen_shake,
+            wind             = wind,
+            controls         = (keys[thrust_key], keys[left_key], keys[right_key]),
+            engine_sound     = False
+        )
+        if player.is_finished():
+            player.score = calculate_score(player.lander.fuel, elapsed_time, player.lander.landed)
+        anyone_thrusting = anyone_thrusting or player.lander.thrusting
+
+    audio.set_engine(anyone_thrusting)
+
+    return all(player.is_finished() for player in players)
+
+
+def build_static_layer(background_image, ground, render_scale=1.0):
+    # background and terrain never change during a level, so they're drawn together once
+    # and shrunk to the render scale here rather than every frame
+    layer = surface_pool.get("static_layer", (WIDTH, HEIGHT))
+    layer.blit(background_image, (0, 0))
+    ground.draw(layer)
+    if render_scale != 1.0:
+        size = get_render_size(render_scale)
+        layer = pygame.transform.smoothscale(layer, size, surface_pool.get("static_layer_scaled", size))
+    return layer
+
+def get_viewport_rects(player_count):
+    # two players split the screen left and right, three or four get a quarter each
+    # (with three players the spare quarter shows the whole level)
+    half_width, half_height = WIDTH // 2, HEIGHT // 2
+    if player_count <= 2:
+        return [pygame.Rect(0, 0, half_width, HEIGHT), pygame.Rect(half_width, 0, WIDTH - half_width, HEIGHT)]
+    return [pygame.Rect(x, y, half_width, half_height) for y in (0, half_height) for x in (0, half_width)]
+
+def draw_versus(surface, world, static_layer, players, landing_pad_rect, particle_system, shake_offset=(0, 0)):
+    # the world is put together once per frame on top of the static layer, then each viewport is
+    # a crop of it scaled to fit, so extra players don't redraw the level or the other landers.
+    # The world may be drawn below native resolution (render scale), so crops are mapped onto it
+    scale = world.get_width() / WIDTH
+    world.blit(static_layer, (0, 0))
+    particle_system.draw(world, scale)
+    for player in players:
+        player.lander.draw(world, scale)
+        if player.label is None:
+            label = small_font.render(player.name, True, player.colour)
+            if scale != 1.0:
+                label = pygame.transform.smoothscale(
+                    label, (max(1, int(label.get_width() * scale)), max(1, int(label.get_height() * scale))))
+            player.label = surface_pool.convert(label, alpha=True)
+        label_bottom = (player.lander.rect.top - 4) * scale
+        world.blit(player.label, player.label.get_rect(midbottom=(player.lander.x * scale, label_bottom)))
+
+    # zoomed-out quarters all show the whole level, so each distinct crop is only scaled once
+    filled = {}
+    ox, oy = shake_offset
+    viewports = get_viewport_rects(len(players))
+    for i, viewport in enumerate(viewports):
+        if i < len(players):
+            # same camera as single player: zoom in near the pad, focus between lander and pad
+            lander = players[i].lander
+            zoom = get_zoom(lander, landing_pad_rect)
+            focus_x = (lander.x + landing_pad_rect.centerx) / 2
+            focus_y = (lander.y + landing_pad_rect.centery) / 2
+        else:
+            zoom, focus_x, focus_y = MIN_ZOOM, WIDTH / 2, HEIGHT / 2
+
+        # at 1x zoom a viewport shows the full height of the level
+        view_scale  = zoom * viewport.height / HEIGHT
+        crop_width  = min(WIDTH,  int(viewport.width  / view_scale))
+        crop_height = min(HEIGHT, int(viewport.height / view_scale))
+        left = int(max(0, min(WIDTH  - crop_width,  focus_x - crop_width  / 2 - ox)))
+        top  = int(max(0, min(HEIGHT - crop_height, focus_y - crop_height / 2 - oy)))
+
+        area = pygame.Rect(int(left * scale), int(top * scale), int(crop_width * scale), int(crop_height * scale))
+        area = area.clip(world.get_rect())
+        key = (tuple(area), viewport.size)
+        view = filled.get(key)
+        if view is None:
+            view = world.subsurface(area)
+            if view.get_size() != viewport.size:
+                view = pygame.transform.smoothscale(view, viewport.size,
+                                                    surface_pool.get(f"viewport_{len(filled)}", viewport.size))
+            filled[key] = view
+        surface.blit(view, viewport.topleft)
+
+    # HUDs go on last so they aren't copied into the shared viewports
+    for i, viewport in enumerate(viewports):
+        if i < len(players):
+            draw_versus_hud(players[i], surface.subsurface(viewport))
+        pygame.draw.rect(surface, GREY, viewport, 2)
+
+def draw_versus_hud(player, surface):
+    # a compact readout in the corner of the player's own viewport
+    lander = player.lander
+    msg = small_font.render(f"{player.name}  Fuel: {lander.fuel}  Speed: {lander.speed_y:.1f}", True, player.colour)
+    surface.blit(msg, (12, 10))
+
+    if lander.landed:
+        status = small_font.render(f"LANDED  {player.score}", True, GREEN)
+        surface.blit(status, (12, 40))
+    elif not lander.alive:
+        status = small_font.render("CRASHED", True, RED)
+        surface.blit(status, (12, 40))
+
+def draw_versus_results(surface, players):
+    # everyone is down: rank the players by score
+    ranked = sorted(players, key=lambda player: player.score, reverse=True)
+    if ranked[0].score > 0:
+        title = font.render(f"{ranked[0].name} WINS!", True, ranked[0].colour)
+    else:
+        title = font.render("NOBODY LANDED!", True, RED)
+
+    panel = pygame.Rect(WIDTH // 2 - 220, HEIGHT // 2 - 130, 440, 110 + len(players) * 36)
+    pygame.draw.rect(surface, (0, 0, 0), panel, border_radius=10)
+    pygame.draw.rect(surface, ORANGE, panel, 3, border_radius=10)
+    surface.blit(title, title.get_rect(center=(panel.centerx, panel.y + 35)))
+
+    for i, player in enumerate(ranked):
+        result = str(player.score) if player.lander.landed else "crashed"
+        line = small_font.render(f"{i + 1}.  {player.name}    {result}", True, player.colour)
+        surface.blit(line, (panel.x + 40, panel.y + 70 + i * 36))
+
+    prompt = small_font.render("SPACE next level, R retry, 2-4 players, M menu", True, WHITE)
+    surface.blit(prompt, prompt.get_rect(center=(WIDTH // 2, panel.bottom + 30)))
+
 # ----------------------------------------
 # game objects
 # ----------------------------------------
+# start_level builds everything for a level and keeps a snapshot of how it all started. Restarting
+# the same level (R, or Restart Level on the pause menu) puts the same objects back to that
+# snapshot in place instead, so nothing is built, drawn or read from disk again. The restarted
+# attempt gets the same wind (its random source is rewound too), so its replay keeps the same seed
+SNAPSHOT_COPIED = (list, set, dict, pygame.Rect)
+SNAPSHOT_KEPT   = {"label"}   # render caches: not part of a snapshot, and a restore leaves them built
+
+def copy_attributes(attributes):
+    # containers and rects are copied so play can't change a snapshot, everything else (numbers,
+    # shared sprites, fonts) is kept by reference
+    return {name: value.copy() if isinstance(value, SNAPSHOT_COPIED) else value
+            for name, value in attributes.items()}
+
+def snapshot_state(obj):
+    return copy_attributes({name: value for name, value in vars(obj).items() if name not in SNAPSHOT_KEPT})
+
+def restore_state(obj, snapshot):
+    # put an object back exactly as it was snapshotted, dropping anything it picked up since
+    state = vars(obj)
+    kept = {name: state[name] for name in SNAPSHOT_KEPT if name in state}
+    state.clear()
+    state.update(copy_attributes(snapshot))
+    state.update(kept)
+
 def start_level(level_name):
     # reset every game object and start the chosen level fresh
     global lander, ground, background_image, game_state
     global current_level, tutorial_guide, current_level_index
-    global particle_system, screen_shake, wind
-    global level_start_ticks, level_elapsed_time, round_score
+    global particle_system, screen_shake, wind, replay_recorder, autopilot_used, ghosts
+    global level_start_ticks, level_elapsed_time, level_ticks, round_score, players, static_layer, level_snapshot
 
     current_level = level_name
 
@@ -1210,33 +3749,191 @@ def start_level(level_name):
     if level_name in LEVEL_ORDER:
         current_level_index = LEVEL_ORDER.index(level_name)
 
+    # compiled levels (endless mode) bring their own baked terrain and background
+    compiled = compiled_levels.get(level_name)
+
     lander           = Lander()
-    ground           = Ground(level_name)
-    background_image = load_level_background(level_name)
-    particle_system  = ParticleSystem()
+    ground           = Ground(level_name, compiled)
+    background_image = compiled.background if compiled else load_level_background(level_name)
+    particle_system  = ParticleSystem(quality.settings["particles"], ground)
     screen_shake     = ScreenShake()
-    wind             = Wind(level_name)
+    # gusts come from a seeded source so the attempt can be replayed exactly
+    wind_seed        = random.randrange(2 ** 31)
+    wind             = Wind(level_name, rng=random.Random(wind_seed))
     # only create a tutorial guide for the tutorial level
     tutorial_guide   = TutorialGuide() if level_name == "TUTORIAL" else None
+    autopilot.prepare(ground)
+
+    # versus mode swaps the single lander for one per player
+    if versus_player_count:
+        players = [VersusPlayer(i, versus_player_count) for i in range(versus_player_count)]
+        lander  = None
+    else:
+        players = []
+    static_layer = build_static_layer(background_image, ground, render_scale)
+
+    # race the player's earlier runs on campaign levels
+    for ghost in ghosts:
+        ghost.close()
+    solo_campaign = level_name in LEVEL_ORDER and not attract_mode and not versus_player_count
+    ghosts = load_ghosts(level_name, ground) if solo_campaign else []
+
+    # record the player's campaign attempts (not the tutorial, generated levels, demo flights or versus)
+    if solo_campaign:
+        replay_recorder = ReplayRecorder(level_name, wind_seed, deterministic_physics)
+    else:
+        replay_recorder = None
+    autopilot_used = False
+    telemetry.reset(level_name)
+
+    level_snapshot = {
+        "level":      level_name,
+        "versus":     versus_player_count,
+        "attract":    attract_mode,
+        "best_score": best_scores.get(level_name),   # a new best means a different ghost to race
+        "wind_seed":  wind_seed,
+        "wind":       wind.snapshot(),
+        "recorded":   replay_recorder is not None,
+        "lander":     snapshot_state(lander) if lander else None,
+        "players":    [(snapshot_state(player), snapshot_state(player.lander)) for player in players],
+        "tutorial":   snapshot_state(tutorial_guide) if tutorial_guide else None
+    }
+
+    level_start_ticks  = pygame.time.get_ticks()
+    level_elapsed_time = 0.0
+    level_ticks        = 0
+    round_score        = 0
+
+    game_state = PLAYING
+    memory_tracker.on_level_start()
+
+
+def restart_level():
+    # same level again from its snapshot; anything the snapshot can't cover gets a full start_level
+    global game_state, replay_recorder, autopilot_used, ghosts
+    global level_start_ticks, level_elapsed_time, level_ticks, round_score
+
+    snapshot = level_snapshot
+    if (snapshot is None or snapshot["level"] != current_level or snapshot["versus"] != versus_player_count
+            or snapshot["attract"] != attract_mode):
+        start_level(current_level)
+        return
+
+    if lander:
+        restore_state(lander, snapshot["lander"])
+    for player, (player_state, lander_state) in zip(players, snapshot["players"]):
+        restore_state(player, player_state)
+        restore_state(player.lander, lander_state)
+    if tutorial_guide:
+        restore_state(tutorial_guide, snapshot["tutorial"])
+    wind.restore(snapshot["wind"])
+    particle_system.clear()
+    screen_shake.frames_remaining = 0
+    autopilot.prepare(ground)
+
+    if best_scores.get(current_level) == snapshot["best_score"]:
+        for ghost in ghosts:
+            ghost.rewind()
+    else:
+        # the best run was just replaced, so race the new one
+        for ghost in ghosts:
+            ghost.close()
+        ghosts = load_ghosts(current_level, ground)
+        snapshot["best_score"] = best_scores.get(current_level)
+
+    # the last attempt's recorder was saved and dropped when it ended
+    if snapshot["recorded"]:
+        replay_recorder = ReplayRecorder(current_level, snapshot["wind_seed"], deterministic_physics)
+    else:
+        replay_recorder = None
+    autopilot_used = False
+    telemetry.reset(current_level)
 
     level_start_ticks  = pygame.time.get_ticks()
     level_elapsed_time = 0.0
+    level_ticks        = 0
     round_score        = 0
 
     game_state = PLAYING
+    memory_tracker.on_level_start()
 
 
 def return_to_menu():
-    global game_state, tutorial_guide, level_scroller
+    global game_state, tutorial_guide, level_scroller, attract_mode, menu_idle_ticks, ghosts
+    global players, versus_player_count, level_snapshot
 
     # make sure the thrust loop doesn't carry over into the menu
-    thrust_sound.stop()
+    audio.set_engine(False)
+    for ghost in ghosts:
+        ghost.close()
+    ghosts = []
+    # the snapshot's ghosts are closed now, so R from the menu has to start the level afresh
+    level_snapshot = None
+    players = []
+    versus_player_count = 0
     tutorial_guide = None
     level_scroller.visible = False
     level_scroller.scroll_offset = 0
+    attract_mode = False
+    menu_idle_ticks = pygame.time.get_ticks()
     game_state = MENU
 
 
+def start_attract_mode():
+    global attract_mode
+
+    # nobody has touched the menu for a while: let the autopilot fly a random level as a demo
+    attract_mode = True
+    level_scroller.visible = False
+    start_level(random.choice(LEVEL_ORDER))
+
+
+def start_versus(player_count, level_name=None):
+    global versus_player_count
+
+    versus_player_count = max(VERSUS_MIN_PLAYERS, min(VERSUS_MAX_PLAYERS, player_count))
+    level_scroller.visible = False
+    start_level(level_name or LEVEL_ORDER[0])
+
+
+def start_endless():
+    global endless_seed, endless_stage
+
+    # each run gets a fresh base seed; stage n always uses base seed + n
+    endless_seed  = random.randrange(2 ** 31)
+    endless_stage = 1
+    install_endless_level(f"{ENDLESS_PREFIX}{endless_seed + endless_stage}",
+                          generate_level(endless_seed + endless_stage, endless_stage))
+
+
+def install_endless_level(level_name, level_data, compiled=None):
+    # drop the previous generated level so an endless run doesn't keep every level in memory
+    for old_name in [name for name in LEVELS if name.startswith(ENDLESS_PREFIX)]:
+        del LEVELS[old_name]
+        compiled_levels.pop(old_name, None)
+
+    LEVELS[level_name] = level_data
+    if compiled is None:
+        compiled = compile_level(level_name, level_data)
+    compiled_levels[level_name] = compiled.finalise()
+    start_level(level_name)
+
+
+def prefetch_next_endless_level():
+    # called as soon as an endless level is landed so the next one is ready before SPACE is pressed
+    next_stage = endless_stage + 1
+    level_prefetcher.start(endless_seed + next_stage, next_stage)
+
+
+def go_to_next_endless_level():
+    global endless_stage
+
+    prefetch_next_endless_level()
+    level_name, level_data, compiled = level_prefetcher.get()
+    endless_stage += 1
+    install_endless_level(level_name, level_data, compiled)
+
+
 def go_to_next_level():
     global current_level_index, current_level, completed_levels
 
@@ -1245,6 +3942,11 @@ def go_to_next_level():
         return_to_menu()
         return
 
+    # endless levels aren't part of the saved progression
+    if current_level.startswith(ENDLESS_PREFIX):
+        go_to_next_endless_level()
+        return
+
     # mark the current level as done and save progress
     completed_levels.add(current_level)
     write_save(completed_levels, best_scores)
@@ -1258,212 +3960,1635 @@ def go_to_next_level():
         return_to_menu()
 
 
+def start_next_soak_level(count):
+    # the soak test cycles through every way a level can start: a campaign level, a restart of it,
+    # the next endless stage (generated and installed), then a restart of that
+    step = count % 4
+    if step in (1, 3):
+        restart_level()
+    elif step == 2:
+        if endless_stage:
+            go_to_next_endless_level()
+        else:
+            start_endless()
+    else:
+        start_level(LEVEL_ORDER[count // 4 % len(LEVEL_ORDER)])
+
+
 # ----------------------------------------
-# initialise globals
+# level solvability checker
 # ----------------------------------------
-lander             = None
-current_level      = "LEVEL_1"
-ground             = Ground(current_level)
-hud                = HUD()
-menu               = Menu()
-level_scroller     = LevelScroller()
-pause_menu         = PauseMenu()
-tutorial_guide     = None
-particle_system    = ParticleSystem()
-screen_shake       = ScreenShake()
-wind               = Wind(current_level)
-level_start_ticks  = 0
-level_elapsed_time = 0.0
-round_score        = 0
+CHECK_MAX_TICKS = 60 * 90   # a plan that hasn't touched down after 90 seconds counts as a failure
+
+# the planner samples the gains of a simple descent controller from these (low, high) ranges
+PLAN_PARAM_RANGES = [
+    (0.002, 0.03),   # target sideways speed per pixel away from the pad
+    (0.5, 4.0),      # max sideways speed
+    (0.02, 0.3),     # how hard to correct speed errors (acceleration per unit of error)
+    (5.0, 60.0),     # max tilt while travelling
+    (20.0, 200.0),   # height above the pad below which the tilt is kept landing-safe
+    (0.3, 2.5),      # descent speed aimed for at touchdown
+    (0.03, 0.4),     # extra descent speed allowed per sqrt(pixel) of height
+    (10.0, 120.0),   # minimum clearance kept over the terrain below
+    (0.0, 0.1),      # how much of the wanted push must line up with the engine before firing
+]
+
+def plan_controls(lander, params, landing_pad_rect, terrain_points, wind_force=0.0):
+    # turn a set of controller gains into this frame's (thrust, left, right) inputs
+    (gain_x, max_vx, speed_gain, max_tilt, flare_height,
+     touchdown_speed, descent_rate, clearance, fire_threshold) = params
+
+    offset_x = landing_pad_rect.centerx - lander.x
+    height   = landing_pad_rect.top - lander.y
+
+    # speeds we'd like: head for the pad, and fall no faster than the descent profile allows
+    target_vx = max(-max_vx, min(max_vx, gain_x * offset_x))
+    over_pad = abs(offset_x) < landing_pad_rect.width / 2
+    descent_height = height
+    if not over_pad:
+        # away from the pad, descend towards a safe height over the terrain below and just ahead instead
+        look_ahead_x = lander.x + lander.speed_x * 30
+        terrain_top = min(get_terrain_y(terrain_points, lander.x), get_terrain_y(terrain_points, look_ahead_x))
+        descent_height = min(height, terrain_top - clearance - lander.y)
+    target_vy = touchdown_speed + descent_rate * math.sqrt(max(0, descent_height))
+    if descent_height < 0:
+        # climb away from terrain that's too close and isn't the pad
+        target_vy = -0.5
+
+    # the engine has to supply whatever gravity and wind don't
+    push_x = speed_gain * (target_vx - lander.speed_x) - wind_force
+    push_y = speed_gain * (target_vy - lander.speed_y) - GRAVITY
+
+    # thrust acts along (-sin, -cos) of the angle, so point the engine along the wanted push
+    if over_pad and height < flare_height:
+        # keep within the 12 degrees a safe landing allows
+        max_tilt = min(max_tilt, 10)
+    # (when no upward push is wanted, lean fully into the sideways push instead)
+    target_angle = math.degrees(math.atan2(-push_x, max(-push_y, 0.001)))
+    target_angle = max(-max_tilt, min(max_tilt, target_angle))
+
+    turn_left  = lander.angle < target_angle - 1.5
+    turn_right = lander.angle > target_angle + 2.5
+
+    # fire when enough of the wanted push lines up with where the engine is pointing
+    rad = math.radians(lander.angle)
+    along_engine = -push_x * math.sin(rad) - push_y * math.cos(rad)
+    thrust = along_engine > fire_threshold
+    return thrust, turn_left, turn_right
+
+def simulate_plan(level_name, wind_force, params, record=False):
+    # fly one whole attempt with fixed wind; returns (landed, fuel_used, ticks, miss, controls)
+    ground = Ground(level_name)
+    wind = Wind(level_name)
+    # hold the wind at the requested force for the whole run: no drifting patches, only the
+    # weaker wind near the ground
+    wind.gusty = False
+    wind.current_force = wind_force
+    if wind.active:
+        wind.gusts = [1.0] * len(wind.gusts)
+
+    lander = SimLander()
+    controls = []
+    for tick in range(1, CHECK_MAX_TICKS + 1):
+        thrust, turn_left, turn_right = plan_controls(lander, params, ground.landing_pad_rect,
+                                                      ground.terrain_points, wind_force)
+        if record:
+            controls.append((thrust, turn_left, turn_right))
+        result = step_lander(lander, thrust, turn_left, turn_right,
+                             landing_pad_rect=ground.landing_pad_rect,
+                             terrain_points=ground.terrain_points, wind=wind)
+        if result is not None:
+            break
+
+    # how badly a failed attempt missed, so the planner can still rank failures against each other
+    miss = (abs(lander.x - ground.landing_pad_rect.centerx)
+            + 20 * max(0, abs(lander.speed_y) - SAFE_SPEED)
+            + 5 * max(0, abs(lander.angle) - 12))
+    return lander.landed, START_FUEL - lander.fuel, tick, miss, controls
+
+def get_worst_case_winds(level_name):
+    # steady wind blows one way for the whole level; gusty wind can drift up to 1.5x its base force.
+    # The field's patches only ever weaken it, so simulate_plan flying the full force everywhere is the worst case
+    wind = Wind(level_name)
+    if not wind.active:
+        return [0.0]
+    strongest = wind.base_force * 1.5 if wind.gusty else wind.base_force
+    return [-strongest, strongest]
+
+def _check_plan_batch(task):
+    # process-pool worker: fly a batch of controller settings against one wind force
+    level_name, level_data, wind_force, param_batch = task
+    LEVELS.setdefault(level_name, level_data)
+    results = []
+    for params in param_batch:
+        landed, fuel_used, ticks, miss, _ = simulate_plan(level_name, wind_force, params)
+        results.append((landed, fuel_used, ticks, miss))
+    return results
+
+def check_level(level_name, level_data, pool, workers, samples=128, iterations=4, seed=0):
+    # cross-entropy search over controller gains: sample, keep the best tenth, narrow the ranges, repeat
+    rng = random.Random(seed)
+    scenarios = {}
+    for wind_force in get_worst_case_winds(level_name):
+        scenarios[wind_force] = {
+            "means":  [(low + high) / 2 for low, high in PLAN_PARAM_RANGES],
+            "spreads": [(high - low) / 2 for low, high in PLAN_PARAM_RANGES],
+            "min_fuel": None,
+            "best_score": None,
+            "best_params": None,
+            "plans": 0
+        }
+
+    for _ in range(iterations):
+        tasks, owners = [], []
+        for wind_force, scenario in scenarios.items():
+            candidates = []
+            for _ in range(samples):
+                params = []
+                for (low, high), mean, spread in zip(PLAN_PARAM_RANGES, scenario["means"], scenario["spreads"]):
+                    params.append(max(low, min(high, rng.gauss(mean, spread))))
+                candidates.append(params)
+            # split each scenario's candidates evenly across the workers
+            batch_size = max(1, math.ceil(samples / workers))
+            for start in range(0, samples, batch_size):
+                tasks.append((level_name, level_data, wind_force, candidates[start:start + batch_size]))
+                owners.append((wind_force, candidates[start:start + batch_size]))
+
+        for (wind_force, batch), results in zip(owners, pool.map(_check_plan_batch, tasks)):
+            scenario = scenarios[wind_force]
+            scenario.setdefault("ranked", [])
+            for params, (landed, fuel_used, ticks, miss) in zip(batch, results):
+                scenario["plans"] += 1
+                if landed:
+                    score = calculate_score(START_FUEL - fuel_used, ticks / 60, True)
+                    if scenario["min_fuel"] is None or fuel_used < scenario["min_fuel"]:
+                        scenario["min_fuel"] = fuel_used
+                    if scenario["best_score"] is None or score > scenario["best_score"]:
+                        scenario["best_score"] = score
+                        scenario["best_params"] = params
+                    fitness = score
+                else:
+                    fitness = -miss
+                scenario["ranked"].append((fitness, params))
+
+        # refit each scenario's sampling distribution to its elite plans
+        for scenario in scenarios.values():
+            ranked = sorted(scenario.pop("ranked"), key=lambda item: item[0], reverse=True)
+            elite = [params for _, params in ranked[:max(2, len(ranked) // 10)]]
+            for i, (low, high) in enumerate(PLAN_PARAM_RANGES):
+                values = [params[i] for params in elite]
+                mean = sum(values) / len(values)
+                variance = sum((v - mean) ** 2 for v in values) / len(values)
+                scenario["means"][i] = mean
+                # never let a range collapse completely so later rounds keep exploring
+                scenario["spreads"][i] = max(math.sqrt(variance), (high - low) * 0.02)
+
+    solvable = all(scenario["best_score"] is not None for scenario in scenarios.values())
+    fuel_needed = [scenario["min_fuel"] for scenario in scenarios.values() if scenario["min_fuel"] is not None]
+    scores      = [scenario["best_score"] for scenario in scenarios.values() if scenario["best_score"] is not None]
+    return {
+        "level": level_name,
+        "solvable": solvable,
+        # the worst-case wind decides the level: most fuel needed, lowest best score
+        "min_fuel": max(fuel_needed) if solvable else None,
+        "best_score": min(scores) if solvable else None,
+        "plans": sum(scenario["plans"] for scenario in scenarios.values()),
+        "winds": {
+            f"{wind_force:+.4f}": {
+                "min_fuel": scenario["min_fuel"],
+                "best_score": scenario["best_score"],
+                "best_params": scenario["best_params"]
+            }
+            for wind_force, scenario in scenarios.items()
+        }
+    }
 
-game_state = MENU
+def run_level_check_cli(options):
+    # returns a process exit code: 0 only if every requested level can be landed
+    if options.seed is not None:
+        level_name = f"{ENDLESS_PREFIX}{options.seed}"
+        LEVELS[level_name] = generate_level(options.seed, options.difficulty)
+        level_names = [level_name]
+    else:
+        level_names = options.check_level or LEVEL_ORDER
+
+    unknown = [name for name in level_names if name not in LEVELS]
+    if unknown:
+        print(f"Unknown level(s): {', '.join(unknown)}")
+        return 2
+
+    workers = options.workers or os.cpu_count() or 1
+    reports = []
+    with multiprocessing.Pool(workers) as pool:
+        for level_name in level_names:
+            start_time = datetime.datetime.now()
+            report = check_level(level_name, LEVELS[level_name], pool, workers,
+                                 samples=options.samples, iterations=options.iterations)
+            report["seconds"] = round((datetime.datetime.now() - start_time).total_seconds(), 2)
+            reports.append(report)
+
+            if not options.json:
+                verdict = "landable" if report["solvable"] else "NOT LANDABLE"
+                print(f"{level_name}: {verdict} ({report['plans']} plans in {report['seconds']}s)")
+                for wind_label, wind_report in report["winds"].items():
+                    print(f"  wind {wind_label}: min fuel {wind_report['min_fuel']}, "
+                          f"best score {wind_report['best_score']}")
+                if report["solvable"]:
+                    print(f"  worst case: min fuel {report['min_fuel']} / {START_FUEL}, "
+                          f"best score {report['best_score']}")
+
+    if options.json:
+        print(json.dumps(reports, indent=2))
+    return 0 if all(report["solvable"] for report in reports) else 1
 
 # ----------------------------------------
-# main game loop
+# reinforcement learning environment
 # ----------------------------------------
-running = True
-while running:
+# actions use the same key bit mask as replays (ACTION_THRUST | ACTION_LEFT | ACTION_RIGHT)
+ENV_ACTION_COUNT = 8
+
+ENV_MAX_TICKS     = 60 * 60     # episodes are cut off after a minute of game time
+ENV_CRASH_PENALTY = 100
+ENV_PIXEL_SIZE    = (120, 75)   # pixel observations are the screen shrunk 10x
+ENV_OBSERVATION_NAMES = ("x", "y", "speed_x", "speed_y", "angle", "fuel", "wind",
+                         "height_above_terrain", "pad_offset_x", "pad_offset_y")
+
+class LanderEnv:
+    # the game as a reset/step environment for training agents: no window, no clock, as fast as the cpu allows.
+    # reset() returns an observation and step(action) returns (observation, reward, done, info), like gym.
+    # observations are floats in ENV_OBSERVATION_NAMES order, or {"state": floats, "pixels": RGB bytes}
+    # with pixels=True
+    _scene_cache  = {}   # background and terrain at pixel size, per level
+    _sprite_cache = {}   # rotated lander sprites at pixel size, per angle
+
+    def __init__(self, levels=None, seed=None, pixels=False, pixel_size=ENV_PIXEL_SIZE, max_ticks=ENV_MAX_TICKS,
+                 deterministic=False):
+        self.levels     = list(levels or LEVEL_ORDER)
+        self.deterministic = deterministic
+        self.rng        = random.Random(seed)
+        self.pixels     = pixels
+        self.pixel_size = tuple(pixel_size)
+        self.max_ticks  = max_ticks
+
+        self.level_name = None
+        self.ground     = None
+        self.wind       = None
+        self.lander     = None
+        self.ticks      = 0
+        self.last_shaping = 0.0
+        self.pixel_surface = pygame.Surface(self.pixel_size) if pixels else None
+
+    def reset(self, level_name=None, seed=None):
+        # start a new episode on the given level, or a random one from self.levels
+        if seed is not None:
+            self.rng.seed(seed)
+        self.level_name = level_name or self.rng.choice(self.levels)
+        self.ground = Ground(self.level_name)
+        self.wind   = Wind(self.level_name, rng=self.rng)
+        self.lander = SimLander()
+        self.ticks  = 0
+        self.last_shaping = self._shaping()
+        return self._observation()
+
+    def step(self, action):
+        if self.lander is None:
+            raise RuntimeError("call reset() before step()")
+
+        # same order as the game loop: wind first, then the lander
+        self.wind.update()
+        step = step_lander_fixed if self.deterministic else step_lander
+        result = step(self.lander, *action_to_controls(action),
+                      landing_pad_rect=self.ground.landing_pad_rect,
+                      terrain_points=self.ground.terrain_points, wind=self.wind)
+        self.ticks += 1
+
+        # small rewards for getting closer and slower every step, then the real score at the end
+        shaping = self._shaping()
+        reward = shaping - self.last_shaping
+        self.last_shaping = shaping
+
+        score = 0
+        if result == LANDED:
+            if self.deterministic:
+                score = calculate_score_fixed(self.lander.fuel, self.ticks, True)
+            else:
+                score = calculate_score(self.lander.fuel, self.ticks / 60, True)
+            reward += score
+        elif result == CRASHED:
+            reward -= ENV_CRASH_PENALTY
+
+        timed_out = result is None and self.ticks >= self.max_ticks
+        info = {
+            "level": self.level_name,
+            "result": result,
+            "score": score,
+            "ticks": self.ticks,
+            "timed_out": timed_out
+        }
+        return self._observation(), reward, result is not None or timed_out, info
+
+    def _shaping(self):
+        # higher is better: near the pad, slow and upright
+        lander = self.lander
+        pad = self.ground.landing_pad_rect
+        return -(abs(pad.centerx - lander.x) / 100 + abs(pad.top - lander.y) / 100
+                 + math.hypot(lander.speed_x, lander.speed_y) + abs(lander.angle) / 45)
+
+    def _observation(self):
+        lander = self.lander
+        pad = self.ground.landing_pad_rect
+        state = [
+            lander.x, lander.y, lander.speed_x, lander.speed_y, lander.angle, lander.fuel,
+            self.wind.force_at(lander.x, lander.y),
+            self.ground.terrain_height(lander.x) - lander.y,
+            pad.centerx - lander.x,
+            pad.top - lander.y
+        ]
+        if not self.pixels:
+            return state
+        return {"state": state, "pixels": self.render()}
+
+    def render(self):
+        # draws the current frame at pixel_size and returns it as RGB bytes, row by row
+        surface = self.pixel_surface or pygame.Surface(self.pixel_size)
+        scale_x = self.pixel_size[0] / WIDTH
+        scale_y = self.pixel_size[1] / HEIGHT
+        surface.blit(self._scene(), (0, 0))
+        sprite = self._sprite(self.lander.angle, not self.lander.alive)
+        surface.blit(sprite, sprite.get_rect(center=(self.lander.x * scale_x, self.lander.y * scale_y)))
+        return pygame.image.tobytes(surface, "RGB")
+
+    def _scene(self):
+        # the level only changes on reset, so it is drawn once at full size and shrunk
+        key = (self.level_name, self.pixel_size)
+        scene = LanderEnv._scene_cache.get(key)
+        if scene is None:
+            full_size = pygame.Surface((WIDTH, HEIGHT))
+            background = pygame.image.load(LEVELS[self.level_name]["background"])
+            full_size.blit(pygame.transform.scale(background, (WIDTH, HEIGHT)), (0, 0))
+            draw_terrain(full_size, self.ground.terrain_points, self.ground.landing_pad_rect, self.level_name)
+            scene = pygame.transform.smoothscale(full_size, self.pixel_size)
+            LanderEnv._scene_cache[key] = scene
+        return scene
+
+    def _sprite(self, angle, crashed):
+        key = (angle, crashed, self.pixel_size)
+        sprite = LanderEnv._sprite_cache.get(key)
+        if sprite is None:
+            image = pygame.image.load("Lander_Explosion.png" if crashed else "Lander.png")
+            width  = max(1, int(image.get_width()  * LANDER_SCALE * self.pixel_size[0] / WIDTH))
+            height = max(1, int(image.get_height() * LANDER_SCALE * self.pixel_size[1] / HEIGHT))
+            sprite = pygame.transform.rotate(pygame.transform.smoothscale(image, (width, height)), angle)
+            LanderEnv._sprite_cache[key] = sprite
+        return sprite
+
+
+class VectorLanderEnv:
+    # many environments stepped together in one process. Finished episodes reset straight away,
+    # and the observation they finished on is kept in info["final_observation"]
+    def __init__(self, num_envs, levels=None, seed=None, **env_options):
+        seeds = random.Random(seed)
+        self.envs = [LanderEnv(levels, seed=seeds.randrange(2 ** 31), **env_options) for _ in range(num_envs)]
+        self.num_envs = num_envs
+
+    def reset(self):
+        return [env.reset() for env in self.envs]
+
+    def step(self, actions):
+        observations, rewards, dones, infos = [], [], [], []
+        for env, action in zip(self.envs, actions):
+            observation, reward, done, info = env.step(action)
+            if done:
+                info["final_observation"] = observation
+                observation = env.reset()
+            observations.append(observation)
+            rewards.append(reward)
+            dones.append(done)
+            infos.append(info)
+        return observations, rewards, dones, infos
+
+    def close(self):
+        pass
+
+
+def _vector_env_worker(connection, num_envs, levels, seed, env_options):
+    # runs in a child process: owns a VectorLanderEnv and answers commands over the pipe
+    envs = VectorLanderEnv(num_envs, levels, seed, **env_options)
+    while True:
+        command, data = connection.recv()
+        if command == "reset":
+            connection.send(envs.reset())
+        elif command == "step":
+            connection.send(envs.step(data))
+        elif command == "close":
+            connection.close()
+            return
 
-    # ---- event handling ----
-    for event in pygame.event.get():
 
-        if event.type == pygame.QUIT:
-            running = False
+class SubprocessVectorLanderEnv:
+    # the same interface as VectorLanderEnv, with the environments split across worker processes
+    # so every core is stepping at once. Call close() (or use it in a with block) to stop the workers
+    def __init__(self, num_envs, workers=None, levels=None, seed=None, **env_options):
+        workers = max(1, min(num_envs, workers or os.cpu_count() or 1))
+        seeds = random.Random(seed)
+        self.num_envs = num_envs
+        # spread the environments as evenly as possible
+        self.chunk_sizes = [num_envs // workers + (1 if i < num_envs % workers else 0) for i in range(workers)]
+        self.connections = []
+        self.processes   = []
+        for chunk_size in self.chunk_sizes:
+            parent_end, child_end = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_vector_env_worker,
+                args=(child_end, chunk_size, levels, seeds.randrange(2 ** 31), env_options),
+                daemon=True
+            )
+            process.start()
+            child_end.close()
+            self.connections.append(parent_end)
+            self.processes.append(process)
+
+    def reset(self):
+        for connection in self.connections:
+            connection.send(("reset", None))
+        return [observation for connection in self.connections for observation in connection.recv()]
+
+    def step(self, actions):
+        # send every worker its share first so they all step in parallel, then collect
+        start = 0
+        for connection, chunk_size in zip(self.connections, self.chunk_sizes):
+            connection.send(("step", list(actions[start:start + chunk_size])))
+            start += chunk_size
+
+        observations, rewards, dones, infos = [], [], [], []
+        for connection in self.connections:
+            chunk_observations, chunk_rewards, chunk_dones, chunk_infos = connection.recv()
+            observations.extend(chunk_observations)
+            rewards.extend(chunk_rewards)
+            dones.extend(chunk_dones)
+            infos.extend(chunk_infos)
+        return observations, rewards, dones, infos
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close", None))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes   = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_env_bench_cli(options):
+    # steps random actions through each kind of environment and prints steps per second
+    num_envs = options.envs
+    workers = options.workers or os.cpu_count() or 1
+    rng = random.Random(0)
+    steps = 20000
+
+    env_options = {"pixels": options.pixels, "deterministic": options.deterministic}
+    env = LanderEnv(seed=0, **env_options)
+    env.reset()
+    start_time = time.perf_counter()
+    for _ in range(steps):
+        if env.step(rng.randrange(ENV_ACTION_COUNT))[2]:
+            env.reset()
+    print(f"LanderEnv: {steps / (time.perf_counter() - start_time):,.0f} steps/s")
+
+    for label, envs in (("VectorLanderEnv", VectorLanderEnv(num_envs, seed=0, **env_options)),
+                        (f"SubprocessVectorLanderEnv ({workers} workers)",
+                         SubprocessVectorLanderEnv(num_envs, workers, seed=0, **env_options))):
+        envs.reset()
+        rounds = max(1, steps // num_envs)
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            envs.step([rng.randrange(ENV_ACTION_COUNT) for _ in range(num_envs)])
+        elapsed = time.perf_counter() - start_time
+        envs.close()
+        print(f"{label}, {num_envs} envs: {rounds * num_envs / elapsed:,.0f} steps/s")
+    return 0
 
-        if event.type == pygame.KEYDOWN:
+# ----------------------------------------
+# difficulty tuner
+# ----------------------------------------
+# constants the tuner can sweep; PAD_WIDTH_SCALE resizes every landing pad around its centre
+TUNABLE_CONSTANTS = ("GRAVITY", "THRUST", "SAFE_SPEED", "WIND_FORCE_LEVEL_4", "WIND_FORCE_LEVEL_5",
+                     "START_FUEL", "PAD_WIDTH_SCALE")
+TUNE_BOTS = ("autopilot", "replays")
+TUNE_RUNS_PER_TASK = 4   # attempts handed to a worker at once
+
+def parse_tuning_grid(specs):
+    # turns ["GRAVITY=0.03,0.04", "THRUST=0.1,0.12"] into one {name: value} dict per grid point
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        name = name.strip().upper()
+        if name not in TUNABLE_CONSTANTS or not values:
+            raise ValueError(f"Expected NAME=value,value,... with NAME one of {', '.join(TUNABLE_CONSTANTS)}, got {spec}")
+        cast = int if name == "START_FUEL" else float
+        axes.append([(name, cast(value)) for value in values.split(",")])
+    return [dict(grid_point) for grid_point in itertools.product(*axes)]
+
+def get_tuned_level_data(level_name, pad_width_scale=1.0, wind_force=None):
+    # a copy of the level with its landing pad resized around the same centre and, if given, a new wind force
+    level_data = dict(LEVELS[level_name])
+    pad = dict(level_data["landing_pad"])
+    width = max(4, round(pad["width"] * pad_width_scale))
+    pad["x"] = round(pad["x"] + pad["width"] / 2 - width / 2)
+    pad["width"] = width
+    level_data["landing_pad"] = pad
+    if wind_force is not None and "wind" in level_data:
+        level_data["wind"] = dict(level_data["wind"], force=wind_force)
+    return level_data
+
+def simulate_tuning_run(level_name, bot, run):
+    # one attempt under whatever constants are currently set; run is a wind seed for the autopilot
+    # or a replay path. Returns (landed, score)
+    ground = Ground(level_name)
+    if bot == "replays":
+        actions = read_replay_actions(run)
+        wind_seed = read_replay_header(run)["wind_seed"]
+        autopilot = None
+    else:
+        actions = b""
+        wind_seed = run
+        autopilot = Autopilot()
+    wind = Wind(level_name, rng=random.Random(wind_seed))
+    lander = SimLander()
+
+    result = None
+    for tick in range(1, CHECK_MAX_TICKS + 1):
+        wind.update()
+        if autopilot is not None:
+            controls = autopilot.decide(lander, ground, wind)
+        else:
+            # once the recording runs out the player's hands are off the keys
+            controls = action_to_controls(actions[tick - 1] if tick <= len(actions) else 0)
+        result = step_lander(lander, *controls, landing_pad_rect=ground.landing_pad_rect,
+                             terrain_points=ground.terrain_points, wind=wind)
+        if result is not None:
+            break
+
+    landed = result == LANDED
+    return landed, calculate_score(lander.fuel, tick / 60, landed)
+
+def _tune_batch(task):
+    # process-pool worker: set this grid point's constants, then fly a batch of attempts
+    constants, level_name, level_data, bot, runs = task
+    globals().update(constants)
+    set_fixed_physics_constants()
+    LEVELS[level_name] = level_data
+    return [simulate_tuning_run(level_name, bot, run) for run in runs]
+
+def summarise_tuning_results(results):
+    # success rate plus the spread of scores, counting crashes as 0
+    scores = sorted(score for _, score in results)
+    landed = sum(1 for was_landed, _ in results if was_landed)
+    if not scores:
+        return {"runs": 0, "landed": 0, "success_rate": 0.0, "mean_score": 0, "p10": 0, "median": 0, "p90": 0}
+    return {
+        "runs": len(scores),
+        "landed": landed,
+        "success_rate": round(landed / len(scores), 3),
+        "mean_score": round(sum(scores) / len(scores), 1),
+        "p10": scores[int(len(scores) * 0.1)],
+        "median": scores[len(scores) // 2],
+        "p90": scores[min(len(scores) - 1, int(len(scores) * 0.9))]
+    }
 
-            # M returns to menu from anywhere
-            if event.key == pygame.K_m:
-                return_to_menu()
+def run_tuner_cli(options):
+    # returns a process exit code
+    try:
+        grid = parse_tuning_grid(options.tune)
+    except ValueError as err:
+        print(err)
+        return 2
+
+    # the attempts flown at every grid point: the same wind seeds, or every recorded replay
+    level_runs = {}
+    for level_name in LEVEL_ORDER:
+        if options.bot == "replays":
+            runs = [path for path in list_replays(level_name) if read_replay_header(path) is not None]
+            if not runs:
+                print(f"{level_name}: no replays recorded, skipping")
                 continue
+        else:
+            runs = list(range(options.runs))
+        level_runs[level_name] = runs
+
+    defaults = {name: globals()[name] for name in TUNABLE_CONSTANTS if name != "PAD_WIDTH_SCALE"}
+    tasks = []
+    task_keys = []
+    for grid_index, grid_point in enumerate(grid):
+        constants = dict(defaults)
+        constants.update((name, value) for name, value in grid_point.items() if name != "PAD_WIDTH_SCALE")
+        for level_name, runs in level_runs.items():
+            # levels 4 and 5 take their wind from their files, so WIND_FORCE_LEVEL_4/5 are applied here
+            level_data = get_tuned_level_data(level_name, grid_point.get("PAD_WIDTH_SCALE", 1.0),
+                                              grid_point.get(f"WIND_FORCE_{level_name}"))
+            for start in range(0, len(runs), TUNE_RUNS_PER_TASK):
+                tasks.append((constants, level_name, level_data, options.bot, runs[start:start + TUNE_RUNS_PER_TASK]))
+                task_keys.append((grid_index, level_name))
+
+    workers = options.workers or os.cpu_count() or 1
+    start_time = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        batches = pool.map(_tune_batch, tasks)
+    elapsed = time.perf_counter() - start_time
+
+    results = {}
+    for key, batch in zip(task_keys, batches):
+        results.setdefault(key, []).extend(batch)
+
+    report = []
+    for grid_index, grid_point in enumerate(grid):
+        levels = {level_name: summarise_tuning_results(results.get((grid_index, level_name), []))
+                  for level_name in level_runs}
+        report.append({"settings": grid_point, "levels": levels})
+
+    if options.json:
+        print(json.dumps(report, indent=2))
+        return 0
 
-            # Q quits the whole game
-            if event.key == pygame.K_q:
-                running = False
+    for entry in report:
+        settings = ", ".join(f"{name}={value}" for name, value in entry["settings"].items()) or "current settings"
+        print(settings)
+        for level_name, summary in entry["levels"].items():
+            print(f"  {level_name}: {summary['success_rate']:.0%} landed ({summary['landed']}/{summary['runs']}), "
+                  f"score mean {summary['mean_score']}, p10 {summary['p10']}, median {summary['median']}, "
+                  f"p90 {summary['p90']}")
+    print(f"{len(grid)} settings x {len(level_runs)} levels in {elapsed:.1f}s on {workers} workers")
+    return 0
 
-            # R restarts the current level at any point
-            if event.key == pygame.K_r:
-                start_level(current_level)
-
-            # P toggles the pause state
-            if event.key == pygame.K_p:
-                if game_state == PLAYING:
-                    game_state = PAUSED
-                    thrust_sound.stop()
-                    if lander:
-                        lander.thrust_sound_playing = False
-                elif game_state == PAUSED:
-                    game_state = PLAYING
+# ----------------------------------------
+# score submission
+# ----------------------------------------
+# finished campaign landings (level, score and the replay) go to the leaderboard server. The game
+# only hands each run to a background thread, which owns everything else: it reads the replay,
+# keeps the queue in a file so nothing is lost if the network or the game goes down, and sends the
+# queue in batches over one kept-alive connection, waiting longer between tries while the
+# server can't be reached. --score-server runs a stand-in leaderboard for testing against
+SCORE_QUEUE_FILE    = os.path.join(SOURCE_FOLDER, "score_queue.json")
+SCORE_SERVER_FOLDER = os.path.join(SOURCE_FOLDER, "score_server")
+SCORE_SERVER_PORT   = 47480
+SUBMIT_BATCH_SIZE   = 20
+SUBMIT_TIMEOUT      = 5      # seconds to wait on the server before counting it as down
+SUBMIT_RETRY_MIN    = 1.0    # seconds before the first retry, doubling up to the max
+SUBMIT_RETRY_MAX    = 120.0
+SUBMIT_ID_FORMAT    = re.compile(r"[0-9]{14}-[0-9a-f]{8}")   # timestamp-random, as ScoreSubmitter makes them
+
+class ScoreSubmitter:
+    def __init__(self, url, queue_file=SCORE_QUEUE_FILE):
+        parts = urllib.parse.urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host       = parts.hostname
+        self.port       = parts.port
+        self.path       = parts.path or "/scores"
+        self.queue_file = queue_file
+        self.connection = None
+        self.pending    = []            # runs waiting to upload, oldest first (only the thread touches this)
+        self.incoming   = queue.Queue()  # runs handed over by the game, None to stop
+        self.online     = True
+        self.uploaded   = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, level_name, score, result, replay_path):
+        # called from the game loop, so this only queues the run for the thread
+        self.incoming.put({"level": level_name, "score": score, "result": result, "replay_path": replay_path})
+
+    def close(self):
+        # anything not sent yet is already in the queue file for next time
+        self.incoming.put(None)
+        self.thread.join(SUBMIT_TIMEOUT)
+
+    def _run(self):
+        self.pending = self._load_queue()
+        retry_at = 0.0
+        delay = SUBMIT_RETRY_MIN
+        while True:
+            # wait for a new run, or until it's time to try the server again
+            timeout = max(0.0, retry_at - time.monotonic()) if self.pending else None
+            try:
+                run = self.incoming.get(timeout=timeout)
+            except queue.Empty:
+                run = False
+            if run is None:
+                break
+            if run:
+                self._add(run)
+                continue   # pick up anything else that finished at the same time before sending
+
+            if self._upload(self.pending[:SUBMIT_BATCH_SIZE]):
+                del self.pending[:SUBMIT_BATCH_SIZE]
+                self._save_queue()
+                retry_at, delay = 0.0, SUBMIT_RETRY_MIN
+            else:
+                retry_at = time.monotonic() + delay
+                delay = min(SUBMIT_RETRY_MAX, delay * 2)
+        if self.connection is not None:
+            self.connection.close()
+
+    def _add(self, run):
+        replay = None
+        try:
+            with open(run.pop("replay_path"), "rb") as f:
+                replay = base64.b64encode(f.read()).decode("ascii")
+        except OSError as err:
+            print(f"Score submission without replay: {err}")
+        # the id lets the server ignore a batch it already has, if its answer never got back to us
+        run["id"] = f"{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}-{os.urandom(4).hex()}"
+        run["replay"] = replay
+        self.pending.append(run)
+        self._save_queue()
+
+    def _load_queue(self):
+        try:
+            with open(self.queue_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, json.JSONDecodeError) as err:
+            print(f"Score queue ignored: {err}")
+            return []
+
+    def _save_queue(self):
+        # written to a temporary file first so a crash mid-write can't lose the whole queue
+        try:
+            with open(self.queue_file + ".tmp", "w") as f:
+                json.dump(self.pending, f)
+            os.replace(self.queue_file + ".tmp", self.queue_file)
+        except OSError as err:
+            print(f"Score queue save failed: {err}")
+
+    def _upload(self, batch):
+        # True once the server has the batch (or has turned it down for good), False to retry later
+        body = json.dumps({"runs": batch}).encode()
+        try:
+            if self.connection is None:
+                self.connection = self.connection_class(self.host, self.port, timeout=SUBMIT_TIMEOUT)
+            self.connection.request("POST", self.path, body, {"Content-Type": "application/json"})
+            response = self.connection.getresponse()
+            reply = response.read()   # read it all, or the connection can't be used again
+            if response.will_close:
+                self.connection.close()
+                self.connection = None
+        except (OSError, http.client.HTTPException) as err:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            return self._went_offline(err)
+
+        if response.status >= 500:
+            return self._went_offline(f"server error {response.status}")
+        if not self.online:
+            print(f"Score server back, sending {len(self.pending)} queued runs")
+            self.online = True
+        if response.status >= 400:
+            # the server won't take these however often they're sent
+            print(f"Score server refused {len(batch)} runs: {response.status} {reply[:200]!r}")
+            return True
+        rejected = json.loads(reply or b"{}").get("rejected", [])
+        if rejected:
+            print(f"Score server rejected {len(rejected)} runs that didn't re-simulate to their scores")
+        self.uploaded += len(batch) - len(rejected)
+        return True
+
+    def _went_offline(self, err):
+        if self.online:
+            print(f"Score server unreachable ({err}), keeping {len(self.pending)} runs queued")
+            self.online = False
+        return False
+
+
+class ScoreServer(ThreadingHTTPServer):
+    # the stand-in leaderboard: POST /scores takes a batch of runs, GET /leaderboard lists the best
+    # per level. Runs flown with the deterministic physics are flown again and must match their score
+    daemon_threads = True
+
+    def __init__(self, address, folder=SCORE_SERVER_FOLDER, flaky=0.0):
+        super().__init__(address, ScoreServerHandler)
+        self.folder = folder
+        self.flaky  = flaky   # fraction of requests answered with 503, to test the client's retries
+        self.lock   = threading.Lock()
+        self.board_file = os.path.join(folder, "leaderboard.json")
+        os.makedirs(os.path.join(folder, "replays"), exist_ok=True)
+        try:
+            with open(self.board_file, "r") as f:
+                self.runs = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.runs = {}   # id -> run without its replay
+
+    def add_run(self, run):
+        # returns False if the run doesn't check out
+        # the id names the replay file, so anything but the submitter's own format is turned away
+        if not isinstance(run["id"], str) or not SUBMIT_ID_FORMAT.fullmatch(run["id"]):
+            return False
+        # anything else would be flown over LEVEL_1's terrain and could rank as verified under a made-up name
+        if run["level"] not in LEVEL_ORDER:
+            return False
+        replay = base64.b64decode(run["replay"]) if run.get("replay") else None
+        verified = False
+        if replay is not None:
+            # checked in memory, so only accepted replays ever reach the disk
+            try:
+                header_line, _, actions = replay.partition(b"\n")
+                header = json.loads(header_line)
+                if not isinstance(header, dict) or header.get("version") != REPLAY_VERSION:
+                    return False
+                if header["level"] != run["level"] or header["score"] != run["score"]:
+                    return False
+                _, result, score, _ = verify_replay_actions(header, actions)
+            except (ValueError, KeyError, TypeError):
+                return False
+            if result != header["result"]:
+                return False
+            if header.get("physics") == PHYSICS_FIXED:
+                if score != run["score"]:
+                    return False
+                verified = True
+            with open(os.path.join(self.folder, "replays", f"{run['id']}.replay"), "wb") as f:
+                f.write(replay)
+        with self.lock:
+            self.runs[run["id"]] = {"level": run["level"], "score": run["score"], "result": run["result"],
+                                    "verified": verified}
+            with open(self.board_file, "w") as f:
+                json.dump(self.runs, f, indent=2)
+        return True
+
+    def leaderboard(self):
+        # only runs the server re-flew itself are ranked; float physics runs can't be checked,
+        # so they're listed on their own and can't push a real landing off the board
+        with self.lock:
+            board = {"ranked": {}, "unverified": {}}
+            for run in self.runs.values():
+                board["ranked" if run["verified"] else "unverified"].setdefault(run["level"], []).append(run)
+        return {kind: {level: sorted(runs, key=lambda run: -run["score"])[:10] for level, runs in levels.items()}
+                for kind, levels in board.items()}
+
+
+class ScoreServerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keeps the connection open between batches
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/leaderboard":
+            self._reply(404, {"error": "not found"})
+            return
+        self._reply(200, self.server.leaderboard())
 
-            # SPACE on the end screen advances to the next level
-            if game_state == ENDED:
-                if event.key == pygame.K_SPACE:
-                    if current_level == "TUTORIAL":
-                        return_to_menu()
-                    else:
-                        if lander and lander.landed:
-                            go_to_next_level()
-
-        # handle pause menu button clicks
-        if game_state == PAUSED:
-            action = pause_menu.handle_event(event)
-            if action == "RESUME":
-                game_state = PLAYING
-            elif action == "RESTART":
-                start_level(current_level)
-            elif action == "MENU":
-                return_to_menu()
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/scores":
+            self._reply(404, {"error": "not found"})
+            return
+        if random.random() < self.server.flaky:
+            self._reply(503, {"error": "flaky on purpose"})
+            return
+        try:
+            runs = json.loads(body)["runs"]
+        except (ValueError, KeyError, TypeError):
+            runs = None
+        if not isinstance(runs, list) or not all(isinstance(run, dict) for run in runs):
+            self._reply(400, {"error": "expected {\"runs\": [{...}, ...]}"})
+            return
+        accepted, rejected = 0, []
+        for run in runs:
+            try:
+                if run["id"] in self.server.runs:
+                    accepted += 1   # a retry of a batch we already have
+                elif self.server.add_run(run):
+                    accepted += 1
+                else:
+                    rejected.append(run["id"])
+            except (KeyError, TypeError, ValueError, OSError):
+                rejected.append(run.get("id"))
+        self._reply(200, {"accepted": accepted, "rejected": rejected})
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}")
+
+
+def run_score_server_cli(options):
+    address = parse_address(options.score_server, default_host="0.0.0.0", default_port=SCORE_SERVER_PORT)
+    # re-simulating replays needs the collision shapes, but never a window. SDL would otherwise turn
+    # Ctrl+C and kill signals into window events nobody reads, and the server couldn't be stopped
+    os.environ["SDL_NO_SIGNAL_HANDLERS"] = "1"
+    init_pygame(headless=True)
+    load_lander_shapes()
+    load_lander_shapes(crashed=True)
+    server = ScoreServer(address, flaky=options.flaky)
+    print(f"Score server on http://{address[0]}:{address[1]}/scores, leaderboard at /leaderboard "
+          f"(saving to {SCORE_SERVER_FOLDER})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
 
-        # handle main menu and level scroller interactions
-        if game_state == MENU:
-            result = None
-            scroller_result = None
+# ----------------------------------------
+# replay rendering
+# ----------------------------------------
+# --render-replays turns recorded runs into videos offline for highlight reels. Each run is flown
+# again through Lander.update with its own wind seed and drawn with the same code as the game, on a
+# hidden display in a worker process, as fast as the encoder takes the frames
+RENDER_FOLDER     = os.path.join(RECORDING_FOLDER, "replays")
+RENDER_END_FRAMES = 120   # the landing or explosion plays on for two seconds after the run ends
+
+def _init_render_worker():
+    # each process in the pool gets its own hidden display, sprites and (silent) sounds
+    init_pygame(headless=True)
+    load_sounds()
+    load_lander_shapes()
+    load_lander_shapes(crashed=True)
+
+def render_replay(task):
+    # process-pool worker: returns (replay path, frames rendered, error or None)
+    replay_path, output_path = task
+    header = read_replay_header(replay_path)
+    if header is None or header["level"] not in LEVELS:
+        return replay_path, 0, "unknown replay version or level"
+    actions = read_replay_actions(replay_path)
+    level_name = header["level"]
+
+    ground          = Ground(level_name)
+    static_layer    = build_static_layer(load_level_background(level_name), ground)
+    wind            = Wind(level_name, rng=random.Random(header["wind_seed"]))
+    lander          = Lander()
+    particle_system = ParticleSystem(ground=ground)
+    screen_shake    = ScreenShake()
+    hud             = HUD()
+    scene_surface   = surface_pool.get("scene", (WIDTH, HEIGHT))
+
+    recorder = FrameRecorder(drop_frames=False)
+    if not recorder.start(screen, path=output_path):
+        return replay_path, 0, "couldn't create the output folder"
+    flying_ticks = 0
+    end_frames = 0
+    while end_frames < RENDER_END_FRAMES:
+        # same update order as the game loop, with the recorded keys in place of the keyboard
+        flying = lander.alive and not lander.landed and flying_ticks < len(actions)
+        if flying:
+            wind.update()
+            lander.update(landing_pad_rect=ground.landing_pad_rect, terrain_points=ground.terrain_points,
+                          particle_system=particle_system, screen_shake=screen_shake, wind=wind,
+                          controls=action_to_controls(actions[flying_ticks]), engine_sound=False,
+                          deterministic=header.get("physics") == PHYSICS_FIXED)
+            flying_ticks += 1
+        else:
+            end_frames += 1
+        particle_system.update()
+        screen_shake.update()
+        elapsed_time = flying_ticks / 60
 
-            if level_scroller.visible:
-                scroller_result = level_scroller.handle_event(event)
+        scene_surface.blit(static_layer, (0, 0))
+        particle_system.draw(scene_surface)
+        lander.draw(scene_surface)
+        zoom = get_zoom(lander, ground.landing_pad_rect)
+        draw_zoomed_scene(scene_surface, zoom, (lander.x + ground.landing_pad_rect.centerx) / 2,
+                          (lander.y + ground.landing_pad_rect.centery) / 2, screen_shake.get_offset())
+        if zoom <= MIN_ZOOM:
+            hud.draw_level_name(level_name, screen)
+            hud.draw(lander, screen, wind=wind)
+            if flying:
+                hud.draw_timer(elapsed_time, screen)
+        if not flying and (lander.landed or not lander.alive):
+            draw_end_screen(screen, lander, level_name, header["score"], elapsed_time)
+
+        recorder.capture(screen)
+        surface_pool.end_frame()
+    recorder.stop()
+    return replay_path, recorder.frames, None
+
+def run_render_replays_cli(options):
+    # renders every .replay under the folder that hasn't been rendered yet; returns a process exit code
+    replay_paths = []
+    for folder, _, names in os.walk(options.render_replays):
+        replay_paths.extend(os.path.join(folder, name) for name in names if name.endswith(".replay"))
+    replay_paths.sort()
+
+    output_folder = options.output or RENDER_FOLDER
+    extension = ".mp4" if shutil.which("ffmpeg") else ""
+    tasks = []
+    for path in replay_paths:
+        relative = os.path.splitext(os.path.relpath(path, options.render_replays))[0]
+        output_path = os.path.join(output_folder, relative)
+        if not os.path.exists(output_path + extension):
+            tasks.append((path, output_path))
+    print(f"{len(replay_paths)} replays found, {len(tasks)} to render into {output_folder}")
+
+    workers = options.workers or os.cpu_count() or 1
+    failures = 0
+    total_frames = 0
+    start_time = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_render_worker) as pool:
+        for path, frames, error in pool.imap_unordered(render_replay, tasks):
+            if error:
+                failures += 1
+                print(f"{path}: {error}")
             else:
-                result = menu.handle_event(event)
+                total_frames += frames
+                print(f"{path}: {frames} frames")
+    elapsed = time.perf_counter() - start_time
+    print(f"Rendered {len(tasks) - failures} / {len(tasks)} replays, {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / max(elapsed, 1e-9):.0f} fps) on {workers} workers")
+    return 1 if failures else 0
 
-            if scroller_result == "MENU_RETURN":
-                return_to_menu()
-            elif scroller_result in LEVEL_ORDER:
-                # player picked a level from the scroller
-                current_level_index = LEVEL_ORDER.index(scroller_result)
-                start_level(scroller_result)
-
-            if result == "BEGIN":
-                # start from level 1
-                current_level_index = 0
-                level_scroller.visible = False
-                start_level(LEVEL_ORDER[0])
-            if result == "LEVELS":
-                level_scroller.toggle()
-                menu_button_accept.play()
-            if result == "TUTORIAL":
-                current_level_index = 0
-                current_level = "TUTORIAL"
-                level_scroller.visible = False
-                start_level("TUTORIAL")
-            if result == "EXIT":
+# ----------------------------------------
+# command line
+# ----------------------------------------
+def parse_command_line():
+    parser = argparse.ArgumentParser(description="Mars Lander. Run with no arguments to play.")
+    parser.add_argument("--check-level", nargs="*", metavar="LEVEL",
+                        help="check that levels can be landed under worst-case wind (default: every level)")
+    parser.add_argument("--seed", type=int, help="check or bench the generated level with this seed instead")
+    parser.add_argument("--difficulty", type=int, default=1, help="difficulty of the generated level")
+    parser.add_argument("--workers", type=int, help="worker processes to use (default: one per core)")
+    parser.add_argument("--samples", type=int, default=128, help="plans tried per wind direction per round")
+    parser.add_argument("--iterations", type=int, default=4, help="search rounds per level")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--bench-autopilot", action="store_true",
+                        help="fly every level with the autopilot and report landings and decision times")
+    parser.add_argument("--bench-env", action="store_true",
+                        help="measure steps per second of the reinforcement learning environments")
+    parser.add_argument("--envs", type=int, default=64, help="environments in the vectorised benchmarks")
+    parser.add_argument("--pixels", action="store_true", help="include pixel observations in the benchmark")
+    parser.add_argument("--tune", nargs="*", metavar="NAME=VALUES",
+                        help="sweep physics constants over a grid, e.g. GRAVITY=0.03,0.04 PAD_WIDTH_SCALE=0.8,1 "
+                             f"(any of {', '.join(TUNABLE_CONSTANTS)})")
+    parser.add_argument("--bot", choices=TUNE_BOTS, default="autopilot",
+                        help="who flies the tuning runs: the autopilot or every recorded replay")
+    parser.add_argument("--runs", type=int, default=8, help="autopilot attempts per level per setting")
+    parser.add_argument("--telemetry-csv", nargs="+", metavar="FILE",
+                        help="convert recorded .telemetry files to CSV next to the originals")
+    parser.add_argument("--render-replays", nargs="?", const=REPLAY_FOLDER, metavar="FOLDER",
+                        help="render every recorded .replay under FOLDER (default: the replays folder) to video")
+    parser.add_argument("--output", metavar="FOLDER",
+                        help=f"where --render-replays writes its videos (default: {RENDER_FOLDER})")
+    parser.add_argument("--dev", action="store_true",
+                        help="level designer mode: reload a level whenever its file in the levels folder is saved")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="fly with the fixed-point physics, so runs re-simulate bit for bit on any machine")
+    parser.add_argument("--verify-replays", nargs="+", metavar="FILE",
+                        help="re-simulate replays and check their recorded results and scores")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace memory from the start (F4 toggles it in game) and report growth across level starts")
+    parser.add_argument("--soak", type=int, metavar="LEVELS",
+                        help="start, restart and generate levels this many times without a window and fail if memory keeps growing")
+    parser.add_argument("--startup-check", action="store_true",
+                        help=f"start up, log the startup times and exit with 1 if the first frame took "
+                             f"longer than {FIRST_FRAME_BUDGET_MS}ms")
+    parser.add_argument("--record", action="store_true",
+                        help="start recording the screen straight away (F9 toggles recording in game)")
+    parser.add_argument("--broadcast", metavar="HOST:PORT",
+                        help=f"stream the game to a spectator viewer (port defaults to {BROADCAST_PORT})")
+    parser.add_argument("--viewer", nargs="?", const=f":{BROADCAST_PORT}", metavar="[HOST]:PORT",
+                        help="open a spectator window that mirrors kiosks streaming with --broadcast")
+    parser.add_argument("--submit-scores", metavar="URL",
+                        help="send campaign landings to this leaderboard (e.g. http://localhost:47480/scores)")
+    parser.add_argument("--score-server", nargs="?", const=f":{SCORE_SERVER_PORT}", metavar="[HOST]:PORT",
+                        help="run a stand-in leaderboard server for testing --submit-scores")
+    parser.add_argument("--flaky", type=float, default=0.0, metavar="FRACTION",
+                        help="make the stand-in score server fail this fraction of uploads")
+    parser.add_argument("--render-scale", type=float, metavar="SCALE",
+                        help="draw the world at this fraction of the window size, e.g. 0.5 "
+                             "(overrides render_scale in mars_lander_settings.json)")
+    return parser.parse_args()
+
+# ----------------------------------------
+# entry point
+# ----------------------------------------
+if __name__ == "__main__":
+    options = parse_command_line()
+
+    # command-line tools run headless and exit without starting the game
+    if options.check_level is not None:
+        sys.exit(run_level_check_cli(options))
+    if options.bench_autopilot:
+        sys.exit(run_autopilot_bench_cli(options))
+    if options.bench_env:
+        sys.exit(run_env_bench_cli(options))
+    if options.tune is not None:
+        sys.exit(run_tuner_cli(options))
+    if options.telemetry_csv:
+        sys.exit(run_telemetry_csv_cli(options))
+    if options.viewer is not None:
+        sys.exit(run_viewer_cli(options))
+    if options.render_replays is not None:
+        sys.exit(run_render_replays_cli(options))
+    if options.verify_replays:
+        sys.exit(run_verify_replays_cli(options))
+    if options.score_server is not None:
+        sys.exit(run_score_server_cli(options))
+
+    startup = StartupLog()
+    settings = startup.run("settings", load_settings)
+    # the soak test runs the real game loop, just without a window
+    startup.run("display", init_pygame, bool(options.soak), settings["audio_buffer"])
+    startup.run("menu background", load_backgrounds)
+    startup.run("menu sounds", load_menu_sounds)
+
+    # the rest loads behind the menu; the backup has its own thread since the game never waits for it
+    backup_thread = threading.Thread(target=startup.run, args=("backup", create_backup))
+    if not options.soak:
+        backup_thread.start()
+    else:
+        # the soak leaves the player's folder alone: generated levels are cached somewhere thrown away
+        # afterwards, and telemetry and the startup log are switched off below
+        LEVEL_CACHE_FOLDER = tempfile.mkdtemp(prefix="mars_lander_soak_")
+    boot_loader = BackgroundLoader(startup, [
+        ("sounds", load_sounds),
+        ("lander shapes", load_lander_shapes),
+        ("crashed lander shapes", load_lander_shapes, True)
+    ])
+
+    # ----------------------------------------
+    # initialise globals
+    # ----------------------------------------
+    lander             = None
+    background_image   = None
+    current_level      = "LEVEL_1"
+    ground             = Ground(current_level)
+    hud                = HUD()
+    menu               = Menu()
+    level_scroller     = LevelScroller()
+    pause_menu         = PauseMenu()
+    tutorial_guide     = None
+    particle_system    = ParticleSystem()
+    screen_shake       = ScreenShake()
+    wind               = Wind(current_level)
+    level_start_ticks  = 0
+    level_elapsed_time = 0.0
+    level_ticks        = 0       # frames flown this attempt; deterministic runs are timed by these
+    round_score        = 0
+    compiled_levels    = {}
+    level_prefetcher   = LevelPrefetcher()
+    endless_seed       = 0
+    endless_stage      = 0
+    autopilot          = Autopilot()
+    autopilot_enabled  = False   # toggled with A as a landing assist
+    autopilot_used     = False   # whether the autopilot flew any of the current attempt
+    replay_recorder    = None
+    ghosts             = []      # earlier runs replayed alongside the current attempt
+    level_snapshot     = None    # how the current level started, for restarting it in place
+    players            = []      # one VersusPlayer per player in versus mode, otherwise empty
+    versus_player_count = 0
+    # the world (terrain, particles, landers) is drawn into this buffer at the render scale every frame
+    max_render_scale   = max(MIN_RENDER_SCALE, min(1.0, float(options.render_scale or settings["render_scale"])))
+    quality            = QualityGovernor(enabled=bool(settings["auto_quality"]))
+    # the quality governor can lower the render scale further, but never raise it past the setting
+    render_scale       = min(max_render_scale, quality.settings["render_scale"])
+    scene_surface      = surface_pool.get("scene", get_render_size(render_scale))
+    show_render_stats  = False   # F3 shows the surface pool's per-frame counts
+    dev_mode           = options.dev   # reload levels from their files when they're saved
+    deterministic_physics = bool(options.deterministic or settings["deterministic"])
+    memory_tracker     = MemoryTracker()
+    if options.trace_memory or options.soak:
+        memory_tracker.start()
+    soak_frames        = 0
+    level_poll_ticks   = 0
+    telemetry          = TelemetryRecorder()
+    telemetry_enabled  = bool(settings["telemetry"]) and not options.soak
+    broadcast_address  = options.broadcast or settings["broadcast"]
+    publisher          = BroadcastPublisher(parse_address(broadcast_address)) if broadcast_address else None
+    score_server_url   = options.submit_scores or settings["score_server"]
+    score_submitter    = ScoreSubmitter(score_server_url) if score_server_url else None
+    recorder           = FrameRecorder()
+    if options.record and recorder.start(screen):
+        print(f"Recording to {recorder.path}")
+    static_layer       = None    # background and terrain for the current level, at the render scale
+    attract_mode       = False   # demo flights shown when the menu is left idle
+    menu_idle_ticks    = 0
+    attract_end_ticks  = 0
+
+    game_state = MENU
+
+    # ----------------------------------------
+    # main game loop
+    # ----------------------------------------
+    running = True
+    while running:
+
+        # ---- event handling ----
+        for event in pygame.event.get():
+
+            if event.type == pygame.QUIT:
                 running = False
 
-    # ---- update ----
-    if game_state == PLAYING and lander is not None:
+            # anything the player does can start a level, so make sure everything has loaded first
+            if boot_loader is not None and event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                boot_loader.wait()
 
-        # tick the in-level timer
-        level_elapsed_time = (pygame.time.get_ticks() - level_start_ticks) / 1000.0
+            # any key or click during the demo goes straight back to the menu
+            if attract_mode and event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                return_to_menu()
+                continue
 
-        wind.update()
+            if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION):
+                menu_idle_ticks = pygame.time.get_ticks()
 
-        # let the tutorial guide control gravity and freeze flags
-        tutorial_settings = {"freeze_descent": False, "gravity_scale": 1.0}
-        if tutorial_guide is not None and current_level == "TUTORIAL":
-            tutorial_settings = tutorial_guide.update(lander)
+            if event.type == pygame.KEYDOWN:
 
-        lander.update(
-            gravity_scale    = tutorial_settings["gravity_scale"],
-            freeze_descent   = tutorial_settings["freeze_descent"],
-            landing_pad_rect = ground.landing_pad_rect,
-            terrain_points   = ground.terrain_points,
-            particle_system  = particle_system,
-            screen_shake     = screen_shake,
-            wind             = wind
-        )
+                # M returns to menu from anywhere
+                if event.key == pygame.K_m:
+                    return_to_menu()
+                    continue
 
-        particle_system.update()
-        screen_shake.update()
+                # Q quits the whole game
+                if event.key == pygame.K_q:
+                    running = False
 
-        # transition to the end screen once the lander has landed or crashed
-        if lander.landed or not lander.alive:
-            game_state = ENDED
+                # F3 toggles the renderer's surface counts
+                if event.key == pygame.K_F3:
+                    show_render_stats = not show_render_stats
 
-            if current_level == "TUTORIAL":
-                current_level_index = 0
+                # F4 starts and stops tracing memory (stopping writes a report)
+                if event.key == pygame.K_F4:
+                    if memory_tracker.enabled:
+                        print(f"Memory report written to {memory_tracker.stop()}")
+                    else:
+                        memory_tracker.start()
+                        print("Tracing memory")
+
+                # F9 starts and stops recording the screen
+                if event.key == pygame.K_F9:
+                    if recorder.recording:
+                        recorder.stop()
+                        print(f"Recording saved: {recorder.path} ({recorder.frames} frames, {recorder.dropped} dropped)")
+                    elif recorder.start(screen, current_level if game_state != MENU else "menu"):
+                        print(f"Recording to {recorder.path}")
+
+                # R restarts the current level at any point
+                if event.key == pygame.K_r:
+                    restart_level()
+
+                # P toggles the pause state
+                if event.key == pygame.K_p:
+                    if game_state == PLAYING:
+                        game_state = PAUSED
+                        audio.set_engine(False)
+                    elif game_state == PAUSED:
+                        game_state = PLAYING
+
+                # A hands the controls to the autopilot and back (not in the tutorial)
+                if event.key == pygame.K_a and game_state == PLAYING and current_level != "TUTORIAL" and not players:
+                    autopilot_enabled = not autopilot_enabled
+
+                # 2, 3 or 4 restarts a versus game with that many players
+                if players and event.key in (pygame.K_2, pygame.K_3, pygame.K_4):
+                    start_versus(event.key - pygame.K_0, current_level)
+
+                # SPACE on the end screen advances to the next level
+                if game_state == ENDED:
+                    if event.key == pygame.K_SPACE:
+                        if players:
+                            # versus loops round the campaign levels
+                            start_level(LEVEL_ORDER[(current_level_index + 1) % len(LEVEL_ORDER)])
+                        elif current_level == "TUTORIAL":
+                            return_to_menu()
+                        else:
+                            if lander and lander.landed:
+                                go_to_next_level()
+
+            # handle pause menu button clicks
+            if game_state == PAUSED:
+                action = pause_menu.handle_event(event)
+                if action == "RESUME":
+                    game_state = PLAYING
+                elif action == "RESTART":
+                    restart_level()
+                elif action == "MENU":
+                    return_to_menu()
+
+            # handle main menu and level scroller interactions
+            if game_state == MENU:
+                result = None
+                scroller_result = None
+
+                if level_scroller.visible:
+                    scroller_result = level_scroller.handle_event(event)
+                else:
+                    result = menu.handle_event(event)
+
+                if scroller_result == "MENU_RETURN":
+                    return_to_menu()
+                elif scroller_result in LEVEL_ORDER:
+                    # player picked a level from the scroller
+                    current_level_index = LEVEL_ORDER.index(scroller_result)
+                    start_level(scroller_result)
+
+                if result == "BEGIN":
+                    # start from level 1
+                    current_level_index = 0
+                    level_scroller.visible = False
+                    start_level(LEVEL_ORDER[0])
+                if result == "LEVELS":
+                    level_scroller.toggle()
+                    audio.play_ui(menu_button_accept)
+                if result == "ENDLESS":
+                    level_scroller.visible = False
+                    start_endless()
+                if result == "VERSUS":
+                    start_versus(VERSUS_MIN_PLAYERS)
+                if result == "TUTORIAL":
+                    current_level_index = 0
+                    current_level = "TUTORIAL"
+                    level_scroller.visible = False
+                    start_level("TUTORIAL")
+                if result == "EXIT":
+                    running = False
+
+        # dev mode: a saved level file restarts the level being played with the new version
+        if dev_mode:
+            level_poll_ticks += 1
+            if level_poll_ticks >= LEVEL_POLL_TICKS:
+                level_poll_ticks = 0
+                reloaded = LEVELS.reload_changed()
+                if reloaded:
+                    print(f"Reloaded {', '.join(reloaded)}")
+                if current_level in reloaded and game_state != MENU:
+                    start_level(current_level)
+
+        # ---- update ----
+        if game_state == PLAYING and players:
+            level_elapsed_time = (pygame.time.get_ticks() - level_start_ticks) / 1000.0
+            wind.update()
+            if update_versus(players, ground, wind, particle_system, screen_shake, level_elapsed_time):
+                game_state = ENDED
+            particle_system.update()
+            screen_shake.update()
+
+        if game_state == PLAYING and lander is not None:
+
+            # tick the in-level timer (by frames when every run has to re-simulate to the same score)
+            if deterministic_physics:
+                level_elapsed_time = level_ticks / 60
             else:
-                # calculate the score and update the best score if it's a new record
-                round_score = calculate_score(lander.fuel, level_elapsed_time, lander.landed)
-                if lander.landed:
-                    prev_best = best_scores.get(current_level, 0)
-                    if round_score > prev_best:
-                        best_scores[current_level] = round_score
-                    completed_levels.add(current_level)
-                    write_save(completed_levels, best_scores)
-
-    if game_state == PAUSED and lander is not None:
-        # keep particles and shake going while paused so an explosion doesn't freeze mid-air
-        particle_system.update()
-        screen_shake.update()
+                level_elapsed_time = (pygame.time.get_ticks() - level_start_ticks) / 1000.0
+
+            wind.update()
+
+            # let the tutorial guide control gravity and freeze flags
+            tutorial_settings = {"freeze_descent": False, "gravity_scale": 1.0}
+            if tutorial_guide is not None and current_level == "TUTORIAL":
+                tutorial_settings = tutorial_guide.update(lander)
+
+            # None means the player is flying from the keyboard
+            controls = None
+            if (autopilot_enabled or attract_mode) and current_level != "TUTORIAL":
+                controls = autopilot.decide(lander, ground, wind)
+                autopilot_used = True
+
+            if replay_recorder is not None:
+                if controls is None:
+                    keys = pygame.key.get_pressed()
+                    controls = (keys[pygame.K_SPACE], keys[pygame.K_LEFT], keys[pygame.K_RIGHT])
+                replay_recorder.record(*controls)
+
+            lander.update(
+                gravity_scale    = tutorial_settings["gravity_scale"],
+                freeze_descent   = tutorial_settings["freeze_descent"],
+                landing_pad_rect = ground.landing_pad_rect,
+                terrain_points   = ground.terrain_points,
+                particle_system  = particle_system,
+                screen_shake     = screen_shake,
+                wind             = wind,
+                controls         = controls,
+                deterministic    = deterministic_physics
+            )
+            level_ticks += 1
+            for ghost in ghosts:
+                ghost.update()
+
+            # demo flights aren't recorded
+            if telemetry_enabled and not attract_mode:
+                telemetry.record(lander, wind.force_at(lander.x, lander.y),
+                                 get_zoom(lander, ground.landing_pad_rect), clock.get_rawtime())
+
+            particle_system.update()
+            screen_shake.update()
+
+            # transition to the end screen once the lander has landed or crashed
+            if lander.landed or not lander.alive:
+                game_state = ENDED
+                new_best = False
+                if deterministic_physics:
+                    attempt_score = calculate_score_fixed(lander.fuel, level_ticks, lander.landed)
+                else:
+                    attempt_score = calculate_score(lander.fuel, level_elapsed_time, lander.landed)
+
+                if attract_mode:
+                    # demo flights never touch the scores or the save file
+                    attract_end_ticks = pygame.time.get_ticks()
+                elif current_level == "TUTORIAL":
+                    current_level_index = 0
+                elif current_level.startswith(ENDLESS_PREFIX):
+                    # endless levels are scored but not saved; start building the next one straight away
+                    round_score = attempt_score
+                    if lander.landed:
+                        prefetch_next_endless_level()
+                else:
+                    # calculate the score and update the best score if it's a new record
+                    round_score = attempt_score
+                    if lander.landed:
+                        prev_best = best_scores.get(current_level, 0)
+                        if round_score > prev_best:
+                            best_scores[current_level] = round_score
+                            new_best = True
+                        completed_levels.add(current_level)
+                        write_save(completed_levels, best_scores)
+
+                if telemetry_enabled and not attract_mode:
+                    telemetry.export(LANDED if lander.landed else CRASHED)
+
+                if replay_recorder is not None:
+                    replay_path = replay_recorder.save(LANDED if lander.landed else CRASHED, round_score, autopilot_used)
+                    # keep the record-setting run around as the level's ghost
+                    if new_best and replay_path is not None:
+                        save_best_replay(current_level, replay_path)
+                    # landings the player flew themselves go to the leaderboard
+                    if score_submitter and lander.landed and not autopilot_used and replay_path is not None:
+                        score_submitter.submit(current_level, round_score, LANDED, replay_path)
+                    replay_recorder = None
+
+        if game_state == PAUSED and (lander is not None or players):
+            # keep particles and shake going while paused so an explosion doesn't freeze mid-air
+            particle_system.update()
+            screen_shake.update()
+
+        if game_state == ENDED and not attract_mode:
+            # the explosion and shake play out behind the end screen
+            particle_system.update()
+            screen_shake.update()
+
+        if game_state == ENDED and attract_mode:
+            # let the demo's explosion or landing play out, then fly another level
+            audio.set_engine(False)
+            particle_system.update()
+            screen_shake.update()
+            if pygame.time.get_ticks() - attract_end_ticks > ATTRACT_END_SECONDS * 1000:
+                start_level(random.choice(LEVEL_ORDER))
+
+        if game_state == MENU and pygame.time.get_ticks() - menu_idle_ticks > ATTRACT_IDLE_SECONDS * 1000:
+            if boot_loader is not None:
+                boot_loader.wait()
+            start_attract_mode()
+
+        # stream this frame to the spectator viewer, if one is set up
+        if publisher is not None:
+            publisher.publish(game_state, current_level, lander, wind, particle_system, round_score, level_elapsed_time)
+
+        # ---- draw ----
+        if game_state == MENU:
+            if level_scroller.visible:
+                level_scroller.draw(screen)
+            else:
+                menu.draw()
+            if boot_loader is not None and not boot_loader.done:
+                boot_loader.draw(screen)
 
-    # ---- draw ----
-    if game_state == MENU:
-        if level_scroller.visible:
-            level_scroller.draw(screen)
-        else:
-            menu.draw()
+        elif players:
+            draw_versus(screen, scene_surface, static_layer, players, ground.landing_pad_rect,
+                        particle_system, screen_shake.get_offset() if quality.settings["shake"] else (0, 0))
+            wind.draw_indicator(screen)
 
-    else:
-        # render the full game scene to an off-screen surface first so we can zoom/shake it
-        scene_surface = pygame.Surface((WIDTH, HEIGHT))
-        scene_surface.blit(background_image, (0, 0))
-        ground.draw(scene_surface)
-        particle_system.draw(scene_surface)
-        if lander:
-            lander.draw(scene_surface)
-
-        # keep the camera midway between the lander and the landing pad
-        camera_zoom    = get_zoom(lander, ground.landing_pad_rect) if lander else MIN_ZOOM
-        camera_focus_x = (lander.x + ground.landing_pad_rect.centerx) / 2 if lander else WIDTH / 2
-        camera_focus_y = (lander.y + ground.landing_pad_rect.centery) / 2 if lander else HEIGHT / 2
-
-        shake_offset = screen_shake.get_offset()
-        draw_zoomed_scene(scene_surface, camera_zoom, camera_focus_x, camera_focus_y, shake_offset)
-
-        # hide the HUD when zoomed in so it doesn't obscure the landing
-        hud_hidden_for_zoom = camera_zoom > MIN_ZOOM
-
-        if not hud_hidden_for_zoom:
-            if current_level != "TUTORIAL":
-                hud.draw_level_name(current_level, screen)
-            if current_level != "TUTORIAL" and lander:
-                hud.draw(lander, screen, wind=wind)
-                if game_state == PLAYING:
-                    hud.draw_timer(level_elapsed_time, screen)
-
-        # tutorial guide overlay sits on top of the HUD layer
-        if tutorial_guide is not None and current_level == "TUTORIAL" and lander and not hud_hidden_for_zoom:
-            tutorial_guide.draw(lander, screen)
-
-        # end screen drawn on top of the game world
-        if game_state == ENDED and lander:
-            thrust_sound.stop()
-            draw_end_screen(screen, lander, current_level, round_score, level_elapsed_time)
-
-        # pause overlay is the very last thing drawn so it's always on top
-        if game_state == PAUSED:
-            pause_menu.draw(screen)
-
-    clock.tick(60)
-    pygame.display.flip()
-
-pygame.quit()
-sys.exit()
\ No newline at end of file
+            if game_state == ENDED:
+                draw_versus_results(screen, players)
+            if game_state == PAUSED:
+                pause_menu.draw(screen)
+
+        else:
+            # render the game world to the off-screen buffer first so we can zoom/shake it;
+            # the HUD below is drawn straight onto the screen so text stays sharp at any render scale
+            scene_surface.blit(static_layer, (0, 0))
+            particle_system.draw(scene_surface, render_scale)
+            for ghost in ghosts:
+                ghost.draw(scene_surface, render_scale)
+            if lander:
+                lander.draw(scene_surface, render_scale)
+
+            # keep the camera midway between the lander and the landing pad
+            camera_zoom    = get_zoom(lander, ground.landing_pad_rect) if lander and quality.settings["zoom"] else MIN_ZOOM
+            camera_focus_x = (lander.x + ground.landing_pad_rect.centerx) / 2 if lander else WIDTH / 2
+            camera_focus_y = (lander.y + ground.landing_pad_rect.centery) / 2 if lander else HEIGHT / 2
+
+            shake_offset = screen_shake.get_offset() if quality.settings["shake"] else (0, 0)
+            draw_zoomed_scene(scene_surface, camera_zoom, camera_focus_x, camera_focus_y, shake_offset,
+                              smooth=quality.settings["smooth_zoom"])
+
+            # hide the HUD when zoomed in so it doesn't obscure the landing
+            hud_hidden_for_zoom = camera_zoom > MIN_ZOOM
+
+            if not hud_hidden_for_zoom:
+                if current_level != "TUTORIAL":
+                    hud.draw_level_name(current_level, screen)
+                if current_level != "TUTORIAL" and lander:
+                    hud.draw(lander, screen, wind=wind)
+                    if game_state == PLAYING:
+                        hud.draw_timer(level_elapsed_time, screen)
+
+            # tutorial guide overlay sits on top of the HUD layer
+            if tutorial_guide is not None and current_level == "TUTORIAL" and lander and not hud_hidden_for_zoom:
+                tutorial_guide.draw(lander, screen)
+
+            # the autopilot shows its decision times whenever it is flying
+            if (autopilot_enabled or attract_mode) and current_level != "TUTORIAL":
+                hud.draw_autopilot(autopilot, screen, demo=attract_mode)
+
+            # end screen drawn on top of the game world (the demo just moves on to its next flight)
+            if game_state == ENDED and lander and not attract_mode:
+                audio.set_engine(False)
+                draw_end_screen(screen, lander, current_level, round_score, level_elapsed_time)
+
+            # pause overlay is the very last thing drawn so it's always on top
+            if game_state == PAUSED:
+                pause_menu.draw(screen)
+
+        # the finished frame goes to the recorder before the on-screen-only overlays
+        recorder.capture(screen)
+        recorder.draw_indicator(screen)
+        if show_render_stats:
+            hud.draw_render_stats(surface_pool, clock, screen, quality)
+        surface_pool.end_frame()
+        audio.update()
+        memory_tracker.on_state(game_state)
+
+        # the soak test runs as fast as it can and starts a new level every few frames
+        if options.soak:
+            clock.tick()
+            soak_frames += 1
+            if soak_frames % SOAK_FRAMES_PER_LEVEL == 0:
+                if memory_tracker.restarts >= options.soak:
+                    running = False
+                else:
+                    if boot_loader:
+                        boot_loader.wait()
+                    start_next_soak_level(memory_tracker.restarts)
+        else:
+            clock.tick(60)
+        pygame.display.flip()
+
+        # let the governor see how long this frame's work took, and apply any change it makes
+        if quality.record(clock.get_rawtime()):
+            particle_system.density = quality.settings["particles"]
+            new_scale = min(max_render_scale, quality.settings["render_scale"])
+            if new_scale != render_scale:
+                render_scale  = new_scale
+                scene_surface = surface_pool.get("scene", get_render_size(render_scale))
+                if static_layer is not None:
+                    static_layer = build_static_layer(background_image, ground, render_scale)
+
+        # the startup log is written once the menu is up and everything behind it has finished
+        if startup is not None:
+            if startup.first_frame_ms is None:
+                startup.mark_first_frame()
+            if boot_loader.done and not backup_thread.is_alive():
+                if not options.soak:
+                    startup.write()
+                boot_loader = None
+                if options.startup_check:
+                    running = False
+                else:
+                    startup = None
+
+    # an attempt still in the air when the game closes is saved too
+    if telemetry_enabled and game_state in (PLAYING, PAUSED) and lander is not None:
+        telemetry.export("QUIT")
+    telemetry.wait()
+    if publisher is not None:
+        publisher.close()
+    if score_submitter is not None:
+        score_submitter.close()
+    if recorder.recording:
+        recorder.stop()
+        print(f"Recording saved: {recorder.path} ({recorder.frames} frames, {recorder.dropped} dropped)")
+
+    exit_code = 1 if options.startup_check and startup.over_budget() else 0
+    if options.soak:
+        growth = memory_tracker.growth_per_restart() * (memory_tracker.restarts - MEMORY_WARMUP_RESTARTS)
+        path = memory_tracker.stop()
+        flat = growth <= MEMORY_GROWTH_LIMIT
+        print(f"Soak: {memory_tracker.restarts} level starts, traced memory {'flat' if flat else 'GROWING'} "
+              f"({growth / 1024:+.0f}KB fitted over the run after warm-up, limit {MEMORY_GROWTH_LIMIT // 1024}KB), "
+              f"report in {path}")
+        exit_code = 0 if flat else 1
+        shutil.rmtree(LEVEL_CACHE_FOLDER, ignore_errors=True)
+    elif memory_tracker.enabled:
+        print(f"Memory report written to {memory_tracker.stop()}")
+
+    pygame.quit()
+    sys.exit(exit_code)
\ No newline at end of file